@@ -0,0 +1,226 @@
+"""
+Created on Thu Jun 26 10:41:12 2025
+
+@author: sid
+Batch prediction for a calendar of (year, Grand Prix) events.
+- Events come from a built-in season calendar (--season 2025), a JSON calendar file
+  (race_calendar.load_calendar) or --events "2025:Monaco Grand Prix" ...
+- Missing FP lap files are fetched first, every event concurrently (fastf1_loader)
+- Each event is preprocessed with its own race_calendar config (track indicators, weather)
+  and predicted by both the ML model and the logic predictor (track bonus + Monte Carlo)
+- Events run in parallel worker processes that share one loaded model: the parent loads
+  the artifacts once, workers memory-map the same .trees export (one copy in the page cache)
+  and receive the compiled FeatureMatrixBuilder, so no worker unpickles sklearn/xgboost
+Outputs: <gp>_<year>_predictions.csv per event, plus one summary row per event.
+Usage: python batch_predict.py --season 2025 [--workers 4] [--scenarios 20000]
+       python batch_predict.py --calendar calendar.json [--data-dir DIR] [--offline]
+       python batch_predict.py --events "2025:Spanish Grand Prix" "2025:Monaco Grand Prix"
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+from instrumentation import add_arguments, configure_from_args, stage
+from project_paths import DATA_DIR, paths_for
+from race_calendar import load_calendar, parse_event, season_calendar
+
+SUMMARY_FILE = "batch_predictions_summary.csv"
+SIMULATION_SCENARIOS = 20_000
+_shared = {}
+
+
+# === Shared model ===
+def share_model(model_dir, share_dir):
+    """
+    Load the artifacts once (as pipeline.predict does: unscaled, median-imputed) and return
+    (path every worker can memory-map, compiled FeatureMatrixBuilder).
+    A pickled model without an up-to-date .trees export is exported into share_dir.
+    """
+    from prediction_server import MODEL_PATTERN, RaceModelArtifacts
+    from tree_export import TreeEnsemble, export_model
+
+    model_paths = sorted(glob.glob(os.path.join(model_dir, MODEL_PATTERN)))
+    if not model_paths:
+        raise FileNotFoundError(f"No {MODEL_PATTERN} in {model_dir}")
+    artifacts = RaceModelArtifacts(model_paths[0], imputer_path=os.path.join(model_dir, "imputer.pkl"),
+                                   features_path=os.path.join(model_dir, "race_model_features.txt"),
+                                   use_scaler=False)
+    if isinstance(artifacts.model, TreeEnsemble):
+        return artifacts.model_path, artifacts.builder
+    trees_path = os.path.join(share_dir, os.path.basename(os.path.splitext(artifacts.model_path)[0]) + ".trees")
+    export_model(artifacts.model, trees_path, artifacts.builder.columns)
+    return trees_path, artifacts.builder
+
+
+def _init_worker(trees_path, builder, stats_index_file):
+    from threadpoolctl import threadpool_limits
+    from tree_export import TreeEnsemble
+
+    _shared["model"] = TreeEnsemble.load(trees_path)
+    _shared["builder"] = builder
+    _shared["stats_index"] = None
+    if stats_index_file and os.path.exists(stats_index_file):
+        from stats_index import StatsIndex
+        _shared["stats_index"] = StatsIndex.load(stats_index_file)
+    # One event per process: keep numpy/BLAS single-threaded
+    _shared["limits"] = threadpool_limits(1)
+
+
+# === One event (runs in a worker) ===
+def predict_event(event, practice_path, output, n_scenarios=SIMULATION_SCENARIOS, seed=42):
+    """ML + logic predictions for one event; writes its per-driver table and returns a summary row"""
+    from dtype_schema import read_csv_typed
+    from prediction_server import driver_positions
+    from preprocess_fpdata_for_prediction import preprocess_practice_data
+    from spanish_gp_2025_predictor import RealisticSpanishGPPredictor
+
+    start = time.perf_counter()
+    event_name = f"{event['gp_name']} {event['year']}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        practice = preprocess_practice_data(read_csv_typed(practice_path), event=event, verbose=False)
+
+        # ML model: one fused feature matrix for every lap, mean prediction per driver
+        X = _shared["builder"].transform(practice, impute_missing=True)
+        ml = pd.DataFrame(driver_positions(practice, _shared["model"].predict(X)))
+
+        # Logic predictor with this event's track bonus
+        predictor = RealisticSpanishGPPredictor(stats_index=_shared["stats_index"],
+                                                track_bonus=event["track_bonus"], event_name=event_name)
+        predictor.practice_data = practice[["Driver", "Team", "Session"]].assign(Time=practice["LapTimeSeconds"])
+        predictor.calculate_practice_performance().predict_race_positions()
+        predictor.simulate_race(n_scenarios=n_scenarios, seed=seed)
+
+    results = (ml.rename(columns={"PredictedScore": "ML_Score", "PredictedPosition": "ML_Position"})
+               .merge(predictor.results[["Driver", "Team", "Position"]].rename(columns={"Position": "Logic_Position"}),
+                      on="Driver", how="outer")
+               .merge(predictor.simulation[["Driver", "Win_Probability", "Podium_Probability",
+                                            "Expected_Position"]], on="Driver", how="left")
+               .sort_values("ML_Position").reset_index(drop=True))
+    results.insert(0, "GrandPrix", event["gp_name"])
+    results.insert(0, "Year", event["year"])
+    results.to_csv(output, index=False)
+
+    return {
+        "Year": event["year"],
+        "GrandPrix": event["gp_name"],
+        "Laps": len(practice),
+        "Drivers": len(results),
+        "ML_Winner": results["Driver"].iloc[0],
+        "Logic_Winner": predictor.results["Driver"].iloc[0],
+        "Favourite": predictor.simulation["Driver"].iloc[0],
+        "Favourite_Win_Probability": predictor.simulation["Win_Probability"].iloc[0],
+        "Seconds": round(time.perf_counter() - start, 3),
+        "Output": output,
+    }
+
+
+# === Calendar ===
+def fetch_missing(events, practice_paths, cache_dir, offline=False, fixture_dir=None):
+    """Fetch FP laps for events without a practice file (one concurrent load per session set)"""
+    from fastf1_loader import fetch_sessions, practice_laps
+
+    missing = [(event, path) for event, path in zip(events, practice_paths) if not os.path.exists(path)]
+    by_sessions = {}
+    for event, path in missing:
+        by_sessions.setdefault(tuple(event["sessions"]), []).append((event, path))
+    for sessions, group in by_sessions.items():
+        loaded = fetch_sessions([(event["year"], event["gp_name"]) for event, _ in group], list(sessions),
+                                cache_dir=cache_dir, offline=offline, fixture_dir=fixture_dir)
+        for event, path in group:
+            own = {key: data for key, data in loaded.items() if key[:2] == (event["year"], event["gp_name"])}
+            practice_laps(own).to_csv(path, index=False)
+    return [path for _, path in missing]
+
+
+def predict_calendar(events, data_dir=DATA_DIR, model_dir=None, stats_index_file=None, workers=None,
+                     n_scenarios=SIMULATION_SCENARIOS, seed=42, fetch=True, offline=False, fixture_dir=None,
+                     summary_file=None):
+    """Predict every event; returns the summary table (one row per event, calendar order)"""
+    base = paths_for(data_dir)
+    model_dir = model_dir or base["model_dir"]
+    stats_index_file = stats_index_file or base["stats_index"]
+    event_paths = [paths_for(data_dir, year=event["year"], gp_name=event["gp_name"]) for event in events]
+    practice_paths = [paths["practice"] for paths in event_paths]
+
+    if fetch:
+        with stage("fetch") as rec:
+            rec.wrote(*fetch_missing(events, practice_paths, base["cache_dir"], offline, fixture_dir))
+    absent = [path for path in practice_paths if not os.path.exists(path)]
+    if absent:
+        raise FileNotFoundError(f"No practice laps for {len(absent)} event(s): {', '.join(absent)}")
+
+    tasks = [(event, practice, paths["predictions"], n_scenarios, seed)
+             for event, practice, paths in zip(events, practice_paths, event_paths)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    share_dir = tempfile.mkdtemp(prefix="race_batch_")
+    try:
+        with stage("load_model"):
+            trees_path, builder = share_model(model_dir, share_dir)
+        initargs = (trees_path, builder, stats_index_file)
+        with stage("predict_events", events=len(tasks), workers=workers) as rec:
+            if workers == 1:
+                _init_worker(*initargs)
+                rows = [predict_event(*task) for task in tasks]
+            else:
+                # spawn: xgboost/OpenMP state must not be inherited through fork
+                with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                         initializer=_init_worker, initargs=initargs) as pool:
+                    rows = list(pool.map(predict_event, *zip(*tasks)))
+            rec.rows = sum(row["Laps"] for row in rows)
+            rec.wrote(*[row["Output"] for row in rows])
+    finally:
+        shutil.rmtree(share_dir, ignore_errors=True)
+
+    summary = pd.DataFrame(rows)
+    if summary_file:
+        summary.to_csv(summary_file, index=False)
+    return summary
+
+
+def calendar_from_args(args):
+    """--calendar file, else --events, else the built-in --season calendar"""
+    if args.calendar:
+        return load_calendar(args.calendar)
+    if args.events:
+        return [parse_event(text) for text in args.events]
+    return season_calendar(args.season)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict every event of a race calendar")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--season", type=int, default=2025, help="built-in season calendar (default: %(default)s)")
+    parser.add_argument("--calendar", default=None, help="JSON calendar file (race_calendar.load_calendar)")
+    parser.add_argument("--events", nargs="+", default=None, help='events as "YEAR:Grand Prix"')
+    parser.add_argument("--model-dir", default=None)
+    parser.add_argument("--stats-index", default=None)
+    parser.add_argument("--workers", type=int, default=None, help="parallel events (default: all cores)")
+    parser.add_argument("--scenarios", type=int, default=SIMULATION_SCENARIOS, help="Monte Carlo races per event")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-fetch", action="store_true", help="only use existing practice files")
+    parser.add_argument("--offline", action="store_true", help="FastF1 cache/fixtures only")
+    parser.add_argument("--fixtures", default=None, help="recorded FP session folders")
+    parser.add_argument("--summary", default=None, help=f"summary CSV (default: <data dir>/{SUMMARY_FILE})")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    start = time.perf_counter()
+    summary_file = args.summary or os.path.join(args.data_dir, SUMMARY_FILE)
+    summary = predict_calendar(calendar_from_args(args), args.data_dir, args.model_dir, args.stats_index,
+                               args.workers, args.scenarios, args.seed, fetch=not args.no_fetch,
+                               offline=args.offline, fixture_dir=args.fixtures, summary_file=summary_file)
+    print(summary[["Year", "GrandPrix", "Laps", "ML_Winner", "Logic_Winner", "Favourite_Win_Probability",
+                   "Seconds"]].to_string(index=False))
+    print(f"📄 Summary saved to: {summary_file}")
+    print(f"🏁 {len(summary)} events predicted in {time.perf_counter() - start:.2f}s")
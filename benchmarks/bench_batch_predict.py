@@ -0,0 +1,86 @@
+"""
+Created on Thu Jun 26 14:20:51 2025
+
+@author: sid
+Benchmark: batch prediction of a full season (batch_predict.py) vs a single race.
+- A race model (median imputer + XGBoost) is fitted on synthetic preprocessed practice laps
+- Every event of the built-in 2025 calendar gets its own synthetic FP lap file
+- Times predict_calendar() for one event, then for the whole calendar on the worker pool;
+  the season should cost a small multiple of one race, not 24x
+Usage: python benchmarks/bench_batch_predict.py [workers] [scenarios]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+from sklearn.impute import SimpleImputer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from batch_predict import predict_calendar  # noqa: E402
+from feature_matrix import read_feature_list  # noqa: E402
+from model_comparison import candidate_models  # noqa: E402
+from preprocess_fpdata_for_prediction import preprocess_practice_data  # noqa: E402
+from project_paths import FEATURES_LIST_FILE, paths_for  # noqa: E402
+from race_calendar import event_config, season_calendar  # noqa: E402
+from synthetic_data import make_practice_laps, write_practice_file  # noqa: E402
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else None
+SCENARIOS = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+SEASON = 2025
+MODEL_NAME = "XGBoost"
+
+
+def write_model(model_dir):
+    """Race-model artifacts in the layout train_model.py writes"""
+    os.makedirs(model_dir, exist_ok=True)
+    features = read_feature_list(FEATURES_LIST_FILE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        laps = preprocess_practice_data(make_practice_laps(seed=0), event=event_config())
+    # Target: finishing order follows the driver's average pace
+    y = laps["DriverAvgPace"].rank(method="dense").clip(upper=20).to_numpy()
+    imputer = SimpleImputer(strategy="median").fit(laps[features])
+    model = candidate_models(n_jobs=1)[MODEL_NAME].fit(imputer.transform(laps[features]), y)
+    with open(os.path.join(model_dir, "race_model_features.txt"), "w") as f:
+        f.write("".join(f"{col}\n" for col in features))
+    joblib.dump(imputer, os.path.join(model_dir, "imputer.pkl"))
+    joblib.dump(model, os.path.join(model_dir, f"best_race_model_{MODEL_NAME}.pkl"))
+
+
+def timed(events, data_dir, model_dir, workers):
+    start = time.perf_counter()
+    summary = predict_calendar(events, data_dir, model_dir, workers=workers, n_scenarios=SCENARIOS, fetch=False)
+    return time.perf_counter() - start, summary
+
+
+if __name__ == "__main__":
+    events = season_calendar(SEASON)
+    with tempfile.TemporaryDirectory() as data_dir:
+        model_dir = os.path.join(data_dir, "models")
+        write_model(model_dir)
+        for i, event in enumerate(events):
+            write_practice_file(paths_for(data_dir, year=event["year"], gp_name=event["gp_name"])["practice"],
+                                year=event["year"], gp=event["gp_name"].split()[0], seed=i)
+        print(f"🏎️  Batch prediction: {len(events)} events of {SEASON}, {SCENARIOS:,} Monte Carlo races each")
+
+        spanish = [event for event in events if event["gp_name"] == "Spanish Grand Prix"]
+        t_one, one = timed(spanish, data_dir, model_dir, workers=1)
+        print(f"  1 event (in process)        {t_one:7.2f}s  ({one['Seconds'].iloc[0]:.2f}s in predict_event)")
+
+        t_serial, _ = timed(events, data_dir, model_dir, workers=1)
+        print(f"  {len(events)} events (in process)      {t_serial:7.2f}s  ({t_serial / t_one:4.1f}x one event)")
+
+        t_season, season = timed(events, data_dir, model_dir, workers=WORKERS)
+        workers = WORKERS or min(os.cpu_count() or 1, len(events))
+        print(f"  {len(events)} events ({workers} workers)      {t_season:7.2f}s  ({t_season / t_one:4.1f}x one event)")
+
+        print(f"\n{'Grand Prix':<26} {'Laps':>6} {'ML':>4} {'Logic':>6} {'Fav.':>5} {'Win %':>6}")
+        for _, row in season.iterrows():
+            print(f"{row['GrandPrix']:<26} {row['Laps']:>6,} {row['ML_Winner']:>4} {row['Logic_Winner']:>6} "
+                  f"{row['Favourite']:>5} {row['Favourite_Win_Probability']:6.1%}")
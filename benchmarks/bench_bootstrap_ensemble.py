@@ -0,0 +1,93 @@
+"""
+Created on Tue Jul  1 14:37:12 2025
+
+@author: sid
+Benchmark: bootstrap ensemble memory and time (bootstrap_ensemble.py) on synthetic race data.
+- Shared: one float32 matrix in /dev/shm, memory-mapped by every worker, replicates as sample_weight counts
+- Copied (the naive way): every task is sent the float64 training matrix and fits on a row-resampled copy
+- Per-worker private memory (the part not shared between processes) and wall time for each,
+  at a few ensemble sizes: shared should stay flat in the number of members
+- Intervals: per-driver score / position quantiles on spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv
+Usage: python benchmarks/bench_bootstrap_ensemble.py [--seasons 1] [--members 4 8 16] [--workers 2]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from sklearn.impute import SimpleImputer
+from threadpoolctl import threadpool_limits
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "clean_data"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_hyperparameter_search import write_features  # noqa: E402
+from bootstrap_ensemble import (DEFAULT_MODEL, bootstrap_weights, predict_intervals, private_mb,  # noqa: E402
+                                train_bootstrap_ensemble)
+from model_comparison import candidate_models, core_budget  # noqa: E402
+from train_model import load_training_data  # noqa: E402
+
+FP_DATA_PATH = os.path.join(ROOT, "spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv")
+
+
+def _fit_copied(X, y, codes, member):
+    """Baseline task: X arrives pickled, the replicate is a row-resampled copy of it"""
+    with threadpool_limits(1):
+        counts = bootstrap_weights(np.random.default_rng([0, member]), codes, int(codes.max()) + 1)
+        rows = np.repeat(np.arange(len(y)), counts.astype(np.int64))
+        model = candidate_models(n_jobs=1)[DEFAULT_MODEL]
+        model.fit(X[rows], y[rows])
+        return private_mb()
+
+
+def copied_baseline(X, y, codes, n_models, workers):
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        private = list(pool.map(_fit_copied, *zip(*[(X, y, codes, member) for member in range(n_models)])))
+    return time.perf_counter() - start, max(private)
+
+
+def shared_run(features_path, model_dir, n_models, workers):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        members = train_bootstrap_ensemble(features_path, model_dir, n_models, DEFAULT_MODEL, workers)
+    return time.perf_counter() - start, members["WorkerPrivateMB"].max(), members["OOB_MAE"].mean()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap ensemble benchmark on synthetic F1 data")
+    parser.add_argument("--seasons", type=int, default=1)
+    parser.add_argument("--members", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        features_path = write_features(work_dir, args.seasons)
+        X, y, groups = load_training_data(features_path)
+        codes = np.unique(groups.astype(str), return_inverse=True)[1]
+        X = SimpleImputer(strategy="median").fit_transform(X)
+        y = y.to_numpy(dtype=float)
+        workers, _ = core_budget(max(args.members), args.workers)
+        print(f"🏎️  Bootstrap benchmark: {len(y):,} race laps x {X.shape[1]} features "
+              f"({X.nbytes / 1e6:.1f} MB float64), {DEFAULT_MODEL} members on {workers} workers")
+
+        model_dir = os.path.join(work_dir, "models")
+        print(f"\n{'members':>8} {'shared s':>9} {'shared MB':>10} {'copied s':>9} {'copied MB':>10} {'OOB MAE':>8}")
+        for n_models in args.members:
+            shared_s, shared_mb, oob_mae = shared_run(features_path, model_dir, n_models, args.workers)
+            copied_s, copied_mb = copied_baseline(X, y, codes, n_models, workers)
+            print(f"{n_models:>8} {shared_s:>9.2f} {shared_mb:>10.1f} {copied_s:>9.2f} {copied_mb:>10.1f} "
+                  f"{oob_mae:>8.3f}")
+        print("(MB: largest private memory of one worker)")
+
+        intervals = predict_intervals(FP_DATA_PATH, model_dir)
+        print(f"\nIntervals from {max(args.members)} members, {os.path.basename(FP_DATA_PATH)}:")
+        print(intervals.round(2).to_string(index=False))
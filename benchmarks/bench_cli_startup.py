@@ -0,0 +1,87 @@
+"""
+Created on Mon Jun 23 10:02:31 2025
+
+@author: sid
+Start-up budget for cli.py.
+- Wall time of `cli.py --help` and `cli.py <subcommand> --help` in fresh interpreters
+  (median of N runs) against cli.IMPORT_BUDGET_MS
+- Cumulative import time per module from `python -X importtime` (largest first)
+- Heavy libraries must not be imported just to build the parser
+Exits with status 1 when a check fails.
+Usage: python benchmarks/bench_cli_startup.py [runs]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from cli import IMPORT_BUDGET_MS, build_parser  # noqa: E402
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "xgboost", "fastf1", "pyarrow", "joblib", "requests"]
+TOP_IMPORTS = 10
+
+
+def startup_ms(argv):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, "cli.py")] + argv, cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def import_times(argv):
+    """[(cumulative µs, module)] for the top-level imports of one run"""
+    result = subprocess.run([sys.executable, "-X", "importtime", os.path.join(ROOT, "cli.py")] + argv, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):  # nested imports are already in their parent's cumulative time
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)
+
+
+if __name__ == "__main__":
+    subcommands = [name for action in build_parser()._actions
+                   if isinstance(action, argparse._SubParsersAction) for name in action.choices]
+    failed = []
+
+    print(f"🏎️  cli.py start-up (median of {RUNS} runs, budget {IMPORT_BUDGET_MS} ms)")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter_ms = (time.perf_counter() - start) * 1000
+    print(f"{'bare interpreter':<24} {interpreter_ms:8.1f} ms")
+
+    for argv in [["--help"]] + [[name, "--help"] for name in subcommands]:
+        elapsed = startup_ms(argv)
+        ok = elapsed <= IMPORT_BUDGET_MS
+        if not ok:
+            failed.append(" ".join(argv))
+        print(f"{' '.join(argv):<24} {elapsed:8.1f} ms {'✅' if ok else '❌'}")
+
+    print("\nTop-level imports of `cli.py --help` (cumulative):")
+    for cumulative, name in import_times(["--help"])[:TOP_IMPORTS]:
+        print(f"  {name:<28} {cumulative / 1000:7.1f} ms")
+
+    probe = ("import sys; sys.path.insert(0, sys.argv[1]); import cli; cli.build_parser(); "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", probe, ROOT], capture_output=True, text=True,
+                            check=True).stdout.strip()
+    if loaded:
+        failed.append(f"heavy imports: {loaded}")
+    print(f"\nHeavy modules loaded by the parser: {loaded or 'none'}")
+
+    if failed:
+        print(f"❌ Over budget: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ All start-up checks within budget")
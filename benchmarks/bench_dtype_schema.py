@@ -0,0 +1,61 @@
+"""
+Created on Sun Jun 15 10:41:19 2025
+
+@author: sid
+Before/after memory footprint of the combined 2024-2025 cleaned dataset:
+default read_csv inference vs dtype_schema.read_csv_typed.
+Usage: python benchmarks/bench_dtype_schema.py [combined_csv]
+Without an argument a synthetic 2024+2025 dataset is built first.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "clean_data"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dtype_schema import memory_footprint_mb, read_csv_typed  # noqa: E402
+from feature_engineering import engineer_features  # noqa: E402
+from session_ingest import ingest_sessions  # noqa: E402
+from synthetic_data import write_session_tree  # noqa: E402
+
+
+def synthetic_combined_csv(tmp):
+    raw_dir = os.path.join(tmp, "raw")
+    write_session_tree(raw_dir, seasons=[2024, 2025])
+    with contextlib.redirect_stdout(io.StringIO()):
+        combined = pd.concat([ingest_sessions(raw_dir, year) for year in ("2024", "2025")], ignore_index=True)
+    path = os.path.join(tmp, "final_features_cleaned.csv")
+    engineer_features(combined).to_csv(path, index=False)
+    return path
+
+
+def report(label, path, reader):
+    start = time.perf_counter()
+    df = reader(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {memory_footprint_mb(df):>10.1f} MB {elapsed:>8.2f}s  ({len(df):,} rows)")
+    return df
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        path = sys.argv[1] if len(sys.argv) > 1 else synthetic_combined_csv(tmp)
+        print(f"🏎️  Memory footprint of {os.path.basename(path)}")
+        before = report("default inference", path, lambda p: pd.read_csv(p, low_memory=False))
+        after = report("dtype_schema", path, read_csv_typed)
+        print(f"reduction: {memory_footprint_mb(before) / memory_footprint_mb(after):.1f}x")
+
+        per_column = pd.DataFrame({
+            "before_MB": before.memory_usage(deep=True, index=False) / 1e6,
+            "after_MB": after.memory_usage(deep=True, index=False) / 1e6,
+            "dtype": after.dtypes.astype(str),
+        }).sort_values("before_MB", ascending=False)
+        print(per_column.head(20).round(2).to_string())
@@ -0,0 +1,77 @@
+"""
+Created on Tue Jun 10 10:37:52 2025
+
+@author: sid
+Benchmark: groupby + merge-back (old feature_engineering.py) vs feature_engine.add_group_features
+on a synthetic lap table (default 5M laps). Reports runtime and tracemalloc peak.
+Usage: python benchmarks/bench_feature_engine.py [n_laps]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feature_engine import LAP_GROUP_FEATURES, add_group_features  # noqa: E402
+
+N_LAPS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+
+
+def synthetic_laps(n, seed=42):
+    rng = np.random.default_rng(seed)
+    drivers = np.array([f"D{i:02d}" for i in range(24)])
+    teams = np.array([f"T{i:02d}" for i in range(12)])
+    driver_idx = rng.integers(0, len(drivers), n)
+    folders = np.array([f"20{y}_{r:02d}_GP_{s}" for y in range(15, 25) for r in range(1, 25)
+                        for s in ("FP1", "FP2", "FP3", "Q", "R")])
+    return pd.DataFrame({
+        "Driver": drivers[driver_idx],
+        "Team": teams[driver_idx // 2],
+        "SessionFolder": folders[rng.integers(0, len(folders), n)],
+        "LapTimeSeconds": rng.normal(80, 3, n),
+        "Stint": rng.integers(1, 4, n).astype(float),
+    })
+
+
+def legacy_merges(df):
+    driver_avg = df.groupby("Driver")["LapTimeSeconds"].mean().rename("DriverAvgPace")
+    df = df.merge(driver_avg, on="Driver", how="left")
+    team_median = df.groupby("Team")["LapTimeSeconds"].median().rename("TeamMedianPace")
+    df = df.merge(team_median, on="Team", how="left")
+    lap_counts = df.groupby(["Driver", "SessionFolder"]).size().rename("DriverSessionLapCount")
+    return df.merge(lap_counts, on=["Driver", "SessionFolder"], how="left")
+
+
+def engine(df):
+    return add_group_features(df, LAP_GROUP_FEATURES)
+
+
+def measure(fn, df):
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = fn(df)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+if __name__ == "__main__":
+    base = synthetic_laps(N_LAPS)
+    print(f"🏎️  Feature engine benchmark on {N_LAPS:,} laps "
+          f"(input {base.memory_usage(deep=True).sum() / 1e6:.0f} MB)")
+
+    legacy, t_legacy, m_legacy = measure(legacy_merges, base.copy())
+    fast, t_fast, m_fast = measure(engine, base.copy())
+
+    for col in ["DriverAvgPace", "TeamMedianPace", "DriverSessionLapCount"]:
+        np.testing.assert_allclose(legacy[col].to_numpy(), fast[col].to_numpy(), rtol=1e-12)
+
+    print(f"{'method':<10} {'time (s)':>9} {'peak alloc (MB)':>16}")
+    print(f"{'merge':<10} {t_legacy:>9.2f} {m_legacy / 1e6:>16.0f}")
+    print(f"{'engine':<10} {t_fast:>9.2f} {m_fast / 1e6:>16.0f}")
+    print(f"speedup {t_legacy / t_fast:.1f}x, peak memory {m_legacy / m_fast:.1f}x lower")
@@ -0,0 +1,112 @@
+"""
+Created on Wed Jun 25 10:12:44 2025
+
+@author: sid
+Benchmark: building the race-model input matrix from the preprocessed practice laps.
+- before: reindex(features) + apply(to_numeric) + imputer.transform + scaler.transform
+- after:  FeatureMatrixBuilder.transform into a preallocated float32 matrix
+Both must agree to float32 precision; schema drift (missing / non-numeric columns,
+reordered artifacts) must raise SchemaDriftError.
+A median SimpleImputer + StandardScaler are fitted on the race_model_features.txt columns
+of spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv, which is then tiled up to each row count.
+Usage: python benchmarks/bench_feature_matrix.py [max_rows]
+"""
+
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from feature_matrix import FeatureMatrixBuilder, SchemaDriftError, read_feature_list  # noqa: E402
+from project_paths import FEATURES_LIST_FILE  # noqa: E402
+
+FP_DATA_PATH = os.path.join(ROOT, "spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv")
+MAX_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+ROW_COUNTS = [n for n in (20, 1_000, 100_000, 1_000_000) if n <= MAX_ROWS]
+REPEATS = 5
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def reference_matrix(df, features, imputer, scaler):
+    X = df.reindex(columns=features).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    return scaler.transform(imputer.transform(X))
+
+
+def median_of(fn, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def peak_mb(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def expect_drift(label, fn):
+    try:
+        fn()
+    except SchemaDriftError as e:
+        print(f"  ✅ {label}: {e}")
+        return True
+    print(f"  ❌ {label}: no SchemaDriftError")
+    return False
+
+
+if __name__ == "__main__":
+    features = read_feature_list(FEATURES_LIST_FILE)
+    laps = pd.read_csv(FP_DATA_PATH)
+    # Some gaps so the imputation path is exercised
+    laps.loc[laps.index[::7], features[0]] = np.nan
+    imputer = SimpleImputer(strategy="median").fit(laps[features])
+    scaler = StandardScaler().fit(imputer.transform(laps[features]))
+    builder = FeatureMatrixBuilder.from_artifacts(features, imputer, scaler)
+    print(f"🏎️  Feature matrix benchmark: {laps.shape[1]}-column practice table -> {len(builder.columns)} features")
+
+    ok = True
+    for n_rows in ROW_COUNTS:
+        df = laps.iloc[np.arange(n_rows) % len(laps)].reset_index(drop=True)
+        expected = reference_matrix(df, features, imputer, scaler).astype(np.float32)
+        out = builder.allocate(n_rows)
+        builder.transform(df, out=out)
+        same = np.allclose(out, expected, rtol=1e-6, atol=1e-6)
+        ok &= same
+
+        t_before = median_of(lambda: reference_matrix(df, features, imputer, scaler))
+        t_after = median_of(lambda: builder.transform(df, out=out))
+        mb_before = peak_mb(lambda: reference_matrix(df, features, imputer, scaler))
+        mb_after = peak_mb(lambda: builder.transform(df, out=out))
+        print(f"  {n_rows:>9,} rows  before {t_before * 1000:9.2f} ms {mb_before:8.1f} MB   "
+              f"after {t_after * 1000:9.2f} ms {mb_after:8.1f} MB  ({t_before / t_after:5.1f}x) "
+              f"{'✅' if same else '❌ mismatch'}")
+
+    print("\nSchema drift:")
+    sample = laps.head(20)
+    ok &= expect_drift("missing column", lambda: builder.transform(sample.drop(columns=features[-1])))
+    ok &= expect_drift("non-numeric column", lambda: builder.transform(sample.assign(**{features[1]: "n/a"})))
+    ok &= expect_drift("reordered feature list",
+                       lambda: FeatureMatrixBuilder.from_artifacts(features[::-1], imputer, scaler))
+    ok &= expect_drift("feature list longer than the imputer",
+                       lambda: FeatureMatrixBuilder.from_artifacts(features + ["Extra"], imputer, scaler))
+    imputed = builder.transform(sample.drop(columns=features[-1]), impute_missing=True)
+    print(f"  ✅ impute_missing fills {features[-1]} with {imputed[0, -1]:.4f} (scaled training median)")
+
+    if not ok:
+        sys.exit(1)
+    print("✅ Fused transform matches imputer + scaler")
@@ -0,0 +1,158 @@
+"""
+Created on Mon Jun 30 15:48:19 2025
+
+@author: sid
+Benchmark: budgeted hyperparameter search (hyperparameter_search.py) on synthetic race data.
+- XGBoost trials with one prebuilt QuantileDMatrix pair per fold vs a new one for every trial
+- A Hyperband run under a wall-clock budget: fits done, time used, best CV MAE against the
+  hand-set DEFAULT_PARAMS of each family on the same folds
+- Resume: the same search again continues from the trial log (no logged fit is repeated)
+- Reproducibility: train_model.py with the written best config must report its cv_mae
+Usage: python benchmarks/bench_hyperparameter_search.py [--seasons 1] [--budget 60]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+import xgboost as xgb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "clean_data"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import hyperparameter_search as search  # noqa: E402
+from columnar_store import write_table  # noqa: E402
+from data_combiner_2024_2025 import combine_seasons  # noqa: E402
+from feature_engineering import engineer_features  # noqa: E402
+from model_comparison import DEFAULT_PARAMS, make_folds  # noqa: E402
+from project_paths import BEST_CONFIG_FILE, SEARCH_TRIALS_FILE  # noqa: E402
+from session_ingest import ingest_sessions  # noqa: E402
+from synthetic_data import seasons_for, write_session_tree  # noqa: E402
+from train_model import load_training_data, train_race_model  # noqa: E402
+
+XGB_TRIALS = 10
+XGB_TREES = 200
+FINISH_NOISE = 3.0  # positions; synthetic races otherwise finish exactly on the grid
+
+
+def write_features(work_dir, n_seasons):
+    """Synthetic raw sessions -> cleaned -> combined -> feature table (as bench_pipeline.py)"""
+    years = seasons_for(n_seasons)
+    raw_dir = os.path.join(work_dir, "raw")
+    write_session_tree(raw_dir, seasons=years)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned = {year: ingest_sessions(raw_dir, str(year), verbose=False) for year in years}
+        features = engineer_features(combine_seasons(cleaned))
+    # GridPosition / Points would copy the target: shuffle each driver's finish a little
+    codes = pd.factorize(features["SessionFolder"].astype(str) + features["Driver"].astype(str))[0]
+    noise = np.random.default_rng(0).normal(0, FINISH_NOISE, codes.max() + 1)[codes]
+    features["FinalRacePosition"] = np.clip(np.round(features["FinalRacePosition"] + noise), 1, 20)
+    path = os.path.join(work_dir, "final_features_cleaned.parquet")
+    write_table(features, path)
+    return path
+
+
+def dmatrix_reuse(X, y, folds, stop_folds, rng):
+    """Seconds for XGB_TRIALS x folds trials: shared per-fold QuantileDMatrix vs rebuilt per trial"""
+    search._shared.update(X=X, y=y, folds=folds, stop_folds=stop_folds, threads=os.cpu_count() or 1, dmatrix={})
+    configs = [search.sample_params(rng, "XGBoost") for _ in range(XGB_TRIALS)]
+
+    start = time.perf_counter()
+    for params in configs:
+        for fold in range(len(folds)):
+            search._fit_trial("XGBoost", params, XGB_TREES, fold)
+    shared = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for params in configs:
+        for fold in range(len(folds)):
+            search._shared["dmatrix"] = {}
+            search._fit_trial("XGBoost", params, XGB_TREES, fold)
+    rebuilt = time.perf_counter() - start
+    return shared, rebuilt
+
+
+def default_mae(X, y, folds, stop_folds):
+    """CV MAE of every family with its hand-set parameters, on the search's folds"""
+    search._shared.update(X=X, y=y, folds=folds, stop_folds=stop_folds, threads=os.cpu_count() or 1, dmatrix={})
+    rows = {}
+    for name, params in DEFAULT_PARAMS.items():
+        params = {key: value for key, value in params.items() if key != "n_estimators"}
+        if name == "XGBoost":
+            # No early stopping: the defaults as train_model.py fits them
+            maes = []
+            for train_idx, test_idx in folds:
+                model = xgb.XGBRegressor(**DEFAULT_PARAMS[name], objective="reg:squarederror",
+                                         random_state=search.RANDOM_STATE)
+                model.fit(X[train_idx], y[train_idx])
+                maes.append(np.mean(np.abs(model.predict(X[test_idx]) - y[test_idx])))
+            rows[name] = float(np.mean(maes))
+        else:
+            trees = DEFAULT_PARAMS[name]["n_estimators"]
+            rows[name] = float(np.mean([search._fit_trial(name, params, trees, fold)["mae"]
+                                        for fold in range(len(folds))]))
+    return rows
+
+
+def run_search(features_path, model_dir, budget):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        search.tune_race_model(features_path, model_dir, budget_seconds=budget)
+    with open(os.path.join(model_dir, SEARCH_TRIALS_FILE)) as f:
+        fits = sum(1 for _ in f)
+    with open(os.path.join(model_dir, BEST_CONFIG_FILE)) as f:
+        config = json.load(f)
+    return time.perf_counter() - start, fits, config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter search benchmark on synthetic F1 data")
+    parser.add_argument("--seasons", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=60.0, help="search wall-clock budget in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        features_path = write_features(work_dir, args.seasons)
+        X, y, groups = load_training_data(features_path)
+        X = SimpleImputer(strategy="median").fit_transform(X)
+        y = y.to_numpy(dtype=float)
+        folds = make_folds(len(y), groups, 5)
+        stop_folds = search.early_stopping_folds(folds, groups)
+        print(f"🏎️  Search benchmark: {len(y):,} race laps x {X.shape[1]} features, {len(folds)} grouped folds")
+
+        shared, rebuilt = dmatrix_reuse(X, y, folds, stop_folds, np.random.default_rng(0))
+        n = XGB_TRIALS * len(folds)
+        print(f"\nXGBoost, {n} trials of up to {XGB_TREES} rounds (early stopping):")
+        print(f"  QuantileDMatrix per fold, reused   {shared:7.2f}s ({shared / n * 1e3:6.1f} ms per trial)")
+        print(f"  QuantileDMatrix rebuilt per trial  {rebuilt:7.2f}s ({rebuilt / n * 1e3:6.1f} ms per trial)")
+
+        defaults = default_mae(X, y, folds, stop_folds)
+        model_dir = os.path.join(work_dir, "models")
+        seconds, fits, config = run_search(features_path, model_dir, args.budget)
+        print(f"\nHyperband, {args.budget:.0f}s budget: {fits} fits in {seconds:.1f}s "
+              f"({'finished' if config['search']['finished'] else 'stopped by the budget'})")
+        for name, mae in sorted(defaults.items(), key=lambda item: item[1]):
+            print(f"  {name:<17} default params  CV MAE {mae:.3f}")
+        print(f"  {config['model']:<17} best config     CV MAE {config['cv_mae']:.3f} "
+              f"({config['search_mae']:.3f} in the search)  {config['params']}")
+
+        seconds, refits, config = run_search(features_path, model_dir, args.budget)
+        print(f"\nResumed: {fits} fits from the log + {refits - fits} new in {seconds:.1f}s, best now "
+              f"{config['model']} CV MAE {config['cv_mae']:.3f}")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            train_race_model(features_path, model_dir, cv_folds=5)
+        cv = pd.read_csv(os.path.join(model_dir, "model_comparison_cv.csv"))
+        reproduced = cv[cv["Model"] == config["model"]]["MAE"].mean()
+        print(f"train_model.py with the best config: {config['model']} CV MAE {reproduced:.3f} "
+              f"(best config cv_mae {config['cv_mae']:.3f})")
+        print(f"Written next to race_model_features.txt: {', '.join(sorted(os.listdir(model_dir)))}")
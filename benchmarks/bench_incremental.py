@@ -0,0 +1,61 @@
+"""
+Created on Wed Jun 11 11:20:09 2025
+
+@author: sid
+Benchmark: full build vs adding one race weekend to an incremental store
+(incremental_store.py) that already holds N seasons (default 10).
+Usage: python benchmarks/bench_incremental.py [n_seasons]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from incremental_store import IncrementalFeatureStore  # noqa: E402
+from synthetic_data import write_session_tree  # noqa: E402
+
+N_SEASONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+
+def quiet_timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, "raw")
+        store_dir = os.path.join(tmp, "store")
+        output = os.path.join(tmp, "final_features_cleaned.parquet")
+        seasons = list(range(2025 - N_SEASONS + 1, 2026))
+        years = [str(year) for year in seasons]
+
+        # Everything except the final round of the last season
+        write_session_tree(raw_dir, seasons=seasons[:-1])
+        write_session_tree(raw_dir, seasons=seasons[-1:], rounds=23)
+        print(f"🏎️  Incremental store benchmark: {N_SEASONS} seasons")
+
+        store = IncrementalFeatureStore(store_dir)
+        _, t_full_update = quiet_timed(lambda: store.update(raw_dir, years))
+        df, t_full_materialize = quiet_timed(lambda: store.materialize(output))
+        print(f"full build:        update {t_full_update:7.2f}s  materialize {t_full_materialize:6.2f}s  "
+              f"({len(df):,} rows)")
+
+        _, t_noop = quiet_timed(lambda: IncrementalFeatureStore(store_dir).update(raw_dir, years))
+        print(f"no-op update:      {t_noop:7.2f}s")
+
+        # New race weekend lands
+        write_session_tree(raw_dir, seasons=seasons[-1:], first_round=24, rounds=24, seed=2024)
+        store = IncrementalFeatureStore(store_dir)
+        _, t_add_update = quiet_timed(lambda: store.update(raw_dir, years))
+        df, t_add_materialize = quiet_timed(lambda: store.materialize(output))
+        print(f"add one race:      update {t_add_update:7.2f}s  materialize {t_add_materialize:6.2f}s  "
+              f"({len(df):,} rows)")
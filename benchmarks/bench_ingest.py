@@ -0,0 +1,43 @@
+"""
+Created on Sun Jun  8 11:02:48 2025
+
+@author: sid
+Benchmark: serial vs process-pool session ingestion (clean_data/session_ingest.py)
+on a synthetic tree of 24 rounds x 5 sessions x N seasons (default 5 -> 600 folders).
+Usage: python benchmarks/bench_ingest.py [n_seasons]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "clean_data"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from session_ingest import ingest_sessions  # noqa: E402
+from synthetic_data import write_session_tree  # noqa: E402
+
+N_SEASONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    with tempfile.TemporaryDirectory() as raw_dir:
+        # All seasons share one year prefix so a single ingest call sees every folder
+        folders = write_session_tree(raw_dir, seasons=[2024], rounds=24 * N_SEASONS)
+        print(f"🏎️  Ingestion benchmark on {len(folders)} synthetic session folders ({cores} cores)")
+
+        baseline = None
+        reference = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            df = ingest_sessions(raw_dir, "2024", workers=workers, verbose=False)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            if reference is None:
+                reference = df
+            else:
+                assert df.equals(reference), "parallel output differs from serial output"
+            print(f"workers={workers:<3} {elapsed:7.2f}s  speedup {baseline / elapsed:5.2f}x  rows={len(df):,}")
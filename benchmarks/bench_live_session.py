@@ -0,0 +1,103 @@
+"""
+Created on Fri Jun 27 11:02:47 2025
+
+@author: sid
+Benchmark: live session mode (live_session.py) vs the batch practice analysis.
+- Per-lap update cost in windows of laps while the session grows to N laps:
+  it must stay flat (no dependence on the laps already seen)
+- Batch cost of recomputing calculate_practice_performance after every lap, for comparison
+- Final live state vs calculate_practice_performance on the same laps: exact columns
+  (best lap, mean, std, progression) and the estimated ones (long-run pace, team median)
+Uses spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv, tiled (with jitter) up to N laps.
+Usage: python benchmarks/bench_live_session.py [n_laps]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from live_session import LiveSession, replay  # noqa: E402
+from spanish_gp_2025_predictor import RealisticSpanishGPPredictor  # noqa: E402
+
+FP_DATA_PATH = os.path.join(ROOT, "spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv")
+N_LAPS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+WINDOW = 10_000
+BATCH_SAMPLES = 20
+
+
+def batch_performance(laps):
+    predictor = RealisticSpanishGPPredictor()
+    predictor.practice_data = laps[["Driver", "Team", "Session"]].assign(Time=laps["LapTimeSeconds"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.calculate_practice_performance().predict_race_positions()
+    return predictor
+
+
+def compare(live, laps):
+    predictor = batch_performance(laps)
+    perf = predictor.performance_data
+    table = live.standings().set_index("Driver").loc[perf.index]
+    team_median = laps.astype({"Team": object}).groupby("Team")["LapTimeSeconds"].median()
+    rows = [
+        ("best lap", table["Best_Time"], perf["best_time"]),
+        ("mean pace", table["Avg_Pace"], laps.astype({"Driver": object}).groupby("Driver")["LapTimeSeconds"].mean()
+         .loc[perf.index]),
+        ("consistency (std)", table["Consistency"], perf["consistency"]),
+        ("progression", table["Progression"], perf["progression"]),
+        ("long-run pace", table["Long_Run_Pace"], perf["long_run_pace"]),
+        ("team median pace", table["Team_Median_Pace"], table["Team"].map(team_median)),
+    ]
+    print(f"\n{'Live vs batch':<20} {'max abs diff':>14} {'max rel diff':>14}")
+    for label, live_values, batch_values in rows:
+        diff = np.abs(live_values.to_numpy(dtype=float) - batch_values.to_numpy(dtype=float))
+        rel = diff / np.abs(batch_values.to_numpy(dtype=float))
+        print(f"{label:<20} {np.nanmax(diff):14.3g} {np.nanmax(rel):14.3g}")
+
+    live_order = live.order()
+    batch_order = list(predictor.performance_data.index[np.argsort(predictor._expected_positions().to_numpy(),
+                                                                   kind="stable")])
+    same = sum(a == b for a, b in zip(live_order, batch_order))
+    print(f"Predicted order: {same}/{len(batch_order)} positions identical "
+          f"(live top 5 {' '.join(live_order[:5])} | batch {' '.join(batch_order[:5])})")
+
+
+if __name__ == "__main__":
+    base = pd.read_csv(FP_DATA_PATH)
+    print(f"🏎️  Live session benchmark: {len(base):,} real laps, {N_LAPS:,} replayed")
+
+    live = replay(base)
+    compare(live, base)
+
+    rng = np.random.default_rng(0)
+    tiled = base.iloc[np.arange(N_LAPS) % len(base)].reset_index(drop=True)
+    tiled["LapTimeSeconds"] = tiled["LapTimeSeconds"] + rng.normal(0, 0.05, len(tiled))
+    drivers = tiled["Driver"].astype(object).to_numpy()
+    teams = tiled["Team"].astype(object).to_numpy()
+    sessions = tiled["Session"].astype(object).to_numpy()
+    times = tiled["LapTimeSeconds"].to_numpy()
+
+    print(f"\n{'Laps seen':>10} {'µs per lap (live)':>18}")
+    live = LiveSession()
+    for start in range(0, N_LAPS, WINDOW):
+        stop = min(start + WINDOW, N_LAPS)
+        t0 = time.perf_counter()
+        for i in range(start, stop):
+            live.add_lap(drivers[i], teams[i], sessions[i], times[i])
+        per_lap = (time.perf_counter() - t0) / (stop - start) * 1e6
+        if start == 0 or stop == N_LAPS or (start // WINDOW) % 5 == 0:
+            print(f"{stop:>10,} {per_lap:18.1f}")
+
+    print(f"\n{'Laps seen':>10} {'µs per lap (batch recompute)':>30}")
+    for n in (1_000, 10_000, min(N_LAPS, 100_000)):
+        t0 = time.perf_counter()
+        for _ in range(BATCH_SAMPLES):
+            batch_performance(tiled.iloc[:n])
+        print(f"{n:>10,} {(time.perf_counter() - t0) / BATCH_SAMPLES * 1e6:30.1f}")
+    compare(live, tiled)
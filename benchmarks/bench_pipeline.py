@@ -0,0 +1,173 @@
+"""
+Created on Thu Jun 19 09:12:37 2025
+
+@author: sid
+Benchmark suite: the whole pipeline on synthetic data of growing size.
+For each season count, a synthetic raw tree (24 rounds x 5 sessions x 20 drivers per
+season) and an FP1-FP3 practice file are generated, then every stage is run and measured:
+  clean -> combine -> features -> train          (race model branch)
+  preprocess_fp -> predict                       (race weekend branch)
+Each stage reports wall time, CPU time, peak RSS, tracemalloc peak, rows and bytes
+written (see instrumentation.py); sub-steps inside the stages are recorded too.
+Results go to a JSON file for comparison between runs.
+Usage: python benchmarks/bench_pipeline.py [--seasons 1 2 5] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "clean_data"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import joblib  # noqa: E402
+from sklearn.impute import SimpleImputer  # noqa: E402
+
+from columnar_store import read_table, write_table  # noqa: E402
+from data_combiner_2024_2025 import combine_seasons  # noqa: E402
+from dtype_schema import read_csv_typed  # noqa: E402
+from feature_engineering import engineer_features  # noqa: E402
+from instrumentation import configure, recorded, stage  # noqa: E402
+from model_comparison import candidate_models, core_budget  # noqa: E402
+from prediction_server import RaceModelArtifacts, driver_positions  # noqa: E402
+from preprocess_fpdata_for_prediction import preprocess_practice_data  # noqa: E402
+from session_ingest import ingest_sessions  # noqa: E402
+from spanish_gp_2025_predictor import RealisticSpanishGPPredictor  # noqa: E402
+from synthetic_data import seasons_for, write_practice_file, write_session_tree  # noqa: E402
+from train_model import load_training_data  # noqa: E402
+
+MAX_SEASONS = 20
+SIMULATION_SCENARIOS = 10_000
+
+
+def measure(stage_name, fn, verbose=False):
+    """Run fn() -> (rows, [paths written]) under instrumentation.stage and return its record"""
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink, stage(stage_name) as rec:
+        rows, outputs = fn()
+        rec.rows = int(rows)
+        rec.wrote(*outputs)
+    return [record for record in recorded() if record["stage"] == stage_name][-1]
+
+
+def run_pipeline(work_dir, n_seasons, model_name="XGBoost", verbose=False):
+    """All stages for one data size; returns the records of every stage and sub-step"""
+    years = seasons_for(n_seasons)
+    raw_dir = os.path.join(work_dir, "raw")
+    paths = {
+        "cleaned": {year: os.path.join(work_dir, f"final_cleaned_{year}_data.parquet") for year in years},
+        "combined": os.path.join(work_dir, "combined_cleaned_with_positions.parquet"),
+        "features": os.path.join(work_dir, "final_features_cleaned.parquet"),
+        "practice": os.path.join(work_dir, "practice_fp1_fp2_fp3.csv"),
+        "practice_preprocessed": os.path.join(work_dir, "practice_fp1_fp2_fp3_preprocessed.csv"),
+        "model": os.path.join(work_dir, f"best_race_model_{model_name}.pkl"),
+        "imputer": os.path.join(work_dir, "imputer.pkl"),
+        "feature_list": os.path.join(work_dir, "race_model_features.txt"),
+    }
+
+    start = time.perf_counter()
+    folders = write_session_tree(raw_dir, seasons=years)
+    write_practice_file(paths["practice"])
+    print(f"\n🏎️  {n_seasons} season(s): {len(folders)} session folders generated in "
+          f"{time.perf_counter() - start:.1f}s")
+
+    def clean():
+        rows = 0
+        for year in years:
+            df = ingest_sessions(raw_dir, str(year), verbose=False)
+            write_table(df, paths["cleaned"][year])
+            rows += len(df)
+        return rows, paths["cleaned"].values()
+
+    def combine():
+        df = combine_seasons({year: read_table(path) for year, path in paths["cleaned"].items()})
+        write_table(df, paths["combined"])
+        return len(df), [paths["combined"]]
+
+    def features():
+        df = engineer_features(read_table(paths["combined"]))
+        write_table(df, paths["features"])
+        return len(df), [paths["features"]]
+
+    def train():
+        X, y, _ = load_training_data(paths["features"])
+        with open(paths["feature_list"], "w") as f:
+            f.write("".join(f"{col}\n" for col in X.columns))
+        imputer = SimpleImputer(strategy="median")
+        X_imputed = imputer.fit_transform(X)
+        model = candidate_models(n_jobs=core_budget(1)[1])[model_name]
+        model.fit(X_imputed, y)
+        joblib.dump(imputer, paths["imputer"])
+        joblib.dump(model, paths["model"])
+        return len(X), [paths["feature_list"], paths["imputer"], paths["model"]]
+
+    def preprocess_fp():
+        df = preprocess_practice_data(read_csv_typed(paths["practice"]))
+        df.to_csv(paths["practice_preprocessed"], index=False)
+        return len(df), [paths["practice_preprocessed"]]
+
+    def predict():
+        practice = read_csv_typed(paths["practice_preprocessed"])
+        artifacts = RaceModelArtifacts(paths["model"], imputer_path=paths["imputer"],
+                                       features_path=paths["feature_list"], use_scaler=False, impute_missing=True)
+        driver_positions(practice, artifacts.predict(practice))
+
+        predictor = RealisticSpanishGPPredictor()
+        predictor.practice_data = practice[["Driver", "Team", "Session"]].assign(Time=practice["LapTimeSeconds"])
+        (predictor
+         .calculate_practice_performance()
+         .predict_race_positions()
+         .simulate_race(n_scenarios=SIMULATION_SCENARIOS, seed=0))
+        return len(practice), []
+
+    stages = [("clean", clean), ("combine", combine), ("features", features), ("train", train),
+              ("preprocess_fp", preprocess_fp), ("predict", predict)]
+    first = len(recorded())
+    for stage_name, fn in stages:
+        record = measure(stage_name, fn, verbose)
+        print(f"  {stage_name:<14} {record['wall_s']:8.2f}s wall {record['cpu_s']:8.2f}s cpu "
+              f"{record['peak_rss_mb']:8.1f} MB RSS {record['rows']:>10,} rows")
+    # every stage and sub-step of this run
+    return [dict(record, seasons=n_seasons) for record in recorded()[first:]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline benchmark on synthetic F1 data")
+    parser.add_argument("--seasons", type=int, nargs="+", default=[1, 2, 5],
+                        help=f"season counts to run (1-{MAX_SEASONS})")
+    parser.add_argument("--model", default="XGBoost", choices=list(candidate_models()))
+    parser.add_argument("--output", default="bench_pipeline_results.json")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip allocation tracing (less overhead)")
+    parser.add_argument("--verbose", action="store_true", help="show the stages' own output")
+    args = parser.parse_args()
+
+    if any(not 1 <= n <= MAX_SEASONS for n in args.seasons):
+        parser.error(f"--seasons must be between 1 and {MAX_SEASONS}")
+
+    configure(keep_records=True, trace_memory=not args.no_tracemalloc, script="bench_pipeline")
+    results = []
+    for n_seasons in sorted(set(args.seasons)):
+        with tempfile.TemporaryDirectory() as work_dir:
+            results.extend(run_pipeline(work_dir, n_seasons, args.model, args.verbose))
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "model": args.model,
+        "tracemalloc": not args.no_tracemalloc,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results saved to: {args.output}")
@@ -0,0 +1,73 @@
+"""
+Created on Thu Jun 12 09:48:30 2025
+
+@author: sid
+Benchmark: per-driver mask loop vs grouped calculate_practice_performance.
+Checks both return the same numbers on the bundled sample grid, then times a
+lap-level practice table (default 100 laps per driver per session).
+Usage: python benchmarks/bench_practice_performance.py [laps_per_session]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spanish_gp_2025_predictor import RealisticSpanishGPPredictor  # noqa: E402
+
+LAPS_PER_SESSION = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+METRICS = ['best_time', 'consistency', 'long_run_pace', 'progression']
+
+
+def legacy_performance(practice_data):
+    """Per-driver loop previously used by calculate_practice_performance"""
+    driver_performance = {}
+    for driver in practice_data['Driver'].unique():
+        driver_data = practice_data[practice_data['Driver'] == driver]
+        sorted_times = driver_data['Time'].sort_values()
+        fp1_times = driver_data[driver_data['Session'] == 'FP1']['Time']
+        fp3_times = driver_data[driver_data['Session'] == 'FP3']['Time']
+        driver_performance[driver] = {
+            'best_time': driver_data['Time'].min(),
+            'consistency': driver_data['Time'].std(),
+            'long_run_pace': sorted_times.iloc[int(len(sorted_times) * 0.25):].mean(),
+            'progression': fp1_times.min() - fp3_times.min() if len(fp1_times) and len(fp3_times) else 0,
+        }
+    return pd.DataFrame.from_dict(driver_performance, orient='index')
+
+
+def lap_level_practice(base, laps_per_session, seed=42):
+    rng = np.random.default_rng(seed)
+    laps = base.loc[base.index.repeat(laps_per_session)].reset_index(drop=True)
+    laps['Time'] = laps['Time'] + rng.gamma(2.0, 0.6, len(laps))
+    return laps
+
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor = RealisticSpanishGPPredictor().load_data('does_not_exist.csv')
+        predictor.calculate_practice_performance()
+
+    legacy = legacy_performance(predictor.practice_data)
+    fast = predictor.performance_data[METRICS]
+    assert list(legacy.index) == list(fast.index), "driver order differs"
+    assert np.array_equal(legacy[METRICS].to_numpy(), fast.to_numpy(), equal_nan=True), "metrics differ"
+    print("✅ Grouped metrics identical to the per-driver loop on the bundled sample grid")
+
+    laps = lap_level_practice(predictor.practice_data, LAPS_PER_SESSION)
+    start = time.perf_counter()
+    legacy_performance(laps)
+    t_legacy = time.perf_counter() - start
+
+    predictor.practice_data = laps
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.calculate_practice_performance()
+    t_fast = time.perf_counter() - start
+    print(f"🏎️  {len(laps):,} laps: loop {t_legacy:.3f}s, grouped {t_fast:.3f}s ({t_legacy / t_fast:.1f}x)")
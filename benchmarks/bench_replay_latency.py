@@ -0,0 +1,63 @@
+"""
+Created on Sat Jun 28 15:26:04 2025
+
+@author: sid
+Benchmark: lap arrival -> updated prediction latency under a replayed live-timing feed (replay_feed.py).
+- Direct LiveSession.add_lap cost (no feed) as the floor
+- Queue and loopback-socket transports at increasing constant rates, then unpaced (--max):
+  p50 / p99 / p99.9 / max latency, the rate actually reached and how late laps left (feed lag)
+- Latency should stay near the floor until the consumer saturates, then grow with the backlog
+Uses spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv, tiled to SECONDS_PER_RUN of laps at each rate.
+Usage: python benchmarks/bench_replay_latency.py [seconds_per_run]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from live_session import LiveSession, replay  # noqa: E402
+from replay_feed import feed_from_csv, run_replay  # noqa: E402
+
+FP_DATA_PATH = os.path.join(ROOT, "spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv")
+SECONDS_PER_RUN = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+RATES = [100, 1_000, 2_000, 5_000, 10_000, 0]  # laps/s; 0 = unpaced
+UNPACED_LAPS = 20_000
+
+
+def tiled(feed, n_laps):
+    return feed.iloc[np.arange(n_laps) % len(feed)].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    base = feed_from_csv(FP_DATA_PATH)
+    print(f"🏎️  Replay latency benchmark: {len(base):,} real laps, {SECONDS_PER_RUN:g}s per paced run")
+
+    laps = tiled(base, UNPACED_LAPS)
+    start = time.perf_counter()
+    replay(laps, LiveSession())
+    floor_us = (time.perf_counter() - start) / len(laps) * 1e6
+    print(f"Direct LiveSession.add_lap: {floor_us:.1f} µs per lap (max {1e6 / floor_us:,.0f} laps/s)\n")
+
+    rows = []
+    for transport in ("queue", "socket"):
+        for rate in RATES:
+            n_laps = UNPACED_LAPS if rate == 0 else max(len(base), int(rate * SECONDS_PER_RUN))
+            _, latency, lag, n, elapsed = run_replay(tiled(base, n_laps), transport=transport, rate=rate)
+            stats = latency.summary()
+            rows.append({
+                "transport": transport,
+                "target laps/s": "max" if rate == 0 else f"{rate:,}",
+                "laps": n,
+                "laps/s": round(n / elapsed),
+                "p50 ms": stats["p50_ms"],
+                "p99 ms": stats["p99_ms"],
+                "p99.9 ms": stats["p99.9_ms"],
+                "max ms": stats["max_ms"],
+                "lag p99 ms": lag.percentile(99),
+            })
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
@@ -0,0 +1,96 @@
+"""
+Created on Sun Jun 22 11:05:27 2025
+
+@author: sid
+Benchmark: historical stats index (stats_index.py) on a synthetic multi-season lap table.
+- Build from laps, save / load round trip, one-season incremental merge
+- Point lookups and season-range queries (µs per call)
+- attach() vs recomputing the grouped features (values must match)
+Usage: python benchmarks/bench_stats_index.py [n_laps]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_feature_engine import synthetic_laps  # noqa: E402
+from feature_engine import LAP_GROUP_FEATURES, add_group_features  # noqa: E402
+from stats_index import StatsIndex, lap_partials  # noqa: E402
+
+N_LAPS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+N_QUERIES = 100_000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def per_call_us(fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        fn(*arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+if __name__ == "__main__":
+    df = synthetic_laps(N_LAPS)
+    # FastF1 lap times are millisecond-exact
+    df["LapTimeSeconds"] = np.round(df["LapTimeSeconds"], 3)
+    df["Year"] = df["SessionFolder"].str[:4].astype(np.int64)
+    print(f"🏎️  Stats index benchmark on {N_LAPS:,} laps, {df['Year'].nunique()} seasons")
+
+    index, t_build = timed(lambda: StatsIndex.from_laps(df))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stats_index.parquet")
+        _, t_save = timed(lambda: index.save(path))
+        loaded, t_load = timed(lambda: StatsIndex.load(path))
+        size_kb = os.path.getsize(path) / 1e3
+
+    last_year = int(df["Year"].max())
+    history = df[df["Year"] < last_year]
+    partial_index = StatsIndex.from_laps(history)
+    new_season = lap_partials(df[df["Year"] == last_year])
+    merged, t_merge = timed(lambda: partial_index.merge(add=new_season))
+
+    print(f"build {t_build:6.2f}s  save {t_save:6.3f}s  load {t_load:6.3f}s  "
+          f"({size_kb:,.0f} KB, {len(index.partials):,} partial rows)")
+    print(f"add one season (merge): {t_merge:6.3f}s")
+
+    # === Lookups ===
+    rng = np.random.default_rng(0)
+    drivers = index.keys("DriverAvgPace")
+    teams = index.keys("TeamMedianPace")
+    years = sorted(df["Year"].unique().tolist())
+    driver_args = [(name, drivers[i]) for name, i in zip(
+        ["DriverAvgPace"] * N_QUERIES, rng.integers(0, len(drivers), N_QUERIES))]
+    season_args = [("DriverAvgPace", drivers[i], years[j]) for i, j in zip(
+        rng.integers(0, len(drivers), N_QUERIES), rng.integers(0, len(years), N_QUERIES))]
+    bounds = np.sort(rng.choice(years, size=(N_QUERIES, 2)), axis=1)
+    range_args = [("DriverAvgPace", drivers[i], lo, hi) for i, (lo, hi) in zip(
+        rng.integers(0, len(drivers), N_QUERIES), bounds.tolist())]
+    median_args = [("TeamMedianPace", teams[i], lo, hi) for i, (lo, hi) in zip(
+        rng.integers(0, len(teams), N_QUERIES // 10), bounds[:N_QUERIES // 10].tolist())]
+
+    print(f"{'query':<28} {'µs/call':>8}")
+    print(f"{'point (driver, all seasons)':<28} {per_call_us(loaded.get, driver_args):>8.2f}")
+    print(f"{'point (driver, one season)':<28} {per_call_us(loaded.get, season_args):>8.2f}")
+    print(f"{'season range (mean)':<28} {per_call_us(loaded.season_range, range_args):>8.2f}")
+    print(f"{'season range (team median)':<28} {per_call_us(loaded.season_range, median_args):>8.2f}")
+
+    # === Column lookups vs grouped recompute ===
+    recomputed, t_group = timed(lambda: add_group_features(df.copy(), LAP_GROUP_FEATURES[:2]))
+    attached, t_attach = timed(lambda: loaded.attach(df.copy(), ["DriverAvgPace", "TeamMedianPace"]))
+    for col in ["DriverAvgPace", "TeamMedianPace"]:
+        np.testing.assert_allclose(recomputed[col].to_numpy(), attached[col].to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(merged.get("DriverAvgPace", drivers[0]), index.get("DriverAvgPace", drivers[0]),
+                               rtol=1e-12)
+    assert merged.get("TeamMedianPace", teams[0]) == index.get("TeamMedianPace", teams[0])
+
+    print(f"grouped recompute {t_group:6.2f}s  vs  indexed attach {t_attach:6.2f}s  (values match)")
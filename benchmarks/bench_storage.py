@@ -0,0 +1,61 @@
+"""
+Created on Mon Jun  9 10:48:21 2025
+
+@author: sid
+Benchmark: CSV vs Parquet vs Feather for the cleaned multi-season lap table.
+Reports disk size, full load time and projected (model-columns-only) load time.
+Usage: python benchmarks/bench_storage.py [n_seasons]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "clean_data"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from columnar_store import read_table, write_table  # noqa: E402
+from session_ingest import ingest_sessions  # noqa: E402
+from synthetic_data import write_session_tree  # noqa: E402
+
+N_SEASONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+PROJECTED_COLUMNS = ["Driver", "Team", "SessionFolder", "SessionType", "LapTimeSeconds", "Stint",
+                     "TrackStatus", "IsPersonalBest", "FinalRacePosition", "AvgAirTemp"]
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, "raw")
+        seasons = list(range(2025 - N_SEASONS + 1, 2026))
+        write_session_tree(raw_dir, seasons=seasons)
+        df = pd.concat(
+            [ingest_sessions(raw_dir, year, verbose=False) for year in seasons], ignore_index=True
+        )
+        print(f"🏎️  Storage benchmark: {len(df):,} rows x {df.shape[1]} columns ({N_SEASONS} seasons)")
+
+        paths = {fmt: os.path.join(tmp, f"laps.{fmt}") for fmt in ("csv", "parquet", "feather")}
+        for path in paths.values():
+            write_table(df, path)
+
+        csv_size = os.path.getsize(paths["csv"])
+        csv_full = timed(lambda: pd.read_csv(paths["csv"], low_memory=False))
+        print(f"{'format':<8} {'size (MB)':>10} {'full load (s)':>14} {'projected (s)':>14}")
+        for fmt, path in paths.items():
+            size = os.path.getsize(path)
+            full = timed(lambda: read_table(path))
+            projected = timed(lambda: read_table(path, columns=PROJECTED_COLUMNS))
+            print(f"{fmt:<8} {size / 1e6:>10.2f} {full:>14.3f} {projected:>14.3f}"
+                  f"   ({csv_size / size:4.1f}x smaller, {csv_full / full:4.1f}x faster full load)")
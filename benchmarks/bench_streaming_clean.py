@@ -0,0 +1,70 @@
+"""
+Created on Wed Jun 18 08:44:10 2025
+
+@author: sid
+Benchmark: peak RSS of in-memory ingest_sessions + write_table vs stream_sessions
+as the number of synthetic seasons grows. Each run is a fresh subprocess (serial
+workers so the parent holds all the data) and reports its own ru_maxrss.
+Usage: python benchmarks/bench_streaming_clean.py [max_seasons]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "clean_data"))
+sys.path.insert(0, HERE)
+
+MAX_SEASONS = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != "--child" else 8
+
+
+def _child(mode, raw_dir, output_path):
+    import resource
+
+    from columnar_store import write_table
+    from session_ingest import ingest_sessions, stream_sessions
+
+    start = time.perf_counter()
+    if mode == "stream":
+        rows = stream_sessions(raw_dir, "2024", output_path, workers=1, verbose=False)
+    else:
+        df = ingest_sessions(raw_dir, "2024", workers=1, verbose=False)
+        write_table(df, output_path)
+        rows = len(df)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024  # bytes on macOS
+    print(json.dumps({"rows": rows, "seconds": time.perf_counter() - start, "peak_mb": peak_kb / 1024}))
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        _child(*sys.argv[2:5])
+        sys.exit(0)
+
+    from columnar_store import read_table
+    from synthetic_data import write_session_tree
+
+    print(f"{'seasons':>7} {'mode':>9} {'rows':>10} {'seconds':>8} {'peak MB':>8}")
+    for n_seasons in sorted({1, 2, 4, MAX_SEASONS}):
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_dir = os.path.join(tmp, "raw")
+            write_session_tree(raw_dir, seasons=[2024], rounds=24 * n_seasons)
+            outputs = {}
+            for mode in ("in-memory", "stream"):
+                outputs[mode] = os.path.join(tmp, f"{mode}.parquet")
+                result = subprocess.run([sys.executable, __file__, "--child", mode, raw_dir, outputs[mode]],
+                                        capture_output=True, text=True, check=True)
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                print(f"{n_seasons:>7} {mode:>9} {stats['rows']:>10,} {stats['seconds']:>8.2f} {stats['peak_mb']:>8.1f}")
+
+            in_memory, streamed = read_table(outputs["in-memory"]), read_table(outputs["stream"])
+            assert len(in_memory) == len(streamed)
+            for col in ("AvgRaceFinish", "AvgQualiPosition", "LapTimeSeconds"):
+                assert (in_memory[col].fillna(-1).to_numpy() == streamed[col].fillna(-1).to_numpy()).all(), col
@@ -0,0 +1,87 @@
+"""
+Created on Sat Jun  7 11:03:15 2025
+
+@author: sid
+Benchmark: row-wise parse_lap_time apply vs vectorized time_parsing.parse_time_column
+on 1M synthetic laps for each supported format.
+Usage: python benchmarks/bench_time_parsing.py [n_laps]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from time_parsing import parse_time_column  # noqa: E402
+
+N_LAPS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+
+def legacy_parse_lap_time(time_value):
+    """Row-wise parser previously used in preprocess_fpdata_for_prediction.py"""
+    if pd.isna(time_value):
+        return np.nan
+    if isinstance(time_value, pd.Timedelta):
+        return time_value.total_seconds()
+    time_str = str(time_value).strip()
+    if 'days' in time_str and ':' in time_str:
+        try:
+            return pd.to_timedelta(time_str).total_seconds()
+        except Exception:
+            pass
+    try:
+        return float(time_str)
+    except ValueError:
+        pass
+    if ':' in time_str and 'days' not in time_str:
+        try:
+            parts = time_str.split(':')
+            if len(parts) == 2:
+                return float(parts[0]) * 60 + float(parts[1])
+        except ValueError:
+            pass
+    try:
+        return float(time_str)
+    except ValueError:
+        return np.nan
+
+
+def synthetic_lap_seconds(n, seed=42):
+    rng = np.random.default_rng(seed)
+    seconds = np.round(rng.normal(78.0, 2.5, n).clip(70, 120), 3)
+    seconds[rng.random(n) < 0.01] = np.nan  # in/out laps without a time
+    return seconds
+
+
+def as_format(seconds, fmt):
+    s = pd.Series(seconds)
+    if fmt == "timedelta":
+        return pd.to_timedelta(s, unit="s").astype(str).where(s.notna())
+    if fmt == "clock":
+        minutes = (s // 60).astype("Int64").astype(str)
+        rest = (s % 60).map("{:06.3f}".format)
+        return (minutes + ":" + rest).where(s.notna())
+    return s.map("{:.3f}".format).where(s.notna())
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    seconds = synthetic_lap_seconds(N_LAPS)
+    print(f"🏎️  Time parsing benchmark on {N_LAPS:,} synthetic laps")
+    print(f"{'format':<10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}  max abs diff")
+
+    for fmt in ["timedelta", "clock", "numeric"]:
+        values = as_format(seconds, fmt)
+        legacy, t_legacy = timed(lambda: values.apply(legacy_parse_lap_time))
+        fast, t_fast = timed(lambda: parse_time_column(values))
+        diff = np.nanmax(np.abs(legacy.to_numpy(dtype=float) - fast.to_numpy()))
+        assert legacy.isna().equals(fast.isna()), f"NaN mismatch for {fmt}"
+        print(f"{fmt:<10} {t_legacy:>12.2f} {t_fast:>15.2f} {t_legacy / t_fast:>8.1f}x  {diff:.2e}")
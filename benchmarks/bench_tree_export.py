@@ -0,0 +1,76 @@
+"""
+Created on Tue Jun 24 11:26:15 2025
+
+@author: sid
+Benchmark: pickled sklearn/xgboost models vs the array export (tree_export.py).
+For each model family (fitted on a synthetic 17-feature race matrix):
+- load time: joblib.load vs memory-mapped .trees load
+- per-batch latency for growing batch sizes: model.predict vs TreeEnsemble.predict
+- predictions must match within tree_export.RTOL / ATOL
+Usage: python benchmarks/bench_tree_export.py [n_train_rows]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_comparison import candidate_models, core_budget  # noqa: E402
+from tree_export import TreeEnsemble, export_model, verify_export  # noqa: E402
+
+N_TRAIN = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+N_FEATURES = 17
+BATCH_SIZES = [1, 20, 1_000, 50_000]
+REPEATS = 5
+
+
+def synthetic_matrix(n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, N_FEATURES))
+    y = np.clip(10 + 3 * X[:, 0] - 2 * X[:, 1] + np.sin(X[:, 2]) + rng.normal(size=n), 1, 20)
+    return X, y
+
+
+def best_of(fn, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples), statistics.median(samples)
+
+
+if __name__ == "__main__":
+    X, y = synthetic_matrix(N_TRAIN)
+    X_test, _ = synthetic_matrix(max(BATCH_SIZES), seed=1)
+    print(f"🏎️  Tree export benchmark ({N_TRAIN:,} training rows, {N_FEATURES} features)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, model in candidate_models(n_jobs=core_budget(1)[1]).items():
+            model.fit(X, y)
+            pkl_path = os.path.join(tmp, f"{name}.pkl")
+            trees_path = os.path.join(tmp, f"{name}.trees")
+            joblib.dump(model, pkl_path)
+            ensemble = export_model(model, trees_path)
+            max_diff = verify_export(model, ensemble, X_test)
+
+            t_unpickle, _ = best_of(lambda: joblib.load(pkl_path))
+            t_load, _ = best_of(lambda: TreeEnsemble.load(trees_path))
+            print(f"\n{name}: {ensemble.meta['n_trees']} trees, {ensemble.meta['n_nodes']:,} nodes, "
+                  f"depth {ensemble.max_depth}, {os.path.getsize(trees_path) / 1e6:.1f} MB "
+                  f"(pickle {os.path.getsize(pkl_path) / 1e6:.1f} MB), max abs diff {max_diff:.1e}")
+            print(f"  load       joblib {t_unpickle * 1000:9.2f} ms   exported {t_load * 1000:9.3f} ms")
+
+            loaded = TreeEnsemble.load(trees_path)
+            loaded.predict(X_test[:1])  # fault the pages in once
+            for batch in BATCH_SIZES:
+                rows = X_test[:batch]
+                _, t_model = best_of(lambda: model.predict(rows))
+                _, t_export = best_of(lambda: loaded.predict(rows))
+                print(f"  batch {batch:>6,}  model {t_model * 1000:9.2f} ms   exported {t_export * 1000:9.2f} ms  "
+                      f"({t_model / t_export:5.1f}x)")
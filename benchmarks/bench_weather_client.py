@@ -0,0 +1,105 @@
+"""
+Created on Tue Jun 17 09:05:12 2025
+
+@author: sid
+Benchmark: forecast client against a local stub OpenWeatherMap server (no network).
+Checks interpolation against the stub's known values, then reports cold fetch,
+warm cache hit, TTL expiry/eviction and interpolation throughput.
+Usage: python benchmarks/bench_weather_client.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from get_weather_data import BARCELONA_WEATHER, ForecastCache, get_forecast_index, to_timestamp  # noqa: E402
+
+START = to_timestamp("2025-06-01 00:00:00")
+STEP = 3 * 3600
+
+
+def stub_forecast(n_entries=40):
+    """Linear temperature ramp (20 -> 20 + n/2 °C) so interpolation is checkable"""
+    return {"list": [
+        {
+            "dt": int(START + i * STEP),
+            "main": {"temp": 20 + i * 0.5, "humidity": 50 + i % 5, "pressure": 1015 + i % 3},
+            "wind": {"speed": 3 + (i % 4) * 0.5},
+            "pop": (i % 10) / 10,
+            "rain": {"3h": 0.1 * (i % 3)},
+        }
+        for i in range(n_entries)
+    ]}
+
+
+def start_stub_server():
+    payload = json.dumps(stub_forecast()).encode()
+    requests_served = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_served.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests_served
+
+
+if __name__ == "__main__":
+    server, served = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/forecast"
+    race_start, race_end = START + 13 * 3600, START + 15 * 3600
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ForecastCache(tmp, ttl_seconds=60, max_entries=4)
+
+        start = time.perf_counter()
+        index = get_forecast_index(race_start, race_end, base_url=base_url, cache=cache)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        get_forecast_index(race_start, race_end, base_url=base_url, cache=cache)
+        warm_ms = (time.perf_counter() - start) * 1000
+        assert len(served) == 1, "warm lookup should not hit the server"
+
+        # 13:00 sits between entries 4 (12:00) and 5 (15:00): temp 22.0 -> 22.5
+        temp = index.at(race_start)["temp"][0]
+        assert abs(temp - (22.0 + 0.5 / 3)) < 1e-9, temp
+        features = index.features(race_start, race_end)
+        assert set(features) == set(BARCELONA_WEATHER)
+
+        # TTL expiry and max-entries eviction
+        key = ForecastCache.key(41.57, 2.26, race_start, race_end)
+        assert cache.get(key, now=time.time() + 120) is None
+        for hour in range(6):
+            get_forecast_index(START + hour * 3600, base_url=base_url, cache=cache)
+        cached_files = len([name for name in os.listdir(tmp) if name.endswith(".json")])
+        assert cached_files <= 4, cached_files
+
+        lookups = np.random.default_rng(0).uniform(START, START + 39 * STEP, 1_000_000)
+        start = time.perf_counter()
+        index.at(lookups)
+        interp_s = time.perf_counter() - start
+
+    server.shutdown()
+    print(f"Cold fetch (stub HTTP):   {cold_ms:8.2f} ms")
+    print(f"Warm cache hit:           {warm_ms:8.2f} ms")
+    print(f"Interpolation:            {len(lookups) / interp_s / 1e6:8.2f} M lookups/s")
+    print(f"Cache entries after eviction: {cached_files} (max 4)")
+    print("Race-window features:", {key: round(value, 2) for key, value in features.items()})
@@ -0,0 +1,92 @@
+"""
+Created on Sat Jun 14 11:38:57 2025
+
+@author: sid
+Offline load test for prediction_server.py.
+Sends driver-level payloads built from spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv
+from N concurrent clients and reports client-side p50/p99 latency and throughput,
+followed by the server's own /metrics.
+Usage:
+  python benchmarks/load_test_server.py --start-server            # local in-process instance
+  python benchmarks/load_test_server.py --url http://127.0.0.1:8765
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FP_DATA_PATH = os.path.join(ROOT, "spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv")
+
+
+def build_payloads(rows_per_request, n_payloads, seed=42):
+    laps = pd.read_csv(FP_DATA_PATH)
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(n_payloads):
+        sample = laps.iloc[rng.integers(0, len(laps), rows_per_request)]
+        payloads.append(json.dumps({"rows": json.loads(sample.to_json(orient="records"))}).encode())
+    return payloads
+
+
+def post(url, body):
+    request = urllib.request.Request(f"{url}/predict", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1000
+
+
+def start_local_server():
+    from prediction_server import serve
+
+    os.chdir(ROOT)  # artifacts are resolved relative to the repo root
+    server = serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for the prediction server")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--start-server", action="store_true", help="start a local instance in-process")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rows-per-request", type=int, default=20)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.start_server:
+        server, url = start_local_server()
+
+    payloads = build_payloads(args.rows_per_request, min(args.requests, 200))
+    # Warm-up so the first batches do not skew the percentiles
+    for body in payloads[:10]:
+        post(url, body)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        latencies = list(pool.map(lambda i: post(url, payloads[i % len(payloads)]), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    print(f"🏎️  {args.requests} requests x {args.rows_per_request} rows from {args.clients} clients")
+    print(f"client p50 {np.percentile(latencies, 50):.2f} ms | p99 {np.percentile(latencies, 99):.2f} ms | "
+          f"{args.requests / elapsed:.0f} req/s | {args.requests * args.rows_per_request / elapsed:.0f} rows/s")
+    with urllib.request.urlopen(f"{url}/metrics") as response:
+        print("server metrics:", json.dumps(json.loads(response.read()), indent=1))
+
+    if server is not None:
+        server.shutdown()
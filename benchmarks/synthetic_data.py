@@ -0,0 +1,166 @@
+"""
+Created on Sun Jun  8 10:26:02 2025
+
+@author: sid
+Synthetic FastF1-style session folders for benchmarks.
+Each folder holds laps.csv / results.csv / weather.csv shaped like the
+raw data_fetching exports read by clean_data/session_ingest.py.
+write_practice_file() writes an FP1-FP3 lap table shaped like the
+data_fetcher_2025_spanish_gp.py output.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+GRID = [
+    ("NOR", "McLaren"), ("PIA", "McLaren"),
+    ("LEC", "Ferrari"), ("HAM", "Ferrari"),
+    ("VER", "Red Bull Racing"), ("LAW", "Red Bull Racing"),
+    ("RUS", "Mercedes"), ("ANT", "Mercedes"),
+    ("ALO", "Aston Martin"), ("STR", "Aston Martin"),
+    ("GAS", "Alpine"), ("COL", "Alpine"),
+    ("BEA", "Haas F1 Team"), ("OCO", "Haas F1 Team"),
+    ("TSU", "Racing Bulls"), ("HAD", "Racing Bulls"),
+    ("ALB", "Williams"), ("SAI", "Williams"),
+    ("HUL", "Kick Sauber"), ("BOR", "Kick Sauber"),
+]
+
+# Folder names must not contain '_R' / '_Q' except for the session suffix
+GRANDS_PRIX = [
+    "Bahrain", "Saudi_Arabian", "Australian", "Japanese", "Chinese", "Miami",
+    "Imola", "Monaco", "Canadian", "Spanish", "Austrian", "British",
+    "Hungarian", "Belgian", "Dutch", "Italian", "Azerbaijan", "Singapore",
+    "United_States", "Mexico_City", "Sao_Paulo", "Las_Vegas", "Abu_Dhabi", "Portuguese",
+]
+
+SESSIONS = ["FP1", "FP2", "FP3", "Q", "R"]
+LAPS_PER_SESSION = {"FP1": 25, "FP2": 28, "FP3": 20, "Q": 12, "R": 57}
+COMPOUNDS = np.array(["SOFT", "MEDIUM", "HARD"])
+
+
+def _timedelta_strings(seconds):
+    return pd.to_timedelta(pd.Series(seconds), unit="s").astype(str).where(~np.isnan(seconds))
+
+
+def make_session(year, round_no, gp, session, rng, laps_per_driver=None):
+    """Build (laps, results, weather) frames for one session"""
+    n_laps = laps_per_driver or LAPS_PER_SESSION[session]
+    base = 76.0 + rng.normal(0, 4)
+    n_drivers = len(GRID)
+
+    driver_idx = np.repeat(np.arange(n_drivers), n_laps)
+    lap_number = np.tile(np.arange(1, n_laps + 1), n_drivers)
+    driver_offset = np.linspace(0, 1.8, n_drivers)[driver_idx]
+    stint = 1 + (lap_number * rng.integers(2, 4)) // (n_laps + 1)
+    tyre_life = np.clip(lap_number - (stint - 1) * (n_laps // 3 + 1), 1, None)
+    lap_seconds = base + driver_offset + 0.04 * tyre_life + rng.gamma(2.0, 0.35, driver_idx.size)
+    # Out/in laps and the odd lap with no time
+    lap_seconds[rng.random(driver_idx.size) < 0.05] += rng.uniform(20, 60)
+    lap_seconds[rng.random(driver_idx.size) < 0.01] = np.nan
+    lap_seconds = np.round(lap_seconds, 3)
+    sectors = np.round(lap_seconds[:, None] * np.array([0.3, 0.39, 0.31]), 3)
+
+    drivers = np.array([d for d, _ in GRID])[driver_idx]
+    teams = np.array([t for _, t in GRID])[driver_idx]
+
+    laps = pd.DataFrame({
+        "Time": _timedelta_strings(np.cumsum(np.nan_to_num(lap_seconds, nan=90.0))),
+        "Driver": drivers,
+        "DriverNumber": driver_idx + 1,
+        "LapTime": _timedelta_strings(lap_seconds),
+        "LapNumber": lap_number,
+        "Stint": stint.astype(float),
+        "Sector1Time": _timedelta_strings(sectors[:, 0]),
+        "Sector2Time": _timedelta_strings(sectors[:, 1]),
+        "Sector3Time": _timedelta_strings(sectors[:, 2]),
+        "IsPersonalBest": rng.random(driver_idx.size) < 0.1,
+        "Compound": COMPOUNDS[np.minimum(stint - 1, 2)],
+        "TyreLife": tyre_life.astype(float),
+        "FreshTyre": tyre_life <= 1,
+        "Team": teams,
+        "LapStartTime": _timedelta_strings(np.arange(driver_idx.size, dtype=float)),
+        "LapStartDate": f"{year}-06-01 13:00:00",
+        "TrackStatus": rng.choice([1, 1, 1, 1, 2, 4, 12], driver_idx.size),
+        "Position": np.nan if session.startswith("FP") else (driver_idx + 1).astype(float),
+        "Deleted": False,
+        "FastF1Generated": False,
+        "IsAccurate": True,
+    })
+
+    order = rng.permutation(n_drivers) + 1
+    results = pd.DataFrame({
+        "DriverNumber": np.arange(1, n_drivers + 1),
+        "BroadcastName": [d for d, _ in GRID],
+        "Abbreviation": [d for d, _ in GRID],
+        "TeamName": [t for _, t in GRID],
+        "HeadshotUrl": "",
+        "Position": order.astype(float) if session in ("Q", "R") else np.nan,
+        "GridPosition": order.astype(float),
+        "Points": np.where(order <= 10, 26 - 2 * order, 0).astype(float),
+    })
+
+    n_weather = 60
+    weather = pd.DataFrame({
+        "Time": _timedelta_strings(np.arange(n_weather) * 60.0),
+        "AirTemp": np.round(22 + rng.normal(0, 1.5, n_weather), 1),
+        "Humidity": np.round(50 + rng.normal(0, 5, n_weather), 1),
+        "Pressure": np.round(1015 + rng.normal(0, 2, n_weather), 1),
+        "Rainfall": False,
+        "TrackTemp": np.round(35 + rng.normal(0, 3, n_weather), 1),
+        "WindDirection": rng.integers(0, 360, n_weather),
+        "WindSpeed": np.round(rng.gamma(2, 1.2, n_weather), 1),
+    })
+    return laps, results, weather
+
+
+def session_folder_name(year, round_no, gp, session):
+    return f"{year}_{round_no:02d}_{gp}_Grand_Prix_{session}"
+
+
+def write_session_tree(root, seasons=(2024,), rounds=24, sessions=SESSIONS, laps_per_driver=None, seed=42,
+                       first_round=1):
+    """Write a raw data_fetching-style tree; returns the list of folder names"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(root, exist_ok=True)
+    folders = []
+    for year in seasons:
+        for round_no in range(first_round, rounds + 1):
+            gp = GRANDS_PRIX[(round_no - 1) % len(GRANDS_PRIX)]
+            for session in sessions:
+                folder = session_folder_name(year, round_no, gp, session)
+                path = os.path.join(root, folder)
+                os.makedirs(path, exist_ok=True)
+                laps, results, weather = make_session(year, round_no, gp, session, rng, laps_per_driver)
+                laps.to_csv(os.path.join(path, "laps.csv"), index=False)
+                results.to_csv(os.path.join(path, "results.csv"), index=False)
+                weather.to_csv(os.path.join(path, "weather.csv"), index=False)
+                folders.append(folder)
+    return folders
+
+
+PRACTICE_COLUMNS = ["Driver", "Team", "Compound", "LapTime", "Sector1Time", "Sector2Time", "Sector3Time", "TrackStatus"]
+
+
+def seasons_for(n_seasons, last_year=2025):
+    """The n most recent season years, oldest first"""
+    return list(range(last_year - n_seasons + 1, last_year + 1))
+
+
+def make_practice_laps(year=2025, gp="Spanish", laps_per_driver=None, seed=42):
+    """FP1-FP3 laps in the data fetcher's column layout (plus Session)"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for session in ("FP1", "FP2", "FP3"):
+        laps, _, _ = make_session(year, 9, gp, session, rng, laps_per_driver)
+        lap_data = laps[PRACTICE_COLUMNS].copy()
+        lap_data["Session"] = session
+        frames.append(lap_data)
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_practice_file(path, year=2025, gp="Spanish", laps_per_driver=None, seed=42):
+    laps = make_practice_laps(year, gp, laps_per_driver, seed)
+    laps.to_csv(path, index=False)
+    return path
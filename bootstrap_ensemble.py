@@ -0,0 +1,295 @@
+"""
+Created on Tue Jul  1 09:26:51 2025
+
+@author: sid
+Bootstrap ensemble of the race model for per-driver prediction intervals.
+- The imputed training matrix is written once, float32 and C-contiguous (FeatureMatrixBuilder),
+  to an .npy in RAM-backed /dev/shm; every worker memory-maps the same pages read-only
+- Bootstrap replicates never copy rows: a replicate is a vector of integer resampling counts
+  passed as sample_weight (whole SessionFolder sessions are resampled, as CV groups them),
+  so memory stays near one copy of the data whatever N_MODELS or the worker count
+- Members are fitted in a spawn process pool (model_comparison.core_budget splits the cores),
+  scored on their out-of-bag rows and exported straight to .trees files (tree_export.py)
+- Family / parameters: the trained best model's family (with its tuned config when
+  hyperparameter_search.py wrote one), XGBoost otherwise
+- Prediction: every member scores every lap, laps are averaged per driver within each member,
+  and the spread over members gives score and finishing-position quantiles per driver
+Outputs: <model dir>/bootstrap/ (member_NNN.trees, imputer.pkl, race_model_features.txt, ensemble.json)
+Usage: python bootstrap_ensemble.py train [--n-models 50] [--workers 4] [--model XGBoost]
+       python bootstrap_ensemble.py predict [practice_csv] [--output intervals.csv]
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from threadpoolctl import threadpool_limits
+
+from feature_matrix import FeatureMatrixBuilder, read_feature_list
+from instrumentation import stage
+from model_comparison import candidate_models, core_budget, read_best_config
+from project_paths import BEST_CONFIG_FILE, MODEL_DIR, PATHS
+from tree_export import TreeEnsemble, export_model
+
+N_MODELS = 50
+QUANTILES = (0.05, 0.5, 0.95)
+DEFAULT_MODEL = "XGBoost"
+SEED = 42
+OOB_CHUNK_ROWS = 65_536  # out-of-bag rows scored per batch (bounded scratch memory)
+MANIFEST_FILE = "ensemble.json"
+SHARE_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None  # RAM-backed where available
+
+
+def ensemble_dir(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, "bootstrap")
+
+
+def member_family(model_dir, name=None):
+    """(family, params): name, else the trained best model's family, else DEFAULT_MODEL; tuned params if any"""
+    trained = sorted(glob.glob(os.path.join(model_dir, "best_race_model_*.pkl")))
+    if name is None:
+        name = os.path.basename(trained[0])[len("best_race_model_"):-len(".pkl")] if trained else DEFAULT_MODEL
+    return name, read_best_config(os.path.join(model_dir, BEST_CONFIG_FILE)).get(name, {})
+
+
+def private_mb():
+    """Memory this process does not share with others (Linux; None elsewhere)"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith("Private_"))
+    except OSError:
+        return None
+    return sum(int(value.split()[0]) for value in fields.values()) / 1024
+
+
+def bootstrap_weights(rng, group_codes, n_groups):
+    """Resampling count of every row: n_groups groups drawn with replacement (row bootstrap when groups are rows)"""
+    counts = np.bincount(rng.integers(n_groups, size=n_groups), minlength=n_groups)
+    return counts[group_codes].astype(np.float64)
+
+
+# === Worker side ===
+_shared = {}
+
+
+def _init_worker(x_path, y_path, groups_path, threads, model_name, params, out_dir, columns, seed):
+    _shared["X"] = np.load(x_path, mmap_mode="r")
+    _shared["y"] = np.load(y_path, mmap_mode="r")
+    _shared["groups"] = np.load(groups_path, mmap_mode="r")
+    _shared["n_groups"] = int(_shared["groups"].max()) + 1
+    _shared.update(threads=threads, model_name=model_name, params=params, out_dir=out_dir, columns=columns,
+                   seed=seed)
+    _shared["limits"] = threadpool_limits(threads)
+
+
+def _fit_member(member):
+    X, y = _shared["X"], _shared["y"]
+    name = _shared["model_name"]
+    # Seeded per member: the ensemble is reproducible whatever the pool's scheduling
+    weights = bootstrap_weights(np.random.default_rng([_shared["seed"], member]), _shared["groups"],
+                                _shared["n_groups"])
+
+    start = time.perf_counter()
+    model = candidate_models(n_jobs=_shared["threads"], params={name: _shared["params"]})[name]
+    model.fit(X, y, sample_weight=weights)
+    fit_seconds = time.perf_counter() - start
+
+    oob = np.flatnonzero(weights == 0)
+    abs_error = 0.0
+    for chunk in range(0, len(oob), OOB_CHUNK_ROWS):
+        rows = oob[chunk:chunk + OOB_CHUNK_ROWS]
+        abs_error += float(np.abs(model.predict(X[rows]) - y[rows]).sum())
+
+    path = os.path.join(_shared["out_dir"], f"member_{member:03d}.trees")
+    export_model(model, path, feature_names=_shared["columns"])
+    return {
+        "Member": member,
+        "Path": os.path.basename(path),
+        "TrainRows": int(np.count_nonzero(weights)),
+        "OOBRows": len(oob),
+        "OOB_MAE": abs_error / len(oob) if len(oob) else np.nan,
+        "FitSeconds": fit_seconds,
+        "WorkerPrivateMB": private_mb(),
+    }
+
+
+# === Training ===
+def share_training_matrix(X, builder, groups, y, share_dir):
+    """Write the imputed float32 matrix, target and group codes once; returns their paths"""
+    x_path = os.path.join(share_dir, "X.npy")
+    X_shared = np.lib.format.open_memmap(x_path, mode="w+", dtype=np.float32, shape=(len(X), len(builder.columns)))
+    builder.transform(X, out=X_shared)
+    X_shared.flush()
+    del X_shared
+
+    y_path = os.path.join(share_dir, "y.npy")
+    np.save(y_path, np.asarray(y, dtype=np.float64))
+    groups_path = os.path.join(share_dir, "groups.npy")
+    codes = pd.factorize(groups)[0] if groups is not None else np.arange(len(y))
+    np.save(groups_path, codes.astype(np.int32))
+    return x_path, y_path, groups_path
+
+
+def train_bootstrap_ensemble(data_path=PATHS["features"], model_dir=MODEL_DIR, n_models=N_MODELS, model_name=None,
+                             n_jobs=None, seed=SEED):
+    """Fit n_models bootstrap replicates of the race model; returns the per-member table"""
+    from train_model import load_training_data
+
+    out_dir = ensemble_dir(model_dir)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    family, params = member_family(model_dir, model_name)
+    if family == "RandomForest":
+        # The session weights are the only resampling: no per-tree row bootstrap on top
+        params = {**params, "bootstrap": False}
+
+    with stage("bootstrap", model=family, members=n_models) as boot_rec:
+        with stage("load") as rec:
+            rec.read(data_path)
+            X, y, groups = load_training_data(data_path)
+            rec.rows = len(X)
+
+        # Same median imputation as train_model.py, saved with the ensemble
+        imputer = SimpleImputer(strategy="median").fit(X)
+        features = X.columns.tolist()
+        builder = FeatureMatrixBuilder.from_artifacts(features, imputer)
+        with open(os.path.join(out_dir, "race_model_features.txt"), "w") as f:
+            f.write("".join(f"{col}\n" for col in features))
+        joblib.dump(imputer, os.path.join(out_dir, "imputer.pkl"))
+
+        workers, threads = core_budget(n_models, n_jobs)
+        share_dir = tempfile.mkdtemp(prefix="race_bootstrap_", dir=SHARE_ROOT)
+        rows = []
+        try:
+            with stage("share"):
+                paths = share_training_matrix(X, builder, groups, y.to_numpy(), share_dir)
+            shared_mb = os.path.getsize(paths[0]) / 1e6
+            print(f"🎲 {n_models} x {family} on {workers} workers x {threads} threads "
+                  f"({len(X):,} rows, {shared_mb:.1f} MB shared matrix)")
+            initargs = (*paths, threads, family, params, out_dir, builder.columns, seed)
+            with stage("fit_members", workers=workers) as rec:
+                # spawn: xgboost/OpenMP state must not be inherited through fork
+                with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                         initializer=_init_worker, initargs=initargs) as pool:
+                    futures = [pool.submit(_fit_member, member) for member in range(n_models)]
+                    for future in as_completed(futures):
+                        row = future.result()
+                        print(f"📊 member {row['Member']:3d}: OOB MAE {row['OOB_MAE']:.3f} "
+                              f"({row['FitSeconds']:.1f}s fit)")
+                        rows.append(row)
+                rec.rows = len(X) * n_models
+        finally:
+            shutil.rmtree(share_dir, ignore_errors=True)
+
+        members = pd.DataFrame(rows).sort_values("Member").reset_index(drop=True)
+        manifest = {
+            "model": family,
+            "params": params,
+            "n_models": n_models,
+            "seed": seed,
+            "bootstrap": "session" if groups is not None else "row",
+            "members": list(members["Path"]),
+            "oob_mae": float(members["OOB_MAE"].mean()),
+            "features": features,
+            "quantiles": list(QUANTILES),
+        }
+        manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        boot_rec.rows = len(X)
+        boot_rec.wrote(manifest_path, *[os.path.join(out_dir, path) for path in members["Path"]])
+
+    print(f"✅ {n_models} members, mean OOB MAE {manifest['oob_mae']:.3f}")
+    print(f"📁 Ensemble saved to: {out_dir}")
+    return members
+
+
+# === Prediction ===
+class BootstrapEnsemble:
+    """Memory-mapped bootstrap members + the fused feature transform they were trained with"""
+
+    def __init__(self, members, builder, manifest):
+        self.members = members
+        self.builder = builder
+        self.manifest = manifest
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        builder = FeatureMatrixBuilder.from_artifacts(read_feature_list(os.path.join(path, "race_model_features.txt")),
+                                                      joblib.load(os.path.join(path, "imputer.pkl")))
+        members = [TreeEnsemble.load(os.path.join(path, name)) for name in manifest["members"]]
+        return cls(members, builder, manifest)
+
+    def predict_members(self, rows, impute_missing=True):
+        """(members, rows) predictions"""
+        X = self.builder.transform(rows, impute_missing=impute_missing)
+        return np.stack([member.predict(X) for member in self.members])
+
+    def driver_intervals(self, rows, quantiles=QUANTILES, impute_missing=True):
+        """
+        Per driver: mean predicted score over members, its quantiles, and the quantiles of the
+        finishing position each member's driver ranking gives. Best predicted first.
+        """
+        drivers, codes = np.unique(rows["Driver"].astype(str).to_numpy(), return_inverse=True)
+        predictions = self.predict_members(rows, impute_missing)
+        laps = np.bincount(codes, minlength=len(drivers))
+        # Mean lap prediction per driver within each member: (members, drivers)
+        scores = np.stack([np.bincount(codes, weights=p, minlength=len(drivers)) for p in predictions]) / laps
+        positions = scores.argsort(axis=1, kind="stable").argsort(axis=1, kind="stable") + 1
+
+        table = pd.DataFrame({"Driver": drivers, "Laps": laps, "PredictedScore": scores.mean(axis=0)})
+        for q, values in zip(quantiles, np.quantile(scores, quantiles, axis=0)):
+            table[f"Score_q{q * 100:02.0f}"] = values
+        for q, values in zip(quantiles, np.quantile(positions, quantiles, axis=0)):
+            table[f"Position_q{q * 100:02.0f}"] = values
+        table = table.sort_values("PredictedScore", kind="stable").reset_index(drop=True)
+        table.insert(1, "PredictedPosition", np.arange(1, len(table) + 1))
+        return table
+
+
+def predict_intervals(practice_path, model_dir=MODEL_DIR, output=None):
+    from dtype_schema import read_csv_typed
+
+    ensemble = BootstrapEnsemble.load(ensemble_dir(model_dir))
+    table = ensemble.driver_intervals(read_csv_typed(practice_path))
+    if output:
+        table.to_csv(output, index=False)
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap ensemble of the race model with prediction intervals")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="fit the bootstrap members")
+    train.add_argument("--input", default=PATHS["features"], help="feature table")
+    train.add_argument("--model-dir", default=MODEL_DIR)
+    train.add_argument("--n-models", type=int, default=N_MODELS)
+    train.add_argument("--model", default=None, choices=list(candidate_models()),
+                       help="member family (default: the trained best model's)")
+    train.add_argument("--workers", type=int, default=None)
+    train.add_argument("--seed", type=int, default=SEED)
+    predict = commands.add_parser("predict", help="per-driver intervals for practice laps")
+    predict.add_argument("practice_csv", nargs="?", default=PATHS["practice_preprocessed"])
+    predict.add_argument("--model-dir", default=MODEL_DIR)
+    predict.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        train_bootstrap_ensemble(args.input, args.model_dir, args.n_models, args.model, args.workers, args.seed)
+    else:
+        intervals = predict_intervals(args.practice_csv, args.model_dir, args.output)
+        print(intervals.round(3).to_string(index=False))
+        if args.output:
+            print(f"📄 Intervals saved to: {args.output}")
@@ -7,106 +7,42 @@ Enhancements:
 - Adds session type (FP, Q, R, S)
 - Merges driver Position from results.csv
 - Prepares clean data for race/qualifying performance analysis
+- Session folders are cleaned in parallel (see session_ingest.py)
 """
 
 import os
-import pandas as pd
-import numpy as np
+import sys
 
-# === Setup ===
-RAW_DATA_DIR = "/Users/sid/Downloads/F1_FuturePrediction_2025/data_fetching"
-OUTPUT_FILE = "/Users/sid/Downloads/Spanish_GP_2025/clean_data/final_cleaned_2024_data.csv"
-YEAR_FILTER = "2024"
-
-# === Initialize ===
-all_sessions = []
-race_positions = []
-quali_positions = []
-
-# === Loop through 2024 sessions only ===
-for folder in sorted(os.listdir(RAW_DATA_DIR)):
-    if not folder.startswith(YEAR_FILTER):
-        continue
-
-    session_path = os.path.join(RAW_DATA_DIR, folder)
-    if not os.path.isdir(session_path):
-        continue
+from session_ingest import ingest_sessions, stream_sessions
 
-    # Expected file paths
-    laps_path = os.path.join(session_path, "laps.csv")
-    results_path = os.path.join(session_path, "results.csv")
-    weather_path = os.path.join(session_path, "weather.csv")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar_store import write_table  # noqa: E402
+from instrumentation import stage  # noqa: E402
+from project_paths import RAW_DATA_DIR, cleaned_file  # noqa: E402
 
-    if not os.path.exists(laps_path):
-        print(f"⚠️ Skipping {folder}: No laps.csv")
-        continue
-
-    try:
-        # Load laps
-        laps_df = pd.read_csv(laps_path)
-        if laps_df.empty or "LapTime" not in laps_df.columns:
-            print(f"⚠️ Skipping {folder}: Invalid or empty laps.csv")
-            continue
-
-        # Basic cleanup
-        laps_df["LapTimeSeconds"] = pd.to_timedelta(laps_df["LapTime"], errors='coerce').dt.total_seconds()
-        laps_df = laps_df.dropna(subset=["LapTimeSeconds"])
-        laps_df = laps_df[(laps_df["LapTimeSeconds"] > 40) & (laps_df["LapTimeSeconds"] < 200)]
-        laps_df["SessionFolder"] = folder
-        laps_df["Year"] = YEAR_FILTER
-
-        # Determine session type
-        if "_R" in folder:
-            laps_df["SessionType"] = "Race"
-        elif "_Q" in folder:
-            laps_df["SessionType"] = "Qualifying"
+# === Setup ===
+OUTPUT_FILE = cleaned_file(2024)
+YEAR_FILTER = "2024"
+WORKERS = None  # None = one worker per core, 1 = serial
+EXPORT_CSV = False  # also write a .csv copy next to the Parquet output
+STREAM = False  # True = append session by session (flat memory on multi-season data)
+
+if __name__ == "__main__":
+    # === Process 2024 sessions only ===
+    with stage("clean_2024", year=int(YEAR_FILTER), stream=STREAM) as rec:
+        if STREAM:
+            rows = stream_sessions(RAW_DATA_DIR, YEAR_FILTER, OUTPUT_FILE, workers=WORKERS, export_csv=EXPORT_CSV)
         else:
-            laps_df["SessionType"] = "Other"
-
-        # Merge results to get final positions
-        if os.path.exists(results_path):
-            results_df = pd.read_csv(results_path)
-            if "Abbreviation" in results_df.columns and "Position" in results_df.columns:
-                results_df = results_df.rename(columns={"Abbreviation": "Driver"})
-                if "_R" in folder:
-                    results_df = results_df.rename(columns={"Position": "FinalRacePosition"})
-                    race_positions.append(results_df[["Driver", "FinalRacePosition"]])
-                elif "_Q" in folder:
-                    results_df = results_df.rename(columns={"Position": "FinalQualiPosition"})
-                    quali_positions.append(results_df[["Driver", "FinalQualiPosition"]])
-                laps_df = laps_df.merge(results_df, on="Driver", how="left")
-
-        # Merge average weather if available
-        if os.path.exists(weather_path):
-            weather_df = pd.read_csv(weather_path)
-            if "AirTemp" in weather_df.columns:
-                avg_temp = weather_df["AirTemp"].mean()
-                laps_df["AvgAirTemp"] = avg_temp
-
-        all_sessions.append(laps_df)
-        print(f"✅ Processed {folder}, {len(laps_df)} valid laps")
-
-    except Exception as e:
-        print(f" Error processing {folder}: {e}")
-
-# === Final assembly ===
-if all_sessions:
-    final_df = pd.concat(all_sessions, ignore_index=True)
-
-    # Compute average finishing positions
-    if race_positions:
-        race_all = pd.concat(race_positions)
-        race_all["FinalRacePosition"] = pd.to_numeric(race_all["FinalRacePosition"], errors='coerce')
-        race_avg = race_all.groupby("Driver")["FinalRacePosition"].mean().rename("AvgRaceFinish")
-        final_df = final_df.merge(race_avg, on="Driver", how="left")
-
-    if quali_positions:
-        quali_all = pd.concat(quali_positions)
-        quali_all["FinalQualiPosition"] = pd.to_numeric(quali_all["FinalQualiPosition"], errors='coerce')
-        quali_avg = quali_all.groupby("Driver")["FinalQualiPosition"].mean().rename("AvgQualiPosition")
-        final_df = final_df.merge(quali_avg, on="Driver", how="left")
-
-    final_df.to_csv(OUTPUT_FILE, index=False)
-    print(f"\n📁 Final 2024 data saved to: {OUTPUT_FILE}")
-else:
-    print(" No valid 2024 session data processed.")
\ No newline at end of file
+            final_df = ingest_sessions(RAW_DATA_DIR, YEAR_FILTER, workers=WORKERS)
+            rows = 0
+            if final_df is not None:
+                with stage("write"):
+                    write_table(final_df, OUTPUT_FILE, export_csv=EXPORT_CSV)
+                rows = len(final_df)
+        rec.rows = rows
+        rec.wrote(OUTPUT_FILE)
+
+    if rows:
+        print(f"\n📁 Final 2024 data saved to: {OUTPUT_FILE}")
+    else:
+        print(" No valid 2024 session data processed.")
@@ -3,32 +3,52 @@ Created on Thu May 29 11:17:43 2025
 
 @author: sid
 Combining the clean data of the year 2024 and 2025
+combine_seasons() works for any number of cleaned season tables.
 """
+import os
+import sys
+
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar_store import read_table, write_table  # noqa: E402
+from dtype_schema import apply_schema  # noqa: E402
+from instrumentation import stage  # noqa: E402
+from project_paths import PATHS, cleaned_file  # noqa: E402
+
 # === File paths ===
-FILE_2024 = "final_cleaned_2024_data.csv"
-FILE_2025 = "final_cleaned_2025_data.csv"
-OUTPUT_FILE = "combined_cleaned_2024_2025_with_positions.csv"
-
-# === Load datasets ===
-df_2024 = pd.read_csv(FILE_2024)
-df_2025 = pd.read_csv(FILE_2025)
-
-# === Add Year columns if missing (safety) ===
-if "Year" not in df_2024.columns:
-    df_2024["Year"] = 2024
-if "Year" not in df_2025.columns:
-    df_2025["Year"] = 2025
-
-# === Align columns ===
-common_columns = list(set(df_2024.columns) & set(df_2025.columns))
-df_2024 = df_2024[common_columns]
-df_2025 = df_2025[common_columns]
-
-# === Concatenate ===
-combined_df = pd.concat([df_2024, df_2025], ignore_index=True)
-
-# === Export to CSV ===
-combined_df.to_csv(OUTPUT_FILE, index=False)
-print(f"✅ Combined dataset saved to: {OUTPUT_FILE}")
\ No newline at end of file
+FILE_2024 = cleaned_file(2024)
+FILE_2025 = cleaned_file(2025)
+OUTPUT_FILE = PATHS["combined"]
+EXPORT_CSV = False  # also write a .csv copy next to the Parquet output
+
+
+def combine_seasons(season_frames):
+    """
+    Concatenate cleaned season tables on their common columns.
+    season_frames: {year: DataFrame}
+    """
+    # === Add Year columns if missing (safety) ===
+    for year, df in season_frames.items():
+        if "Year" not in df.columns:
+            df["Year"] = int(year)
+
+    # === Align columns ===
+    common_columns = set.intersection(*(set(df.columns) for df in season_frames.values()))
+    common_columns = [col for col in next(iter(season_frames.values())).columns if col in common_columns]
+
+    # === Concatenate (season categories differ, so re-apply the compact dtypes) ===
+    return apply_schema(pd.concat([df[common_columns] for df in season_frames.values()], ignore_index=True))
+
+
+if __name__ == "__main__":
+    with stage("combine") as rec:
+        # === Load datasets ===
+        rec.read(FILE_2024, FILE_2025)
+        combined_df = combine_seasons({2024: read_table(FILE_2024), 2025: read_table(FILE_2025)})
+
+        # === Export ===
+        write_table(combined_df, OUTPUT_FILE, export_csv=EXPORT_CSV)
+        rec.rows = len(combined_df)
+        rec.wrote(OUTPUT_FILE)
+    print(f"✅ Combined dataset saved to: {OUTPUT_FILE}")
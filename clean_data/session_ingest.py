@@ -0,0 +1,248 @@
+"""
+Created on Sun Jun  8 09:41:27 2025
+
+@author: sid
+Shared session-folder ingestion for the clean_data scripts.
+- Cleans each FastF1 session folder (laps + results + weather) in a process pool
+- Keeps deterministic (sorted) folder order in the output
+- Collects race/quali positions and adds AvgRaceFinish / AvgQualiPosition
+- stream_sessions(): spools each cleaned session to disk as it arrives and appends
+  them to the output file in a final pass, so peak memory is about one session
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar_store import TableAppender, build_schema, read_table, unify_schemas, write_table  # noqa: E402
+from dtype_schema import apply_schema, read_csv_typed  # noqa: E402
+from instrumentation import stage  # noqa: E402
+
+
+def session_type_for(folder):
+    """Map a session folder name to Race / Qualifying / Other"""
+    if "_R" in folder:
+        return "Race"
+    if "_Q" in folder:
+        return "Qualifying"
+    return "Other"
+
+
+def list_session_folders(raw_dir, year_filter):
+    """Sorted session folders of a season"""
+    return [
+        folder for folder in sorted(os.listdir(raw_dir))
+        if folder.startswith(str(year_filter)) and os.path.isdir(os.path.join(raw_dir, folder))
+    ]
+
+
+def clean_session_folder(raw_dir, folder, year):
+    """
+    Clean one session folder.
+    Returns (laps_df or None, race_positions or None, quali_positions or None, message).
+    """
+    session_path = os.path.join(raw_dir, folder)
+    laps_path = os.path.join(session_path, "laps.csv")
+    results_path = os.path.join(session_path, "results.csv")
+    weather_path = os.path.join(session_path, "weather.csv")
+
+    if not os.path.exists(laps_path):
+        return None, None, None, f"⚠️ Skipping {folder}: No laps.csv"
+
+    race_positions = None
+    quali_positions = None
+    try:
+        laps_df = read_csv_typed(laps_path)
+        if laps_df.empty or "LapTime" not in laps_df.columns:
+            return None, None, None, f"⚠️ Skipping {folder}: Invalid or empty laps.csv"
+
+        # Convert LapTime to seconds and clean invalid laps
+        laps_df["LapTimeSeconds"] = pd.to_timedelta(laps_df["LapTime"], errors="coerce").dt.total_seconds()
+        laps_df = laps_df.dropna(subset=["LapTimeSeconds"])
+        laps_df = laps_df[(laps_df["LapTimeSeconds"] > 40) & (laps_df["LapTimeSeconds"] < 200)]
+
+        # Add session metadata
+        laps_df["SessionFolder"] = folder
+        laps_df["Year"] = int(year)
+        session_type = session_type_for(folder)
+        laps_df["SessionType"] = session_type
+
+        # Merge driver results
+        if os.path.exists(results_path):
+            results_df = read_csv_typed(results_path)
+            if "Abbreviation" in results_df.columns and "Position" in results_df.columns:
+                results_df = results_df.rename(columns={"Abbreviation": "Driver"})
+                if session_type == "Race":
+                    results_df = results_df.rename(columns={"Position": "FinalRacePosition"})
+                    race_positions = results_df[["Driver", "FinalRacePosition"]]
+                elif session_type == "Qualifying":
+                    results_df = results_df.rename(columns={"Position": "FinalQualiPosition"})
+                    quali_positions = results_df[["Driver", "FinalQualiPosition"]]
+                laps_df = laps_df.merge(results_df, on="Driver", how="left")
+
+        # Merge weather if available
+        if os.path.exists(weather_path):
+            weather_df = pd.read_csv(weather_path)
+            if "AirTemp" in weather_df.columns:
+                laps_df["AvgAirTemp"] = weather_df["AirTemp"].mean()
+
+        apply_schema(laps_df)
+
+    except Exception as e:
+        return None, None, None, f"⚠️ Error in {folder}: {e}"
+
+    return laps_df, race_positions, quali_positions, f"✅ Processed {folder}, {len(laps_df)} valid laps"
+
+
+def _clean_session_task(args):
+    return clean_session_folder(*args)
+
+
+def position_averages(race_positions, quali_positions):
+    """Per-driver AvgRaceFinish / AvgQualiPosition Series from the collected position tables"""
+    averages = {}
+    for name, column, positions in (("AvgRaceFinish", "FinalRacePosition", race_positions),
+                                    ("AvgQualiPosition", "FinalQualiPosition", quali_positions)):
+        if not positions:
+            continue
+        position_all = pd.concat(positions)
+        position_all["Driver"] = position_all["Driver"].astype(object)
+        position_all[column] = pd.to_numeric(position_all[column], errors="coerce")
+        averages[name] = position_all.groupby("Driver")[column].mean().rename(name)
+    return averages
+
+
+def add_position_averages(final_df, race_positions, quali_positions):
+    """Attach per-driver AvgRaceFinish / AvgQualiPosition from the collected position tables"""
+    drivers = final_df["Driver"].astype(object)
+    for name, average in position_averages(race_positions, quali_positions).items():
+        final_df[name] = drivers.map(average)  # one value per driver == left merge on Driver
+    return final_df
+
+
+def ingest_sessions(raw_dir, year_filter, workers=None, verbose=True):
+    """
+    Clean every session folder of a season in parallel.
+    Returns the combined lap frame (with position averages) or None if nothing was processed.
+    workers=1 runs serially in-process; None uses one worker per core.
+    """
+    folders = list_session_folders(raw_dir, year_filter)
+    tasks = [(raw_dir, folder, year_filter) for folder in folders]
+
+    with stage("ingest", folders=len(tasks)) as rec:
+        if workers == 1 or len(tasks) <= 1:
+            final_df = _assemble(map(_clean_session_task, tasks), verbose)
+        else:
+            workers = workers or os.cpu_count() or 1
+            # Larger chunks amortize IPC for big trees of small session folders
+            chunksize = max(1, len(tasks) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # executor.map yields in submission order -> deterministic folder order
+                final_df = _assemble(pool.map(_clean_session_task, tasks, chunksize=chunksize), verbose)
+        rec.rows = 0 if final_df is None else len(final_df)
+    return final_df
+
+
+def _assemble(outcomes, verbose):
+    all_sessions = []
+    race_positions = []
+    quali_positions = []
+
+    for laps_df, race_df, quali_df, message in outcomes:
+        if verbose:
+            print(message)
+        if laps_df is None:
+            continue
+        all_sessions.append(laps_df)
+        if race_df is not None:
+            race_positions.append(race_df)
+        if quali_df is not None:
+            quali_positions.append(quali_df)
+
+    if not all_sessions:
+        return None
+
+    # Per-folder categories differ, so the concat falls back to object; re-apply once
+    with stage("assemble", sessions=len(all_sessions)):
+        final_df = pd.concat(all_sessions, ignore_index=True)
+        return apply_schema(add_position_averages(final_df, race_positions, quali_positions))
+
+
+def _bounded_map(pool, fn, tasks, window):
+    """Like pool.map, but with at most `window` results in flight (keeps memory flat)"""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(fn, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def stream_sessions(raw_dir, year_filter, output_path, workers=None, verbose=True, export_csv=False):
+    """
+    Streaming variant of ingest_sessions that writes straight to output_path.
+    Each cleaned session is spooled to its own small Parquet part as soon as it is ready;
+    the final pass adds AvgRaceFinish / AvgQualiPosition (from the small position tables)
+    and appends the parts to the output one at a time.
+    Returns the number of rows written (0 if nothing was processed).
+    """
+    folders = list_session_folders(raw_dir, year_filter)
+    tasks = [(raw_dir, folder, year_filter) for folder in folders]
+    spool_dir = tempfile.mkdtemp(prefix="clean_spool_", dir=os.path.dirname(os.path.abspath(output_path)))
+    parts, schemas = [], []
+    race_positions, quali_positions = [], []
+
+    def _spool(outcomes):
+        for laps_df, race_df, quali_df, message in outcomes:
+            if verbose:
+                print(message)
+            if laps_df is None:
+                continue
+            part_path = os.path.join(spool_dir, f"part_{len(parts):05d}.parquet")
+            write_table(laps_df, part_path)
+            parts.append(part_path)
+            schemas.append(build_schema(laps_df))
+            if race_df is not None:
+                race_positions.append(race_df)
+            if quali_df is not None:
+                quali_positions.append(quali_df)
+
+    try:
+        with stage("spool", folders=len(tasks)) as rec:
+            if workers == 1 or len(tasks) <= 1:
+                _spool(map(_clean_session_task, tasks))
+            else:
+                workers = workers or os.cpu_count() or 1
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    _spool(_bounded_map(pool, _clean_session_task, tasks, window=2 * workers))
+            rec.wrote(*parts)
+
+        if not parts:
+            return 0
+
+        # === Final pass: position averages + append in folder order ===
+        averages = position_averages(race_positions, quali_positions)
+        schema = unify_schemas(schemas)
+        for name in averages:
+            schema = schema.append(pa.field(name, pa.float32()))
+        with stage("append", parts=len(parts)) as rec, \
+                TableAppender(output_path, schema, export_csv=export_csv) as appender:
+            rec.read(*parts)
+            for part_path in parts:
+                part = read_table(part_path)
+                drivers = part["Driver"].astype(object)
+                for name, average in averages.items():
+                    part[name] = drivers.map(average).astype("float32")
+                appender.append(part)
+            rec.rows = appender.rows
+        return appender.rows
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
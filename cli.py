@@ -0,0 +1,315 @@
+"""
+Created on Mon Jun 23 09:14:52 2025
+
+@author: sid
+One command line for every pipeline step:
+  fetch, clean, combine, features, tune, train, bootstrap, preprocess-fp, predict, intervals,
+  simulate, batch, replay
+- Year, Grand Prix, data directory and every input/output path are arguments
+  (defaults follow project_paths.paths_for)
+- Only the standard library is imported up front; pandas / sklearn / xgboost / fastf1
+  are imported by the subcommand that needs them, so --help starts in well under
+  IMPORT_BUDGET_MS (see benchmarks/bench_cli_startup.py)
+Usage: python cli.py <subcommand> [--year 2025] [--gp "Spanish Grand Prix"] [--data-dir DIR] ...
+       python cli.py <subcommand> --help
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from project_paths import DATA_DIR, DEFAULT_GP, DEFAULT_YEAR, HISTORY_YEARS, paths_for
+
+# Start-up budget for `cli.py --help` and every `cli.py <subcommand> --help`
+IMPORT_BUDGET_MS = 200
+SIMULATION_SCENARIOS = 100_000
+BATCH_SCENARIOS = 20_000
+
+
+def _paths(args, history=None):
+    return paths_for(args.data_dir, getattr(args, "raw_dir", None), args.year, args.gp,
+                     tuple(history or args.history))
+
+
+# === Subcommands (each imports its own heavy dependencies) ===
+def cmd_fetch(args):
+    from fastf1_loader import MAX_WORKERS, fetch_sessions, practice_laps
+    from race_calendar import event_config
+
+    paths = _paths(args)
+    output = args.output or paths["practice"]
+    sessions = args.sessions or event_config(args.year, args.gp)["sessions"]
+    loaded = fetch_sessions([(args.year, args.gp)], sessions, cache_dir=args.cache or paths["cache_dir"],
+                            offline=args.offline, fixture_dir=args.fixtures, workers=args.workers or MAX_WORKERS,
+                            record_dir=args.record)
+    practice_laps(loaded).to_csv(output, index=False)
+    return [output]
+
+
+def cmd_clean(args):
+    from pipeline import clean_season
+
+    seasons = args.seasons or args.history
+    paths = _paths(args, history=seasons)
+    outputs = []
+    for season in seasons:
+        outputs += clean_season(paths["raw_dir"], season, paths["cleaned"][season], workers=args.workers,
+                                stream=args.stream)
+    return outputs
+
+
+def cmd_combine(args):
+    from pipeline import combine
+
+    paths = _paths(args)
+    inputs = dict(zip(args.history, args.inputs)) if args.inputs else paths["cleaned"]
+    return combine(inputs, args.output or paths["combined"])
+
+
+def cmd_features(args):
+    from pipeline import build_features
+
+    paths = _paths(args)
+    return build_features(args.input or paths["combined"], args.output or paths["features"],
+                          args.stats_index or paths["stats_index"])
+
+
+def cmd_train(args):
+    from pipeline import train
+
+    paths = _paths(args)
+    return train(args.input or paths["features"], args.model_dir or paths["model_dir"],
+                 cv_folds=args.cv_folds, cv_workers=args.cv_workers)
+
+
+def cmd_tune(args):
+    from hyperparameter_search import tune_race_model
+
+    paths = _paths(args)
+    return tune_race_model(args.input or paths["features"], args.model_dir or paths["model_dir"],
+                           budget_seconds=args.budget, method=args.method, eta=args.eta, min_trees=args.min_trees,
+                           max_trees=args.max_trees, n_configs=args.configs, model_names=args.models,
+                           cv_folds=args.cv_folds, seed=args.seed, n_jobs=args.workers, resume=not args.fresh)
+
+
+def cmd_bootstrap(args):
+    from bootstrap_ensemble import MANIFEST_FILE, ensemble_dir, train_bootstrap_ensemble
+
+    paths = _paths(args)
+    model_dir = args.model_dir or paths["model_dir"]
+    train_bootstrap_ensemble(args.input or paths["features"], model_dir, args.n_models, args.model, args.workers,
+                             args.seed)
+    return [os.path.join(ensemble_dir(model_dir), MANIFEST_FILE)]
+
+
+def cmd_preprocess_fp(args):
+    from pipeline import preprocess_practice
+
+    paths = _paths(args)
+    return preprocess_practice(args.input or paths["practice"], args.output or paths["practice_preprocessed"],
+                               year=args.year, gp_name=args.gp)
+
+
+def cmd_predict(args):
+    from pipeline import predict
+
+    paths = _paths(args)
+    return predict(args.input or paths["practice_preprocessed"], args.model_dir or paths["model_dir"],
+                   args.output or paths["predictions"])
+
+
+def cmd_intervals(args):
+    from bootstrap_ensemble import predict_intervals
+
+    paths = _paths(args)
+    intervals = predict_intervals(args.input or paths["practice_preprocessed"], args.model_dir or paths["model_dir"],
+                                  args.output)
+    print(intervals.round(3).to_string(index=False))
+    return [args.output] if args.output else []
+
+
+def cmd_simulate(args):
+    from race_calendar import event_config
+    from spanish_gp_2025_predictor import main as simulate
+
+    paths = _paths(args)
+    event = event_config(args.year, args.gp)
+    predictor = simulate(args.input or paths["practice_preprocessed"], n_scenarios=args.scenarios, seed=args.seed,
+                         stats_index_file=args.stats_index or paths["stats_index"], output=args.output,
+                         track_bonus=event["track_bonus"], event_name=f"{event['gp_name']} {event['year']}")
+    if predictor is None:
+        raise RuntimeError("Simulation failed")
+    return [args.output] if args.output else []
+
+
+def cmd_batch(args):
+    from batch_predict import SUMMARY_FILE, calendar_from_args, predict_calendar
+
+    args.season = args.season or args.year
+    summary_file = args.summary or os.path.join(args.data_dir, SUMMARY_FILE)
+    summary = predict_calendar(calendar_from_args(args), args.data_dir, args.model_dir, args.stats_index,
+                               args.workers, args.scenarios, args.seed, fetch=not args.no_fetch,
+                               offline=args.offline, fixture_dir=args.fixtures, summary_file=summary_file)
+    return list(summary["Output"]) + [summary_file]
+
+
+def cmd_replay(args):
+    from replay_feed import run_from_args
+
+    paths = _paths(args)
+    args.cache = args.cache or paths["cache_dir"]
+    return run_from_args(args, args.input or paths["practice_preprocessed"])
+
+
+# === Parser ===
+def _common(parser):
+    parser.add_argument("--data-dir", default=DATA_DIR, help="root of the data layout (default: %(default)s)")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR, help="race weekend season")
+    parser.add_argument("--gp", default=DEFAULT_GP, help="Grand Prix name as FastF1 knows it")
+    parser.add_argument("--history", type=int, nargs="+", default=list(HISTORY_YEARS),
+                        help="seasons used for training (default: %(default)s)")
+
+
+def build_parser():
+    from instrumentation import add_arguments
+
+    parser = argparse.ArgumentParser(prog="cli.py", description="F1 race prediction pipeline")
+    subparsers = parser.add_subparsers(dest="command", metavar="<subcommand>", required=True)
+
+    def subcommand(name, fn, help_text):
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        _common(sub)
+        add_arguments(sub)
+        sub.set_defaults(fn=fn)
+        return sub
+
+    sub = subcommand("fetch", cmd_fetch, "fetch practice laps with FastF1")
+    sub.add_argument("--sessions", nargs="+", default=None,
+                     help="practice sessions (default: FP1-FP3, FP1 on sprint weekends)")
+    sub.add_argument("--cache", default=None, help="FastF1 cache directory (default: <data dir>/f1_cache)")
+    sub.add_argument("--offline", action="store_true", help="never touch the network (cache/fixtures only)")
+    sub.add_argument("--fixtures", default=None, help="read recorded sessions from this directory first")
+    sub.add_argument("--record", default=None, help="save every loaded session as a fixture here")
+    sub.add_argument("--workers", type=int, default=None, help="parallel session loads (default: fastf1_loader)")
+    sub.add_argument("--output", default=None)
+
+    sub = subcommand("clean", cmd_clean, "clean raw FastF1 session folders, one table per season")
+    sub.add_argument("--raw-dir", default=None, help="raw session folders (default: <data dir>/data_fetching)")
+    sub.add_argument("--seasons", type=int, nargs="+", default=None, help="seasons to clean (default: --history)")
+    sub.add_argument("--workers", type=int, default=None)
+    sub.add_argument("--stream", action="store_true", help="stream cleaned sessions to disk (flat memory)")
+
+    sub = subcommand("combine", cmd_combine, "combine the cleaned seasons into one table")
+    sub.add_argument("--inputs", nargs="+", default=None, help="cleaned tables, one per --history season")
+    sub.add_argument("--output", default=None)
+
+    sub = subcommand("features", cmd_features, "engineer model features and the historical stats index")
+    sub.add_argument("--input", default=None)
+    sub.add_argument("--output", default=None)
+    sub.add_argument("--stats-index", default=None)
+
+    sub = subcommand("train", cmd_train, "compare the race models and save the best one")
+    sub.add_argument("--input", default=None, help="feature table")
+    sub.add_argument("--model-dir", default=None)
+    sub.add_argument("--cv-folds", type=int, default=5)
+    sub.add_argument("--cv-workers", type=int, default=None)
+
+    sub = subcommand("tune", cmd_tune, "budgeted hyperparameter search (Hyperband) for the race models")
+    sub.add_argument("--input", default=None, help="feature table")
+    sub.add_argument("--model-dir", default=None, help="where the trial log and best config are written")
+    sub.add_argument("--budget", type=float, default=3600, help="wall-clock seconds (default: %(default)s)")
+    sub.add_argument("--method", choices=["hyperband", "halving"], default="hyperband")
+    sub.add_argument("--eta", type=int, default=3, help="keep 1/eta of each rung (default: %(default)s)")
+    sub.add_argument("--min-trees", type=int, default=25)
+    sub.add_argument("--max-trees", type=int, default=675)
+    sub.add_argument("--configs", type=int, default=27, help="configs of a halving run")
+    sub.add_argument("--models", nargs="+", default=None, help="families to search (default: all three)")
+    sub.add_argument("--cv-folds", type=int, default=5)
+    sub.add_argument("--workers", type=int, default=None)
+    sub.add_argument("--seed", type=int, default=42)
+    sub.add_argument("--fresh", action="store_true", help="ignore (and overwrite) the trial log")
+
+    sub = subcommand("bootstrap", cmd_bootstrap, "fit a bootstrap ensemble of the race model (prediction intervals)")
+    sub.add_argument("--input", default=None, help="feature table")
+    sub.add_argument("--model-dir", default=None, help="members are written to <model dir>/bootstrap")
+    sub.add_argument("--n-models", type=int, default=50)
+    sub.add_argument("--model", choices=["RandomForest", "GradientBoosting", "XGBoost"], default=None,
+                     help="member family (default: the trained best model's)")
+    sub.add_argument("--workers", type=int, default=None)
+    sub.add_argument("--seed", type=int, default=42)
+
+    sub = subcommand("preprocess-fp", cmd_preprocess_fp, "build model features from the practice laps")
+    sub.add_argument("--input", default=None, help="practice laps CSV")
+    sub.add_argument("--output", default=None)
+
+    sub = subcommand("predict", cmd_predict, "predict finishing positions with the trained model")
+    sub.add_argument("--input", default=None, help="preprocessed practice CSV")
+    sub.add_argument("--model-dir", default=None)
+    sub.add_argument("--output", default=None)
+
+    sub = subcommand("intervals", cmd_intervals, "per-driver prediction intervals from the bootstrap ensemble")
+    sub.add_argument("--input", default=None, help="preprocessed practice CSV")
+    sub.add_argument("--model-dir", default=None)
+    sub.add_argument("--output", default=None, help="save the intervals as CSV")
+
+    sub = subcommand("simulate", cmd_simulate, "rating-based prediction + Monte Carlo race simulation")
+    sub.add_argument("--input", default=None, help="practice CSV (preprocessed or Driver/Team/Session/Time)")
+    sub.add_argument("--scenarios", type=int, default=SIMULATION_SCENARIOS)
+    sub.add_argument("--seed", type=int, default=42)
+    sub.add_argument("--stats-index", default=None)
+    sub.add_argument("--output", default=None, help="save the simulation probabilities as CSV")
+
+    sub = subcommand("batch", cmd_batch, "ML + logic predictions for every event of a race calendar")
+    sub.add_argument("--season", type=int, default=None, help="built-in season calendar (default: --year)")
+    sub.add_argument("--calendar", default=None, help="JSON calendar file (race_calendar.load_calendar)")
+    sub.add_argument("--events", nargs="+", default=None, help='events as "YEAR:Grand Prix"')
+    sub.add_argument("--model-dir", default=None)
+    sub.add_argument("--stats-index", default=None)
+    sub.add_argument("--workers", type=int, default=None, help="parallel events (default: all cores)")
+    sub.add_argument("--scenarios", type=int, default=BATCH_SCENARIOS, help="Monte Carlo races per event")
+    sub.add_argument("--seed", type=int, default=42)
+    sub.add_argument("--no-fetch", action="store_true", help="only use existing practice files")
+    sub.add_argument("--offline", action="store_true", help="FastF1 cache/fixtures only")
+    sub.add_argument("--fixtures", default=None, help="recorded FP session folders")
+    sub.add_argument("--summary", default=None, help="summary CSV (default: <data dir>/batch_predictions_summary.csv)")
+
+    sub = subcommand("replay", cmd_replay, "replay practice laps as a local live feed and measure prediction latency")
+    sub.add_argument("--input", default=None, help="practice CSV (default: the preprocessed practice laps)")
+    sub.add_argument("--from-cache", action="store_true", help="replay FastF1-cached sessions of --year/--gp")
+    sub.add_argument("--sessions", nargs="+", default=None, help="cached sessions (default: the event's)")
+    sub.add_argument("--cache", default=None, help="FastF1 cache directory (default: <data dir>/f1_cache)")
+    sub.add_argument("--fixtures", default=None, help="recorded session folders")
+    sub.add_argument("--online", action="store_true", help="let FastF1 download sessions missing from the cache")
+    pacing = sub.add_mutually_exclusive_group()
+    pacing.add_argument("--speed", type=float, default=1.0, help="session clock multiplier (default: real time)")
+    pacing.add_argument("--rate", type=float, default=None, help="constant laps per second")
+    pacing.add_argument("--max", action="store_true", help="publish as fast as the consumer keeps up")
+    sub.add_argument("--transport", choices=["queue", "socket"], default="queue")
+    sub.add_argument("--host", default="127.0.0.1")
+    sub.add_argument("--port", type=int, default=8766)
+    sub.add_argument("--serve", action="store_true", help="only publish the feed on --host/--port")
+    sub.add_argument("--connect", default=None, help="only consume a feed served at HOST:PORT")
+    sub.add_argument("--every", type=int, default=0, help="print the top 5 every N laps")
+    sub.add_argument("--histogram", default=None, help="save the latency histogram buckets as CSV")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from instrumentation import configure_from_args, stage
+
+    configure_from_args(args)
+    start = time.perf_counter()
+    with stage(args.command) as rec:
+        outputs = args.fn(args)
+        rec.wrote(*outputs)
+    for path in outputs:
+        print(f"📄 {path}")
+    print(f"🏁 {args.command} finished in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Created on Mon Jun  9 09:15:33 2025
+
+@author: sid
+Typed columnar storage for the hand-offs between pipeline stages.
+- Parquet (default) or Feather, picked from the file extension
+- Explicit Arrow schema: identifiers dictionary-encoded, compact numeric dtypes kept
+  (see dtype_schema.py), mixed object columns as strings
+- Column projection on read so each stage loads only what it needs
+- CSV is still available as an export (export_csv=True) or by using a .csv path
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from dtype_schema import CATEGORICAL_COLUMNS, apply_schema, read_csv_typed
+
+# Text columns that must never be re-inferred as numbers
+IDENTIFIER_COLUMNS = CATEGORICAL_COLUMNS
+
+PARQUET_COMPRESSION = "zstd"
+
+
+def storage_format(path):
+    """'parquet', 'feather' or 'csv' from the file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".feather", ".arrow", ".ipc"):
+        return "feather"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported storage format for {path}")
+
+
+def csv_export_path(path):
+    return os.path.splitext(path)[0] + ".csv"
+
+
+def _arrow_type(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return pa.dictionary(pa.int32(), pa.string())
+    if pd.api.types.is_bool_dtype(series):
+        return pa.bool_()
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_float_dtype(series):
+        # keep compact schema dtypes (float32, int8, ...) as stored
+        return pa.from_numpy_dtype(series.dtype.numpy_dtype if hasattr(series.dtype, "numpy_dtype") else series.dtype)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pa.timestamp("ns")
+    if pd.api.types.is_timedelta64_dtype(series):
+        return pa.duration("ns")
+    # Object columns read from CSV with gaps, e.g. IsPersonalBest = True/False/NaN
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred == "boolean":
+        return pa.bool_()
+    if inferred in ("integer", "floating", "mixed-integer-float"):
+        return pa.float64()
+    return pa.string()
+
+
+def build_schema(df):
+    """Explicit Arrow schema: identifiers dictionary-encoded, mixed object columns as strings, numerics as-is"""
+    fields = []
+    for col in df.columns:
+        arrow_type = pa.dictionary(pa.int32(), pa.string()) if col in IDENTIFIER_COLUMNS else _arrow_type(df[col])
+        fields.append(pa.field(str(col), arrow_type))
+    return pa.schema(fields)
+
+
+def _to_arrow(df, schema=None):
+    """Arrow table for df; with an explicit schema, missing columns are added as nulls"""
+    if schema is None:
+        schema = build_schema(df)
+    else:
+        df = df.reindex(columns=schema.names)
+    df = df.copy(deep=False)
+    for field in schema:
+        col = df[field.name]
+        if pa.types.is_boolean(field.type) and not pd.api.types.is_bool_dtype(col):
+            df[field.name] = col.astype("boolean")
+        elif pa.types.is_integer(field.type) and not pd.api.types.is_integer_dtype(col):
+            df[field.name] = col.astype(f"Int{field.type.bit_width}")
+        elif pa.types.is_dictionary(field.type):
+            is_categorical = isinstance(col.dtype, pd.CategoricalDtype)
+            if not is_categorical or not pd.api.types.is_string_dtype(col.cat.categories):
+                df[field.name] = col.astype("string").astype("category")
+        elif pa.types.is_string(field.type) and col.dtype != "string":
+            # Mixed object columns (e.g. Q1 times with gaps) -> one string type
+            df[field.name] = col.astype("string")
+        elif pa.types.is_floating(field.type) and col.dtype == object:
+            df[field.name] = pd.to_numeric(col, errors="coerce")
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def unify_schemas(schemas):
+    """
+    One schema for parts written separately (e.g. one per session).
+    Columns keep first-seen order; conflicting types widen to float64, or to string
+    when any side is not numeric.
+    """
+    fields = {}
+    for schema in schemas:
+        for field in schema:
+            current = fields.get(field.name)
+            if current is None or current.type == field.type:
+                fields[field.name] = field
+            elif pa.types.is_null(current.type):
+                fields[field.name] = field
+            elif pa.types.is_null(field.type):
+                continue
+            elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (current.type, field.type)):
+                fields[field.name] = pa.field(field.name, pa.float64())
+            elif pa.types.is_dictionary(current.type) or pa.types.is_dictionary(field.type):
+                fields[field.name] = pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+            else:
+                fields[field.name] = pa.field(field.name, pa.string())
+    return pa.schema(list(fields.values()))
+
+
+class TableAppender:
+    """
+    Append DataFrame chunks to one Parquet/Feather/CSV file under a fixed schema,
+    so a stage output can be written without holding it in memory.
+    """
+
+    def __init__(self, path, schema, export_csv=False):
+        self.path = path
+        self.schema = schema
+        self.format = storage_format(path)
+        self.csv_path = csv_export_path(path) if export_csv and self.format != "csv" else None
+        self.rows = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+        elif self.format == "feather":
+            self._sink = pa.OSFile(path, "wb")
+            options = pa.ipc.IpcWriteOptions(compression=PARQUET_COMPRESSION)
+            self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+        else:
+            self._writer = None
+        for csv_path in (self.csv_path, path if self.format == "csv" else None):
+            if csv_path:
+                pd.DataFrame(columns=schema.names).to_csv(csv_path, index=False)
+
+    def append(self, df):
+        if self.format != "csv":
+            self._writer.write_table(_to_arrow(df, self.schema))
+        for csv_path in (self.csv_path, self.path if self.format == "csv" else None):
+            if csv_path:
+                df.reindex(columns=self.schema.names).to_csv(csv_path, mode="a", header=False, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self.format == "feather":
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _stored_schema(path):
+    if storage_format(path) == "parquet":
+        return pq.read_schema(path)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def write_table(df, path, export_csv=False):
+    """Write a stage output; returns the path written"""
+    fmt = storage_format(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "parquet":
+        pq.write_table(_to_arrow(df), path, compression=PARQUET_COMPRESSION)
+    else:
+        feather.write_feather(_to_arrow(df), path, compression=PARQUET_COMPRESSION)
+
+    if export_csv and fmt != "csv":
+        df.to_csv(csv_export_path(path), index=False)
+    return path
+
+
+def table_columns(path):
+    """Column names stored in a file without loading any rows"""
+    if storage_format(path) == "csv":
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    return _stored_schema(path).names
+
+
+def numeric_columns(path):
+    """Numeric (non-bool) column names of a stored table, read from the schema only"""
+    if storage_format(path) == "csv":
+        return pd.read_csv(path, nrows=1000).select_dtypes(include=[np.number]).columns.tolist()
+    return [
+        field.name for field in _stored_schema(path)
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+    ]
+
+
+def read_table(path, columns=None):
+    """
+    Load a stage output as a DataFrame.
+    columns: optional list to project; names missing from the file are skipped.
+    """
+    fmt = storage_format(path)
+    if columns is not None:
+        available = set(table_columns(path))
+        columns = [col for col in columns if col in available]
+
+    if fmt == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+    elif fmt == "feather":
+        df = feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    else:
+        return read_csv_typed(path, usecols=columns)
+    return apply_schema(df)
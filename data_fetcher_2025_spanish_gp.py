@@ -3,38 +3,44 @@
 """
 Created on Sat May 31 12:32:00 2025
 Updated to include FP1, FP2, and FP3
+Sessions are loaded concurrently through fastf1_loader (laps/results/weather only).
+Usage: python data_fetcher_2025_spanish_gp.py [--offline] [--fixtures DIR] [--record DIR]
 @author: sid
 """
-import fastf1
-import pandas as pd
+import argparse
 
-# Enable FastF1 cache
-fastf1.Cache.enable_cache("f1_cache")  # Ensure this directory exists
+from fastf1_loader import MAX_WORKERS, fetch_sessions, practice_laps
+from instrumentation import add_arguments, configure_from_args, stage
+from project_paths import PATHS
 
 # Define sessions
 sessions = ["FP1", "FP2", "FP3"]
 year = 2025
 gp_name = "Spanish Grand Prix"
+OUTPUT_FILE = PATHS["practice"]
 
-# Create a list to hold the data
-all_fp_data = []
 
-for session_type in sessions:
-    session = fastf1.get_session(year, gp_name, session_type)
-    session.load()
-    laps = session.laps
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch Spanish GP 2025 FP1-FP3 laps")
+    parser.add_argument("--cache", default=PATHS["cache_dir"], help="FastF1 cache directory")
+    parser.add_argument("--offline", action="store_true", help="never touch the network (cache/fixtures only)")
+    parser.add_argument("--fixtures", default=None, help="read recorded sessions from this directory first")
+    parser.add_argument("--record", default=None, help="save every loaded session as a fixture here")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
 
-    # Filter and extract relevant columns
-    lap_data = laps[[
-        "Driver", "Team", "Compound", "LapTime", 
-        "Sector1Time", "Sector2Time", "Sector3Time", "TrackStatus"
-    ]].copy()
-    lap_data["Session"] = session_type
-    all_fp_data.append(lap_data)
+    with stage("fetch", offline=args.offline) as rec:
+        with stage("load_sessions", sessions=len(sessions)):
+            loaded = fetch_sessions([(year, gp_name)], sessions, cache_dir=args.cache, offline=args.offline,
+                                    fixture_dir=args.fixtures, workers=args.workers, record_dir=args.record)
 
-# Combine all practice sessions
-combined_fp = pd.concat(all_fp_data, ignore_index=True)
+        # Combine all practice sessions
+        combined_fp = practice_laps(loaded)
 
-# Save to CSV
-combined_fp.to_csv("spanish_gp_2025_fp1_fp2_fp3.csv", index=False)
-print("✅ Spanish GP 2025 FP1–FP3 data saved to 'spanish_gp_2025_fp1_fp2_fp3.csv'")
+        # Save to CSV
+        combined_fp.to_csv(OUTPUT_FILE, index=False)
+        rec.rows = len(combined_fp)
+        rec.wrote(OUTPUT_FILE)
+    print(f"✅ Spanish GP 2025 FP1–FP3 data saved to '{OUTPUT_FILE}'")
@@ -0,0 +1,107 @@
+"""
+Created on Sun Jun 15 09:12:48 2025
+
+@author: sid
+Central dtype schema for every table the pipeline loads.
+- Identifier columns (Driver, Team, Session, SessionFolder, ...) as categoricals
+- The model features in race_model_features.txt and other measurements as float32
+- 0/1 flags as int8, small counts as int16, FastF1 booleans as bool
+read_csv_typed() applies the parse-safe part (category/float32) while reading;
+apply_schema() finishes the job (flags, counts, booleans) once NaNs are known.
+"""
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = [
+    "Driver", "Team", "TeamName", "Compound", "Session", "SessionType", "SessionFolder",
+]
+
+FLOAT32_COLUMNS = [
+    # race_model_features.txt
+    "DriverAvgPace", "Pressure_hPa", "StintLength", "DewPoint_C", "AdjustedLapTime",
+    "LapTimeSeconds", "AvgTemp", "Humidity", "RainProbability", "TeamMedianPace",
+    "RainAmount_mm", "UVIndex", "WindSpeed_mps",
+    # raw laps / results / other engineered measurements
+    "Stint", "TyreLife", "LapNumber", "Position", "FinalRacePosition", "FinalQualiPosition",
+    "AvgRaceFinish", "AvgQualiPosition", "AvgAirTemp", "DriverSessionAvgPace",
+    "TeamSessionMedianPace", "TrackEvolutionFactor",
+    "Sector1TimeSeconds", "Sector2TimeSeconds", "Sector3TimeSeconds",
+]
+
+INT8_COLUMNS = [
+    "IsFastLap", "IsCleanAir", "IsSpanishGP", "IsFP1", "IsFP2", "IsFP3", "SessionProgression",
+]
+
+INT16_COLUMNS = ["DriverSessionLapCount", "Year"]
+
+BOOL_COLUMNS = ["IsPersonalBest", "FreshTyre", "Deleted", "FastF1Generated", "IsAccurate"]
+
+SCHEMA = {
+    **{col: "category" for col in CATEGORICAL_COLUMNS},
+    **{col: "float32" for col in FLOAT32_COLUMNS},
+    **{col: "int8" for col in INT8_COLUMNS},
+    **{col: "int16" for col in INT16_COLUMNS},
+    **{col: "bool" for col in BOOL_COLUMNS},
+}
+
+# dtypes that read_csv can apply while parsing without failing on gaps
+PARSE_DTYPES = {col: dtype for col, dtype in SCHEMA.items() if dtype in ("category", "float32")}
+
+
+def _coerce_integer(series, dtype):
+    values = pd.to_numeric(series, errors="coerce")
+    if values.isna().any():
+        return values.astype(np.float32)  # gaps cannot live in a plain int column
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return values.astype(np.int32)
+    return values.astype(dtype)
+
+
+def _coerce_bool(series):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if series.isna().any():
+        return series.astype("boolean")
+    return series.astype(bool)
+
+
+def apply_schema(df, columns=None):
+    """Cast the known columns of df to their compact dtypes in place; returns df"""
+    for col in columns or df.columns:
+        dtype = SCHEMA.get(col)
+        if dtype is None or col not in df.columns:
+            continue
+        series = df[col]
+        try:
+            if dtype == "category":
+                if not isinstance(series.dtype, pd.CategoricalDtype):
+                    df[col] = series.astype("category")
+            elif dtype == "float32":
+                if series.dtype != np.float32:
+                    df[col] = pd.to_numeric(series, errors="coerce").astype(np.float32)
+            elif dtype in ("int8", "int16"):
+                if series.dtype != dtype:
+                    df[col] = _coerce_integer(series, dtype)
+            elif dtype == "bool":
+                df[col] = _coerce_bool(series)
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ Keeping {col} as {series.dtype}: {e}")
+    return df
+
+
+def read_csv_typed(path, usecols=None, **kwargs):
+    """read_csv with the schema dtypes instead of default object/float64 inference"""
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {col: dtype for col, dtype in PARSE_DTYPES.items() if col in header}
+    try:
+        df = pd.read_csv(path, usecols=usecols, dtype=dtypes, **kwargs)
+    except ValueError:
+        # A float32 column with non-numeric text: parse untyped, coerce below
+        df = pd.read_csv(path, usecols=usecols, low_memory=False, **kwargs)
+    return apply_schema(df)
+
+
+def memory_footprint_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
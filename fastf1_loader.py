@@ -0,0 +1,146 @@
+"""
+Created on Mon Jun 16 09:26:54 2025
+
+@author: sid
+Concurrent FastF1 session loader.
+- Takes (year, GP) events x session names and loads only laps, results and weather
+  (no telemetry, no race-control messages)
+- Runs loads on a bounded thread pool with retries and exponential backoff
+- Strict offline mode: reads only from the FastF1 cache (f1_cache) or from a local
+  fixture directory laid out like data_fetching/<year>_<GP>_<session>/{laps,results,weather}.csv
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+CACHE_DIR = "f1_cache"
+MAX_WORKERS = 4
+RETRIES = 3
+BACKOFF_SECONDS = 2.0
+
+SESSION_TABLES = ["laps", "results", "weather"]
+PRACTICE_COLUMNS = [
+    "Driver", "Team", "Compound", "LapTime",
+    "Sector1Time", "Sector2Time", "Sector3Time", "TrackStatus",
+]
+
+
+class OfflineDataMissing(RuntimeError):
+    """Raised in offline mode when a session is neither cached nor in the fixtures"""
+
+
+def session_folder(year, gp_name, session_type):
+    """data_fetching-style folder name, e.g. 2025_Spanish_Grand_Prix_FP1"""
+    return f"{year}_{gp_name.replace(' ', '_')}_{session_type}"
+
+
+def load_fixture(fixture_dir, year, gp_name, session_type):
+    """Read a recorded session (laps/results/weather CSVs) from the fixture directory"""
+    folder = os.path.join(fixture_dir, session_folder(year, gp_name, session_type))
+    laps_path = os.path.join(folder, "laps.csv")
+    if not os.path.exists(laps_path):
+        raise OfflineDataMissing(f"No fixture for {year} {gp_name} {session_type} in {fixture_dir}")
+    data = {}
+    for table in SESSION_TABLES:
+        path = os.path.join(folder, f"{table}.csv")
+        data[table] = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+    return data
+
+
+def save_fixture(data, fixture_dir, year, gp_name, session_type):
+    """Record a loaded session so it can be replayed offline (and in CI)"""
+    folder = os.path.join(fixture_dir, session_folder(year, gp_name, session_type))
+    os.makedirs(folder, exist_ok=True)
+    for table in SESSION_TABLES:
+        frame = data.get(table)
+        if frame is not None and not frame.empty:
+            frame.to_csv(os.path.join(folder, f"{table}.csv"), index=False)
+    return folder
+
+
+def load_fastf1_session(year, gp_name, session_type, cache_dir=CACHE_DIR, offline=False):
+    """Load laps/results/weather through FastF1 (imported lazily: fixture runs do not need it)"""
+    import fastf1
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fastf1.Cache.enable_cache(cache_dir)
+    fastf1.Cache.offline_mode(offline)
+
+    session = fastf1.get_session(year, gp_name, session_type)
+    try:
+        session.load(laps=True, telemetry=False, weather=True, messages=False)
+    except Exception as e:
+        if offline:
+            raise OfflineDataMissing(f"{year} {gp_name} {session_type} is not in {cache_dir}: {e}") from e
+        raise
+    if offline and (session.laps is None or session.laps.empty):
+        raise OfflineDataMissing(f"{year} {gp_name} {session_type} has no cached laps in {cache_dir}")
+
+    return {
+        "laps": pd.DataFrame(session.laps),
+        "results": pd.DataFrame(session.results),
+        "weather": pd.DataFrame(session.weather_data) if session.weather_data is not None else pd.DataFrame(),
+    }
+
+
+def load_session(year, gp_name, session_type, cache_dir=CACHE_DIR, offline=False, fixture_dir=None,
+                 retries=RETRIES, backoff=BACKOFF_SECONDS):
+    """One session, from fixtures when available, else FastF1 with retries"""
+    if fixture_dir is not None:
+        try:
+            return load_fixture(fixture_dir, year, gp_name, session_type)
+        except OfflineDataMissing:
+            if offline:
+                # Strict offline: fall back to the FastF1 cache only, never the network
+                return load_fastf1_session(year, gp_name, session_type, cache_dir, offline=True)
+
+    if offline:
+        return load_fastf1_session(year, gp_name, session_type, cache_dir, offline=True)
+
+    for attempt in range(1, retries + 1):
+        try:
+            return load_fastf1_session(year, gp_name, session_type, cache_dir)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            wait = backoff * 2 ** (attempt - 1)
+            print(f"⚠️ {year} {gp_name} {session_type} failed ({e}); retry {attempt}/{retries - 1} in {wait:.0f}s")
+            time.sleep(wait)
+
+
+def fetch_sessions(events, sessions, cache_dir=CACHE_DIR, offline=False, fixture_dir=None,
+                   workers=MAX_WORKERS, retries=RETRIES, record_dir=None):
+    """
+    Load every (year, GP) x session concurrently.
+    Returns {(year, gp_name, session_type): {"laps", "results", "weather"}} in request order.
+    record_dir: optionally save each loaded session as a fixture folder.
+    """
+    keys = [(year, gp_name, session_type) for year, gp_name in events for session_type in sessions]
+
+    def _load(key):
+        data = load_session(*key, cache_dir=cache_dir, offline=offline, fixture_dir=fixture_dir, retries=retries)
+        if record_dir is not None:
+            save_fixture(data, record_dir, *key)
+        print(f"✅ Loaded {key[0]} {key[1]} {key[2]}: {len(data['laps'])} laps")
+        return data
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(keys)))) as pool:
+        loaded = list(pool.map(_load, keys))
+    return dict(zip(keys, loaded))
+
+
+def practice_laps(loaded, columns=PRACTICE_COLUMNS):
+    """Combined FP lap table (the columns preprocess_fpdata_for_prediction.py expects)"""
+    frames = []
+    for (year, gp_name, session_type), data in loaded.items():
+        laps = data["laps"]
+        lap_data = laps[[col for col in columns if col in laps.columns]].copy()
+        lap_data["Session"] = session_type
+        if len({(y, g) for y, g, _ in loaded}) > 1:
+            lap_data["Year"] = year
+            lap_data["GrandPrix"] = gp_name
+        frames.append(lap_data)
+    return pd.concat(frames, ignore_index=True)
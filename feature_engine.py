@@ -0,0 +1,106 @@
+"""
+Created on Tue Jun 10 09:22:05 2025
+
+@author: sid
+Single-pass group-level feature engine.
+- Features are declared as (name, group keys, value column, aggregation)
+- Group codes are factorized once per key set and shared by every feature on it
+- Results are broadcast back with a NumPy take and written as new columns,
+  so the lap table is never merged/rebuilt
+"""
+
+import numpy as np
+import pandas as pd
+
+# Feature declarations used by feature_engineering.py
+LAP_GROUP_FEATURES = [
+    ("DriverAvgPace", ["Driver"], "LapTimeSeconds", "mean"),
+    ("TeamMedianPace", ["Team"], "LapTimeSeconds", "median"),
+    ("DriverSessionLapCount", ["Driver", "SessionFolder"], None, "size"),
+]
+
+SUPPORTED_AGGREGATIONS = ("mean", "sum", "count", "size", "median", "min", "max", "std")
+
+
+def group_codes(df, keys):
+    """
+    Dense group code per row for the given key columns (-1 where any key is missing)
+    plus the number of groups.
+    """
+    codes = None
+    for key in keys:
+        key_codes, uniques = pd.factorize(df[key], sort=False)
+        if codes is None:
+            codes = key_codes.astype(np.int64)
+            continue
+        missing = (codes < 0) | (key_codes < 0)
+        codes = codes * len(uniques) + key_codes
+        codes[missing] = -1
+
+    if len(keys) > 1:
+        # Re-densify the combined codes so bincount stays small
+        valid = codes >= 0
+        dense, uniques = pd.factorize(codes[valid], sort=False)
+        codes[valid] = dense
+        return codes, len(uniques)
+    return codes, int(codes.max()) + 1 if len(codes) else 0
+
+
+def _aggregate(codes, n_groups, values, agg):
+    """Per-group result array of length n_groups"""
+    valid = codes >= 0
+    if agg == "size":
+        return np.bincount(codes[valid], minlength=n_groups)
+
+    present = valid & ~np.isnan(values)
+    group = codes[present]
+    vals = values[present]
+    counts = np.bincount(group, minlength=n_groups)
+    if agg == "count":
+        return counts
+    if agg in ("sum", "mean"):
+        sums = np.bincount(group, weights=vals, minlength=n_groups)
+        if agg == "sum":
+            return sums
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    # Order statistics fall back to pandas' grouped Cython kernels
+    grouped = pd.Series(vals).groupby(group, sort=False)
+    result = getattr(grouped, agg)()
+    return result.reindex(np.arange(n_groups)).to_numpy(dtype=np.float64)
+
+
+def add_group_features(df, specs):
+    """
+    Compute every (name, keys, column, agg) feature in specs and write it into df in place.
+    Rows whose group key is missing get NaN, matching a left merge on the group table.
+    Returns df for chaining.
+    """
+    codes_cache = {}
+    for name, keys, column, agg in specs:
+        if agg not in SUPPORTED_AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation '{agg}' for feature {name}")
+        keys = [keys] if isinstance(keys, str) else list(keys)
+
+        cache_key = tuple(keys)
+        if cache_key not in codes_cache:
+            codes_cache[cache_key] = group_codes(df, keys)
+        codes, n_groups = codes_cache[cache_key]
+        if n_groups == 0:
+            df[name] = np.nan
+            continue
+
+        values = None
+        if agg != "size":
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+        per_group = _aggregate(codes, n_groups, values, agg)
+
+        missing = codes < 0
+        if missing.any():
+            broadcast = per_group.astype(np.float64)[np.where(missing, 0, codes)]
+            broadcast[missing] = np.nan
+        else:
+            broadcast = per_group[codes]
+        df[name] = broadcast
+    return df
@@ -6,76 +6,103 @@ This script:
 - Combines cleaned 2024 + 2025 race data
 - Adds engineered features (pace, air, stint, position)
 - Injects manual weather data for Barcelona
-- Outputs: final_features.csv (model-ready dataset)
+- Outputs: final_features_cleaned.parquet (model-ready dataset) and the historical
+  stats index (stats_index.parquet) the pace features are looked up from
+The per-lap and group-level steps are importable (see incremental_store.py).
 """
 
 import pandas as pd
 import numpy as np
 import os
 
-# === Paths ===
-INPUT_FILE = "/Users/sid/Downloads/Spanish_GP_2025/clean_data/combined_cleaned_2024_2025_with_positions.csv"
-OUTPUT_FILE = "/Users/sid/Downloads/Spanish_GP_2025/clean_data/final_features_cleaned.csv"
-
-# === Load data ===
-df = pd.read_csv(INPUT_FILE)
+from columnar_store import read_table, write_table
+from feature_engine import LAP_GROUP_FEATURES, add_group_features
+from get_weather_data import BARCELONA_WEATHER
+from instrumentation import stage
+from project_paths import PATHS
+from race_calendar import TRACK_INDICATORS
+from stats_index import StatsIndex
 
-# === Drop unnecessary columns ===
-drop_cols = [
-    "HeadshotUrl", "BroadcastName", "Time", "LapStartTime", "LapStartDate", 
+# === Paths ===
+INPUT_FILE = PATHS["combined"]
+OUTPUT_FILE = PATHS["features"]
+STATS_INDEX_FILE = PATHS["stats_index"]
+EXPORT_CSV = False  # also write a .csv copy next to the Parquet output
+
+# === Unnecessary columns ===
+DROP_COLS = [
+    "HeadshotUrl", "BroadcastName", "Time", "LapStartTime", "LapStartDate",
     "Deleted", "FastF1Generated", "IsAccurate", "Unnamed: 0"
 ]
-df = df.drop(columns=[col for col in drop_cols if col in df.columns])
-
-# === Barcelona GP Weather (Manual) ===
-weather_features = {
-    "AvgTemp": np.mean([22, 25, 24, 23]),
-    "RainAmount_mm": 0.24,
-    "RainProbability": 1.0,
-    "WindSpeed_mps": 3.9,
-    "Pressure_hPa": 1019,
-    "Humidity": 52,
-    "UVIndex": 9,
-    "DewPoint_C": 15,
-}
-for key, value in weather_features.items():
-    df[key] = value
-
-# === Lap time cleanup ===
-df["LapTimeSeconds"] = pd.to_numeric(df["LapTimeSeconds"], errors="coerce")
-df = df.dropna(subset=["LapTimeSeconds"])
-
-# === Feature Engineering ===
-df["StintLength"] = df["Stint"].fillna(0)
-df["IsFastLap"] = df.get("IsPersonalBest", 0).astype(int)
-
-# 🏎️ Driver Average Pace
-driver_avg = df.groupby("Driver")["LapTimeSeconds"].mean().rename("DriverAvgPace")
-df = df.merge(driver_avg, on="Driver", how="left")
-
-# 🔧 Team Median Pace
-team_median = df.groupby("Team")["LapTimeSeconds"].median().rename("TeamMedianPace")
-df = df.merge(team_median, on="Team", how="left")
-
-# 🇪🇸 Spanish GP indicator
-df["IsSpanishGP"] = df["SessionFolder"].str.contains("Spanish", case=False).astype(int)
-
-# 💨 Clean Air Pace
-df["IsCleanAir"] = (df["TrackStatus"] == 1).astype(int) if "TrackStatus" in df.columns else np.nan
-
-# 🌧️ Adjusted Lap Time (weather-weighted)
-df["AdjustedLapTime"] = df["LapTimeSeconds"] * (
-    1 + df["RainProbability"] * 0.05 + df["Humidity"] / 1000
-)
-
-# 🧮 Lap count per driver per session
-lap_counts = df.groupby(["Driver", "SessionFolder"]).size().rename("DriverSessionLapCount")
-df = df.merge(lap_counts, on=["Driver", "SessionFolder"], how="left")
-
-# === Drop rows with missing engineered values ===
-essential_cols = ["DriverAvgPace", "TeamMedianPace"]
-df.dropna(subset=essential_cols, inplace=True)
-
-# === Save final dataset ===
-df.to_csv(OUTPUT_FILE, index=False)
-print(f"✅ Final cleaned and engineered dataset saved to: {OUTPUT_FILE}")
\ No newline at end of file
+
+# === Barcelona GP Weather (Manual; see get_weather_data.py for forecasts) ===
+WEATHER_FEATURES = dict(BARCELONA_WEATHER)
+
+ESSENTIAL_COLS = ["DriverAvgPace", "TeamMedianPace"]
+# Served by key from the stats index; the remaining group features are per session
+INDEXED_COLS = ["DriverAvgPace", "TeamMedianPace"]
+SESSION_GROUP_FEATURES = [spec for spec in LAP_GROUP_FEATURES if spec[0] not in INDEXED_COLS]
+
+
+def add_lap_features(df):
+    """Row-local features: no value depends on any other lap"""
+    df = df.drop(columns=[col for col in DROP_COLS if col in df.columns])
+
+    for key, value in WEATHER_FEATURES.items():
+        df[key] = value
+
+    # === Lap time cleanup ===
+    df["LapTimeSeconds"] = pd.to_numeric(df["LapTimeSeconds"], errors="coerce")
+    df = df.dropna(subset=["LapTimeSeconds"]).copy()
+
+    df["StintLength"] = df["Stint"].fillna(0)
+    df["IsFastLap"] = df.get("IsPersonalBest", 0).astype(int)
+
+    # 🇪🇸 Track indicators (IsSpanishGP, ...), shared with FP preprocessing via race_calendar
+    for feature, fragment in TRACK_INDICATORS.items():
+        df[feature] = df["SessionFolder"].str.contains(fragment, case=False).astype(int)
+
+    # 💨 Clean Air Pace
+    df["IsCleanAir"] = (df["TrackStatus"] == 1).astype(int) if "TrackStatus" in df.columns else np.nan
+
+    # 🌧️ Adjusted Lap Time (weather-weighted)
+    df["AdjustedLapTime"] = df["LapTimeSeconds"] * (
+        1 + df["RainProbability"] * 0.05 + df["Humidity"] / 1000
+    )
+    return df
+
+
+def engineer_features(df, stats_index_file=None):
+    """Full feature set for the combined lap table (optionally saving its stats index)"""
+    with stage("lap_features") as rec:
+        df = add_lap_features(df)
+        rec.rows = len(df)
+
+    # 🏎️ Driver Average Pace, 🔧 Team Median Pace: indexed per driver/team/season, then looked up by key
+    with stage("stats_index") as rec:
+        index = StatsIndex.from_laps(df)
+        if stats_index_file:
+            index.save(stats_index_file)
+            rec.wrote(stats_index_file)
+        index.attach(df, INDEXED_COLS)
+
+    # 🧮 lap count per driver per session (one grouped pass, written in place)
+    with stage("group_features"):
+        add_group_features(df, SESSION_GROUP_FEATURES)
+
+    # === Drop rows with missing engineered values ===
+    df.dropna(subset=ESSENTIAL_COLS, inplace=True)
+    return df
+
+
+if __name__ == "__main__":
+    with stage("features") as rec:
+        rec.read(INPUT_FILE)
+        df = engineer_features(read_table(INPUT_FILE), stats_index_file=STATS_INDEX_FILE)
+
+        # === Save final dataset ===
+        write_table(df, OUTPUT_FILE, export_csv=EXPORT_CSV)
+        rec.rows = len(df)
+        rec.wrote(OUTPUT_FILE)
+    print(f"✅ Final cleaned and engineered dataset saved to: {OUTPUT_FILE}")
+    print(f"📇 Historical stats index saved to: {STATS_INDEX_FILE}")
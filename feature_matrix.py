@@ -0,0 +1,146 @@
+"""
+Created on Wed Jun 25 09:33:07 2025
+
+@author: sid
+Compiled feature-matrix builder for the race model.
+- race_model_features.txt, the imputer medians and the scaler mean/scale are folded into
+  per-column constants once: out[:, j] = (x - mean_j) / scale_j, NaN -> (median_j - mean_j) / scale_j
+- Each feature column is read straight from the DataFrame and written into one
+  preallocated C-contiguous float32 matrix (no reindex / apply / intermediate frames)
+- Schema drift fails fast: missing or non-numeric feature columns, or artifacts that
+  disagree with the feature list, raise SchemaDriftError before anything is predicted
+  (transform(..., impute_missing=True) fills absent columns with the training median instead)
+Values match imputer.transform + scaler.transform cast to float32, which is what the
+tree models (sklearn, xgboost) compare against anyway.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from project_paths import FEATURES_LIST_FILE, MODEL_DIR
+
+IMPUTER_PATH = os.path.join(MODEL_DIR, "imputer.pkl")
+SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
+OUTPUT_DTYPE = np.float32
+
+
+class SchemaDriftError(ValueError):
+    """Prediction-time features do not match what the model was trained on"""
+
+
+def read_feature_list(path=FEATURES_LIST_FILE):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def check_schema(df, features, impute_missing=False):
+    """
+    Raise SchemaDriftError unless every feature is a numeric/bool column of df.
+    With impute_missing, absent columns are allowed and returned (they get the training median).
+    All-null object columns (e.g. JSON nulls) count as numeric.
+    """
+    missing = [col for col in features if col not in df.columns]
+    if missing and not impute_missing:
+        raise SchemaDriftError(f"Missing model feature columns: {', '.join(missing)}")
+    non_numeric = [col for col in features if col in df.columns
+                   and not (pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col]))
+                   and not (df[col].dtype == object and df[col].isna().all())]
+    if non_numeric:
+        raise SchemaDriftError("Non-numeric model feature columns: " + ", ".join(
+            f"{col} ({df[col].dtype})" for col in non_numeric))
+    return missing
+
+
+def _artifact_names(artifact):
+    names = getattr(artifact, "feature_names_in_", None)
+    return None if names is None else [str(name) for name in names]
+
+
+class FeatureMatrixBuilder:
+    """Feature list + imputer + scaler compiled into one column-wise transform"""
+
+    def __init__(self, features, fill, offset, scale, kept=None):
+        self.features = list(features)
+        kept = np.ones(len(self.features), dtype=bool) if kept is None else np.asarray(kept, dtype=bool)
+        # Columns the imputer drops (all-NaN at training time) never reach the model
+        self.columns = [col for col, keep in zip(self.features, kept) if keep]
+        self.fill = np.asarray(fill, dtype=np.float64)[kept]
+        self.offset = np.asarray(offset, dtype=np.float64)[kept]
+        self.scale = np.asarray(scale, dtype=np.float64)[kept]
+        # Missing values are imputed and scaled once here, not per row
+        self.scaled_fill = ((self.fill - self.offset) / self.scale).astype(OUTPUT_DTYPE)
+        self.identity = bool(np.all(self.offset == 0) and np.all(self.scale == 1))
+
+    @classmethod
+    def from_artifacts(cls, features, imputer, scaler=None):
+        n = len(features)
+        if getattr(imputer, "add_indicator", False):
+            raise SchemaDriftError("Imputers with missing-value indicators are not supported")
+        medians = np.asarray(imputer.statistics_, dtype=np.float64)
+        if len(medians) != n:
+            raise SchemaDriftError(f"Imputer was fitted on {len(medians)} features, feature list has {n}")
+        names = _artifact_names(imputer)
+        if names is not None and names != list(features):
+            raise SchemaDriftError("Imputer feature names/order differ from the feature list")
+        kept = ~np.isnan(medians) | bool(getattr(imputer, "keep_empty_features", False))
+
+        offset, scale = np.zeros(n), np.ones(n)
+        if scaler is not None:
+            n_kept = int(kept.sum())
+            if scaler.n_features_in_ != n_kept:
+                raise SchemaDriftError(f"Scaler was fitted on {scaler.n_features_in_} features, "
+                                       f"the imputer outputs {n_kept}")
+            if scaler.mean_ is not None:
+                offset[kept] = scaler.mean_
+            if scaler.scale_ is not None:
+                scale[kept] = scaler.scale_
+        return cls(features, np.nan_to_num(medians), offset, scale, kept)
+
+    @classmethod
+    def load(cls, features_path=FEATURES_LIST_FILE, imputer_path=IMPUTER_PATH, scaler_path=None):
+        import joblib
+
+        scaler = joblib.load(scaler_path) if scaler_path and os.path.exists(scaler_path) else None
+        return cls.from_artifacts(read_feature_list(features_path), joblib.load(imputer_path), scaler)
+
+    def allocate(self, n_rows):
+        return np.empty((n_rows, len(self.columns)), dtype=OUTPUT_DTYPE, order="C")
+
+    def transform(self, df, out=None, impute_missing=False):
+        """
+        Model input matrix for the rows of df, written into out (allocated when None).
+        out must be a C-contiguous float32 array of shape (len(df), n_columns).
+        impute_missing fills absent feature columns with the training median instead of raising.
+        """
+        missing = set(check_schema(df, self.columns, impute_missing))
+        n_rows = len(df)
+        if out is None:
+            out = self.allocate(n_rows)
+        elif out.shape != (n_rows, len(self.columns)) or out.dtype != OUTPUT_DTYPE or not out.flags.c_contiguous:
+            raise ValueError(f"out must be a C-contiguous {np.dtype(OUTPUT_DTYPE)} array of shape "
+                             f"{(n_rows, len(self.columns))}")
+
+        scratch = np.empty(n_rows, dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            column = out[:, j]
+            if col in missing:
+                column[:] = self.scaled_fill[j]
+                continue
+            series = df[col]
+            if isinstance(series.dtype, np.dtype) and series.dtype != object:
+                values = series.to_numpy()
+            else:
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            if self.identity:
+                np.copyto(scratch, values, casting="unsafe")
+            else:
+                # (x - mean) / scale in float64, exactly as the scaler computes it
+                np.subtract(values, self.offset[j], out=scratch, casting="unsafe")
+                np.divide(scratch, self.scale[j], out=scratch)
+            np.copyto(column, scratch, casting="same_kind")
+            nan = np.isnan(column)
+            if nan.any():
+                column[nan] = self.scaled_fill[j]
+        return out
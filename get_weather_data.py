@@ -3,13 +3,22 @@ Created on Thu May 29 13:09:21 2025
 
 @author: sid
 Getting the weather data for Spanish GP 2025
+- Forecasts are cached on disk (TTL + max entries), keyed by location and forecast window
+- The 3-hourly forecast is indexed by timestamp and interpolated to any time in the window
+- weather_features() returns the same feature dict feature_engineering.py and
+  preprocess_fpdata_for_prediction.py use (BARCELONA_WEATHER is the manual fallback)
 """
-import requests
+import hashlib
 import json
-from datetime import datetime
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
 
 # === Hardcoded for testing ===
-API_KEY = "your_actual_api_key_here"  # 🔁 Replace this with your real API key
+API_KEY = os.environ.get("OPENWEATHER_API_KEY", "your_actual_api_key_here")  # 🔁 Replace this with your real API key
+BASE_URL = "http://api.openweathermap.org/data/2.5/forecast"
 
 # === Setup for Spanish GP (Barcelona) ===
 LATITUDE = 41.57
@@ -19,37 +28,208 @@ UNITS = "metric"
 # === Forecast target datetime (race time) ===
 # Spanish GP 2025 is on June 1, Sunday, race at 15:00 local time (CEST)
 forecast_time_str = "2025-06-01 13:00:00"  # in UTC (Barcelona is UTC+2 in summer)
+RACE_DURATION_HOURS = 2
+
+# === Cache ===
+CACHE_DIR = "weather_cache"
+CACHE_TTL_SECONDS = 3 * 3600  # the free forecast is refreshed every 3 hours
+CACHE_MAX_ENTRIES = 64
+FORECAST_STEP_SECONDS = 3 * 3600
+SAMPLE_STEP_SECONDS = 300  # window features average the interpolated forecast every 5 minutes
+
+# === Barcelona GP Weather (Manual) — used when no forecast is available ===
+BARCELONA_WEATHER = {
+    "AvgTemp": 23.5,
+    "RainAmount_mm": 0.24,
+    "RainProbability": 1.0,
+    "WindSpeed_mps": 3.9,
+    "Pressure_hPa": 1019,
+    "Humidity": 52,
+    "UVIndex": 9,
+    "DewPoint_C": 15,
+}
+
+
+def to_timestamp(value):
+    """Unix seconds from a datetime, 'YYYY-mm-dd HH:MM:SS' (UTC) string or number"""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def dew_point(temp_c, humidity):
+    """Magnus approximation (the forecast endpoint does not return a dew point)"""
+    humidity = np.clip(np.asarray(humidity, dtype=np.float64), 1e-3, 100)
+    gamma = np.log(humidity / 100) + 17.62 * temp_c / (243.12 + temp_c)
+    return 243.12 * gamma / (17.62 - gamma)
+
+
+class ForecastCache:
+    """One JSON file per (location, window); stale entries expire, oldest are evicted"""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(lat, lon, start, end, units=UNITS):
+        raw = f"{lat:.2f}|{lon:.2f}|{units}|{int(start)}|{int(end)}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key, now=None):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            entry = json.load(f)
+        if (now or time.time()) - entry["fetched_at"] > self.ttl_seconds:
+            os.remove(path)
+            return None
+        return entry["forecast"]
+
+    def put(self, key, forecast, now=None):
+        now = now or time.time()
+        with open(self._path(key), "w") as f:
+            json.dump({"fetched_at": now, "forecast": forecast}, f)
+        self.evict(now)
+
+    def evict(self, now=None):
+        """Drop expired entries, then the oldest ones beyond max_entries"""
+        now = now or time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            with open(path) as f:
+                fetched_at = json.load(f)["fetched_at"]
+            if now - fetched_at > self.ttl_seconds:
+                os.remove(path)
+            else:
+                entries.append((fetched_at, path))
+        for _, path in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+            os.remove(path)
+
+
+class ForecastIndex:
+    """Timestamp-sorted forecast arrays with linear interpolation to any time"""
+
+    FIELDS = ["temp", "humidity", "pressure", "wind_speed", "pop", "rain_mm"]
+
+    def __init__(self, entries):
+        if not entries:
+            raise ValueError("Empty forecast")
+        entries = sorted(entries, key=lambda entry: entry["dt"])
+        self.timestamps = np.array([entry["dt"] for entry in entries], dtype=np.float64)
+        self.values = {
+            "temp": np.array([entry["main"]["temp"] for entry in entries], dtype=np.float64),
+            "humidity": np.array([entry["main"]["humidity"] for entry in entries], dtype=np.float64),
+            "pressure": np.array([entry["main"]["pressure"] for entry in entries], dtype=np.float64),
+            "wind_speed": np.array([entry.get("wind", {}).get("speed", np.nan) for entry in entries], dtype=np.float64),
+            "pop": np.array([entry.get("pop", 0.0) for entry in entries], dtype=np.float64),
+            "rain_mm": np.array([entry.get("rain", {}).get("3h", 0.0) for entry in entries], dtype=np.float64),
+        }
+
+    def covers(self, timestamp):
+        return self.timestamps[0] <= timestamp <= self.timestamps[-1]
+
+    def at(self, timestamps):
+        """Interpolated fields at one or many unix timestamps (clamped to the forecast range)"""
+        timestamps = np.atleast_1d(np.asarray(timestamps, dtype=np.float64))
+        return {field: np.interp(timestamps, self.timestamps, values) for field, values in self.values.items()}
+
+    def features(self, start, end=None, uv_index=BARCELONA_WEATHER["UVIndex"]):
+        """Model weather features averaged over [start, end] (a single instant when end is None)"""
+        start = to_timestamp(start)
+        end = start if end is None else to_timestamp(end)
+        samples = self.at(np.arange(start, end + 1, SAMPLE_STEP_SECONDS))
+        temp = samples["temp"]
+        return {
+            "AvgTemp": float(temp.mean()),
+            "RainAmount_mm": float(samples["rain_mm"].mean()),
+            "RainProbability": float(samples["pop"].max()),
+            "WindSpeed_mps": float(samples["wind_speed"].mean()),
+            "Pressure_hPa": float(samples["pressure"].mean()),
+            "Humidity": float(samples["humidity"].mean()),
+            "UVIndex": uv_index,  # not part of the 3-hourly forecast
+            "DewPoint_C": float(dew_point(temp, samples["humidity"]).mean()),
+        }
+
+
+def fetch_forecast(lat=LATITUDE, lon=LONGITUDE, api_key=API_KEY, units=UNITS, base_url=BASE_URL, timeout=10):
+    """Raw 3-hourly forecast entries from OpenWeatherMap"""
+    import requests
+
+    response = requests.get(base_url, params={"lat": lat, "lon": lon, "appid": api_key, "units": units},
+                            timeout=timeout)
+    weather_data = response.json()
+    if response.status_code != 200:
+        raise ValueError(f"Failed to fetch weather data: {weather_data}")
+    return weather_data["list"]
+
+
+def get_forecast_index(start, end=None, lat=LATITUDE, lon=LONGITUDE, api_key=API_KEY, units=UNITS,
+                       base_url=BASE_URL, cache=None):
+    """ForecastIndex for the window, served from the disk cache while fresh"""
+    start = to_timestamp(start)
+    end = start if end is None else to_timestamp(end)
+    cache = cache or ForecastCache()
+    key = ForecastCache.key(lat, lon, start, end, units)
+
+    forecast = cache.get(key)
+    if forecast is None:
+        entries = fetch_forecast(lat, lon, api_key, units, base_url)
+        # Keep only the entries needed to interpolate inside the window
+        forecast = [entry for entry in entries
+                    if start - FORECAST_STEP_SECONDS <= entry["dt"] <= end + FORECAST_STEP_SECONDS]
+        if not forecast:
+            raise ValueError(f"No weather forecast found for {datetime.fromtimestamp(start, timezone.utc)}")
+        cache.put(key, forecast)
+    return ForecastIndex(forecast)
+
+
+def weather_features(start, end=None, fallback=BARCELONA_WEATHER, **kwargs):
+    """
+    Feature dict for a session window (same keys as BARCELONA_WEATHER).
+    Falls back to the manual values when the forecast cannot be fetched.
+    """
+    try:
+        return get_forecast_index(start, end, **kwargs).features(start, end)
+    except Exception as e:
+        if fallback is None:
+            raise
+        print(f"⚠️ Weather forecast unavailable ({e}); using manual values")
+        return dict(fallback)
+
+
+if __name__ == "__main__":
+    from instrumentation import stage
+
+    race_start = to_timestamp(forecast_time_str)
+    with stage("weather_forecast") as rec:
+        index = get_forecast_index(race_start, race_start + RACE_DURATION_HOURS * 3600)
+        rec.rows = len(index.timestamps)
+    at_start = {field: float(values[0]) for field, values in index.at(race_start).items()}
+    features = index.features(race_start, race_start + RACE_DURATION_HOURS * 3600)
 
-# === Fetch forecast from OpenWeatherMap ===
-url = (
-    f"http://api.openweathermap.org/data/2.5/forecast"
-    f"?lat={LATITUDE}&lon={LONGITUDE}&appid={API_KEY}&units={UNITS}"
-)
-
-response = requests.get(url)
-weather_data = response.json()
-
-if response.status_code != 200:
-    raise ValueError(f"Failed to fetch weather data: {weather_data}")
-
-# === Extract forecast for race time ===
-forecast_data = next((entry for entry in weather_data["list"] if entry["dt_txt"] == forecast_time_str), None)
-
-if not forecast_data:
-    raise ValueError(f"No weather forecast found for {forecast_time_str}")
-
-# === Print out relevant info ===
-main = forecast_data["main"]
-weather = forecast_data["weather"][0]
-wind = forecast_data["wind"]
-
-print("\n🌤️ Weather Forecast for 2025 Spanish GP (Race Time)")
-print("----------------------------------------------------")
-print(f"Description:     {weather['description'].title()}")
-print(f"Temperature:     {main['temp']}°C")
-print(f"Feels Like:      {main['feels_like']}°C")
-print(f"Humidity:        {main['humidity']}%")
-print(f"Pressure:        {main['pressure']} hPa")
-print(f"Wind Speed:      {wind['speed']} m/s")
-print(f"Rain Probability:{forecast_data.get('pop', 0) * 100:.0f}%")
-print("----------------------------------------------------")
\ No newline at end of file
+    # === Print out relevant info ===
+    print("\n🌤️ Weather Forecast for 2025 Spanish GP (Race Time)")
+    print("----------------------------------------------------")
+    print(f"Temperature:     {at_start['temp']:.1f}°C")
+    print(f"Humidity:        {at_start['humidity']:.0f}%")
+    print(f"Pressure:        {at_start['pressure']:.0f} hPa")
+    print(f"Wind Speed:      {at_start['wind_speed']:.1f} m/s")
+    print(f"Rain Probability:{at_start['pop'] * 100:.0f}%")
+    print("----------------------------------------------------")
+    print("Race-window model features:")
+    for key, value in features.items():
+        print(f"  {key}: {value:.2f}")
@@ -0,0 +1,419 @@
+"""
+Created on Mon Jun 30 09:12:48 2025
+
+@author: sid
+Budgeted hyperparameter search for the race models: Hyperband over successive halving.
+- Configurations are sampled from SEARCH_SPACE for all three families; the halving resource
+  is the number of trees / boosting rounds, MIN_TREES -> MAX_TREES in steps of ETA
+- Every rung runs its surviving (config, fold) fits in one spawn process pool over the
+  memmapped imputed matrix (as model_comparison.py); the best 1/ETA go on to the next rung
+- XGBoost trials use the native API with early stopping on whole sessions held back from the
+  fold's training laps (never the scored test laps); each worker builds one QuantileDMatrix
+  set per fold and reuses it for every trial it runs
+- Wall-clock budget: nothing new starts past the deadline and queued fits are cancelled
+  (fits already running finish and are kept, so the overrun is at most one fit)
+- Every finished fit is appended to a JSONL trial log (SEARCH_TRIALS_FILE); a rerun with the
+  same seed samples the same configs and only runs what the log does not hold yet
+- The best config is scored once more through model_comparison.compare_models exactly as
+  train_model.py will refit it (cv_mae; XGBoost with its early-stopped tree count and no
+  early stopping) and written to BEST_CONFIG_FILE next to race_model_features.txt
+Usage: python hyperparameter_search.py [--budget 3600] [--method hyperband|halving] [--seed 42] [--fresh]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_absolute_error
+from threadpoolctl import threadpool_limits
+import xgboost as xgb
+
+from instrumentation import stage
+from model_comparison import RANDOM_STATE, candidate_models, compare_models, core_budget, make_folds
+from project_paths import BEST_CONFIG_FILE, MODEL_DIR, PATHS, SEARCH_TRIALS_FILE
+
+# === Search ===
+SEARCH_BUDGET_SECONDS = 3600
+ETA = 3  # keep the best 1/ETA of each rung, ETA x the trees on the next
+MIN_TREES = 25
+MAX_TREES = 675
+HALVING_CONFIGS = 27  # configs of a plain successive-halving run (--method halving)
+EARLY_STOPPING_ROUNDS = 25
+EARLY_STOPPING_FRACTION = 0.2  # share of each fold's training sessions held back for early stopping
+XGB_MAX_BIN = 256  # fixed: the per-fold QuantileDMatrix is built once for this bin count
+
+# (kind, ...) per parameter: ("log", low, high), ("float", low, high), ("int", low, high), ("choice", [values])
+SEARCH_SPACE = {
+    "GradientBoosting": {
+        "learning_rate": ("log", 0.01, 0.3),
+        "max_depth": ("int", 2, 8),
+        "subsample": ("float", 0.5, 1.0),
+        "min_samples_leaf": ("int", 1, 50),
+        "max_features": ("choice", [None, "sqrt", 0.5]),
+    },
+    "RandomForest": {
+        "max_depth": ("choice", [None, 6, 10, 16, 24]),
+        "min_samples_leaf": ("int", 1, 20),
+        "max_features": ("choice", [1.0, "sqrt", 0.5, 0.3]),
+    },
+    "XGBoost": {
+        "learning_rate": ("log", 0.01, 0.3),
+        "max_depth": ("int", 2, 10),
+        "subsample": ("float", 0.5, 1.0),
+        "colsample_bytree": ("float", 0.5, 1.0),
+        "min_child_weight": ("log", 1.0, 50.0),
+        "reg_lambda": ("log", 0.1, 10.0),
+    },
+}
+XGB_FIXED = {"objective": "reg:squarederror", "eval_metric": "mae", "tree_method": "hist", "max_bin": XGB_MAX_BIN}
+
+
+def sample_params(rng, model_name):
+    """One draw from SEARCH_SPACE[model_name], as plain JSON-able values"""
+    params = {}
+    for name, (kind, *spec) in SEARCH_SPACE[model_name].items():
+        if kind == "log":
+            params[name] = float(np.exp(rng.uniform(np.log(spec[0]), np.log(spec[1]))))
+        elif kind == "float":
+            params[name] = float(rng.uniform(spec[0], spec[1]))
+        elif kind == "int":
+            params[name] = int(rng.integers(spec[0], spec[1] + 1))
+        else:
+            params[name] = spec[0][int(rng.integers(len(spec[0])))]
+    return params
+
+
+def brackets(method="hyperband", eta=ETA, min_trees=MIN_TREES, max_trees=MAX_TREES, n_configs=HALVING_CONFIGS):
+    """(configs, trees on the first rung, rungs after the first) per bracket"""
+    s_max = int(math.floor(math.log(max_trees / min_trees, eta) + 1e-9))
+    if method == "halving":
+        return [(n_configs, min_trees, s_max)]
+    if method != "hyperband":
+        raise ValueError(f"Unknown search method {method!r} (hyperband or halving)")
+    return [(int(math.ceil((s_max + 1) / (s + 1) * eta ** s)), max(1, int(round(max_trees * eta ** -s))), s)
+            for s in range(s_max, -1, -1)]
+
+
+def early_stopping_folds(folds, groups=None, fraction=EARLY_STOPPING_FRACTION, seed=RANDOM_STATE):
+    """
+    (fit_idx, stop_idx) inside each fold's training rows: whole sessions (rows without groups)
+    held back for XGBoost early stopping, so the fold's test rows only ever score
+    """
+    rng = np.random.default_rng(seed)
+    split = []
+    for train_idx, _ in folds:
+        labels = np.asarray(groups)[train_idx] if groups is not None else train_idx
+        units = pd.unique(labels)
+        n_stop = min(max(1, int(round(len(units) * fraction))), len(units) - 1)
+        stop = np.isin(labels, rng.permutation(units)[:n_stop])
+        split.append((train_idx[~stop], train_idx[stop]))
+    return split
+
+
+def data_fingerprint(X, y, folds, stop_folds=()):
+    """Trial-log records only count for the same matrix, target, folds and early-stopping split"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X, dtype=np.float64))
+    digest.update(np.asarray(y, dtype=np.float64))
+    for train_idx, test_idx in folds:
+        digest.update(np.asarray(test_idx, dtype=np.int64))
+    for fit_idx, stop_idx in stop_folds:
+        digest.update(np.asarray(stop_idx, dtype=np.int64))
+    return digest.hexdigest()[:16]
+
+
+def search_data_id(config, X, y, groups=None):
+    """Fingerprint a best config's search would give this data (its folds and early-stopping split)"""
+    search = config["search"]
+    folds = make_folds(len(y), groups, search["cv_folds"])
+    return data_fingerprint(X, y, folds, early_stopping_folds(folds, groups, seed=search["seed"]))
+
+
+def _config_key(model_name, params):
+    return json.dumps([model_name, params], sort_keys=True)
+
+
+# === Trial log ===
+def read_trial_log(path, data_id):
+    """{(config key, trees, fold): record} of the finished fits on this data"""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if record.get("data") == data_id:
+                done[(_config_key(record["model"], record["params"]), record["trees"], record["fold"])] = record
+    return done
+
+
+# === Worker side ===
+_shared = {}
+
+
+def _init_worker(x_path, y_path, folds, stop_folds, threads):
+    _shared["X"] = np.load(x_path, mmap_mode="r")
+    _shared["y"] = np.load(y_path, mmap_mode="r")
+    _shared["folds"] = folds
+    _shared["stop_folds"] = stop_folds
+    _shared["threads"] = threads
+    _shared["dmatrix"] = {}
+    _shared["limits"] = threadpool_limits(threads)
+
+
+def _fold_dmatrices(fold):
+    """(train, early stopping, test) QuantileDMatrix of one fold, built once per worker and reused by every trial"""
+    if fold not in _shared["dmatrix"]:
+        X, y, threads = _shared["X"], _shared["y"], _shared["threads"]
+        _, test_idx = _shared["folds"][fold]
+        fit_idx, stop_idx = _shared["stop_folds"][fold]
+        dtrain = xgb.QuantileDMatrix(X[fit_idx], y[fit_idx], max_bin=XGB_MAX_BIN, nthread=threads)
+        dstop = xgb.QuantileDMatrix(X[stop_idx], y[stop_idx], ref=dtrain, nthread=threads)
+        dtest = xgb.QuantileDMatrix(X[test_idx], ref=dtrain, nthread=threads)
+        _shared["dmatrix"][fold] = (dtrain, dstop, dtest)
+    return _shared["dmatrix"][fold]
+
+
+def _fit_trial(model_name, params, trees, fold):
+    """One (config, trees, fold) fit; returns its MAE and the trees actually used"""
+    X, y, threads = _shared["X"], _shared["y"], _shared["threads"]
+    train_idx, test_idx = _shared["folds"][fold]
+
+    start = time.perf_counter()
+    if model_name == "XGBoost":
+        dtrain, dstop, dtest = _fold_dmatrices(fold)
+        booster = xgb.train({**XGB_FIXED, **params, "nthread": threads, "seed": RANDOM_STATE}, dtrain,
+                            num_boost_round=trees, evals=[(dstop, "stop")],
+                            early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+        used = booster.best_iteration + 1
+        preds = booster.predict(dtest, iteration_range=(0, used))
+    else:
+        model = candidate_models(n_jobs=threads, params={model_name: {**params, "n_estimators": trees}})[model_name]
+        model.fit(X[train_idx], y[train_idx])
+        used = trees
+        preds = model.predict(X[test_idx])
+
+    return {
+        "model": model_name,
+        "params": params,
+        "trees": trees,
+        "fold": fold,
+        "mae": float(mean_absolute_error(y[test_idx], preds)),
+        "trees_used": int(used),
+        "fit_seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+# === Parent side ===
+def _run_rung(pool, configs, trees, n_folds, done, log, data_id, deadline):
+    """
+    Fit every (config, fold) of one rung that the log does not hold yet.
+    Returns (per-config fold records, out of time)
+    """
+    tasks = [(name, params, trees, fold) for name, params in configs for fold in range(n_folds)
+             if (_config_key(name, params), trees, fold) not in done]
+    pending, out_of_time = {pool.submit(_fit_trial, *task) for task in tasks}, False
+    while pending:
+        finished, pending = wait(pending, timeout=max(deadline - time.perf_counter(), 0),
+                                 return_when=FIRST_COMPLETED)
+        if not finished:
+            # Deadline: drop the queued fits, let the running ones finish (they are logged)
+            out_of_time = True
+            finished, pending = wait([future for future in pending if not future.cancel()])[0], set()
+        for future in finished:
+            record = {"data": data_id, **future.result()}
+            done[(_config_key(record["model"], record["params"]), trees, record["fold"])] = record
+            log.write(json.dumps(record) + "\n")
+            log.flush()
+
+    return [[done.get((_config_key(name, params), trees, fold)) for fold in range(n_folds)]
+            for name, params in configs], out_of_time
+
+
+def _trial_row(bracket, rung, name, params, trees, records):
+    complete = all(record is not None for record in records)
+    found = [record for record in records if record is not None]
+    return {
+        "Bracket": bracket,
+        "Rung": rung,
+        "Model": name,
+        "Trees": trees,
+        "TreesUsed": int(round(np.mean([r["trees_used"] for r in found]))) if found else None,
+        "MAE": float(np.mean([r["mae"] for r in found])) if complete else np.nan,
+        "MAE_std": float(np.std([r["mae"] for r in found], ddof=1)) if complete and len(found) > 1 else np.nan,
+        "FitSeconds": sum(r["fit_seconds"] for r in found),
+        "Complete": complete,
+        "Params": json.dumps(params, sort_keys=True),
+    }
+
+
+def run_search(X, y, groups=None, n_splits=5, model_names=None, budget_seconds=SEARCH_BUDGET_SECONDS,
+               method="hyperband", eta=ETA, min_trees=MIN_TREES, max_trees=MAX_TREES, n_configs=HALVING_CONFIGS,
+               seed=RANDOM_STATE, n_jobs=None, trials_path=None, resume=True):
+    """
+    Hyperband (or one successive-halving bracket) over the candidate families.
+    Returns (one row per config x rung, data fingerprint, stopped by the budget).
+    """
+    model_names = model_names or list(SEARCH_SPACE)
+    deadline = time.perf_counter() + budget_seconds
+    folds = make_folds(len(y), groups, n_splits)
+    stop_folds = early_stopping_folds(folds, groups, seed=seed)
+    data_id = data_fingerprint(X, y, folds, stop_folds)
+    done = read_trial_log(trials_path, data_id) if resume else {}
+    plan = brackets(method, eta, min_trees, max_trees, n_configs)
+    workers, threads = core_budget(max(n * len(folds) for n, _, _ in plan), n_jobs)
+    print(f"🎛️ {method}: {len(plan)} bracket(s), {min_trees}-{max_trees} trees, {len(folds)} folds, "
+          f"{workers} workers x {threads} threads, {budget_seconds:.0f}s budget ({len(done)} fits in the log)")
+
+    share_dir = tempfile.mkdtemp(prefix="race_search_")
+    rows, out_of_time = [], False
+    log = open(trials_path, "a" if resume else "w") if trials_path else open(os.devnull, "w")
+    try:
+        x_path = os.path.join(share_dir, "X.npy")
+        y_path = os.path.join(share_dir, "y.npy")
+        np.save(x_path, np.ascontiguousarray(X, dtype=np.float64))
+        np.save(y_path, np.asarray(y, dtype=np.float64))
+
+        # spawn: xgboost/OpenMP state must not be inherited through fork
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                 initializer=_init_worker, initargs=(x_path, y_path, folds, stop_folds, threads)) as pool:
+            for bracket, (n, first_trees, rungs) in enumerate(plan):
+                # Seeded per bracket: a resumed run samples exactly the same configs
+                rng = np.random.default_rng([seed, bracket])
+                configs = [(name, sample_params(rng, name))
+                           for name in (model_names[int(i)] for i in rng.integers(len(model_names), size=n))]
+                for rung in range(rungs + 1):
+                    if time.perf_counter() >= deadline:
+                        out_of_time = True
+                        break
+                    trees = min(max_trees, int(round(first_trees * eta ** rung)))
+                    results, out_of_time = _run_rung(pool, configs, trees, len(folds), done, log, data_id, deadline)
+                    scored = [_trial_row(bracket, rung, name, params, trees, records)
+                              for (name, params), records in zip(configs, results)]
+                    rows.extend(scored)
+                    best = min((row["MAE"] for row in scored if row["Complete"]), default=np.nan)
+                    print(f"📊 bracket {bracket} rung {rung}: {len(configs)} configs x {trees} trees, "
+                          f"best MAE {best:.3f}")
+                    if out_of_time:
+                        break
+                    # Survivors: the best 1/eta complete configs (ties by sampling order)
+                    ranked = sorted((i for i, row in enumerate(scored) if row["Complete"]),
+                                    key=lambda i: scored[i]["MAE"])
+                    configs = [configs[i] for i in ranked[:max(1, len(configs) // eta)]]
+                if out_of_time:
+                    print(f"⏰ Budget of {budget_seconds:.0f}s reached; rerun to resume from the trial log")
+                    break
+    finally:
+        log.close()
+        shutil.rmtree(share_dir, ignore_errors=True)
+
+    return pd.DataFrame(rows), data_id, out_of_time
+
+
+def best_config(trials, features, data_id, **search):
+    """The lowest-MAE complete trial as the config train_model.py / candidate_models() reproduce"""
+    complete = trials[trials["Complete"]]
+    if complete.empty:
+        raise RuntimeError("No trial finished within the budget")
+    best = complete.sort_values(["MAE", "Bracket", "Rung"], kind="stable").iloc[0]
+    # XGBoost: the early-stopped tree count, so a plain refit grows the same model
+    params = {**json.loads(best["Params"]), "n_estimators": int(best["TreesUsed"])}
+    return {
+        "model": best["Model"],
+        "params": params,
+        "search_mae": float(best["MAE"]),
+        "search_mae_std": None if pd.isna(best["MAE_std"]) else float(best["MAE_std"]),
+        "trees_searched": int(best["Trees"]),
+        "random_state": RANDOM_STATE,
+        "data": data_id,
+        "features": list(features),
+        "trials": int(len(complete)),
+        "search": search,
+    }
+
+
+def tune_race_model(data_path=PATHS["features"], model_dir=MODEL_DIR, budget_seconds=SEARCH_BUDGET_SECONDS,
+                    method="hyperband", eta=ETA, min_trees=MIN_TREES, max_trees=MAX_TREES,
+                    n_configs=HALVING_CONFIGS, model_names=None, cv_folds=5, seed=RANDOM_STATE, n_jobs=None,
+                    resume=True):
+    """Search on the training data train_model.py uses; writes the trial log and best config"""
+    from train_model import load_training_data
+
+    os.makedirs(model_dir, exist_ok=True)
+    trials_path = os.path.join(model_dir, SEARCH_TRIALS_FILE)
+    config_path = os.path.join(model_dir, BEST_CONFIG_FILE)
+    with stage("tune") as tune_rec:
+        with stage("load") as rec:
+            rec.read(data_path)
+            X, y, groups = load_training_data(data_path)
+            rec.rows = len(X)
+        # Same median imputation as training (all-NaN columns are dropped)
+        imputer = SimpleImputer(strategy="median")
+        X_imputed = imputer.fit_transform(X)
+        features = [col for col, median in zip(X.columns, imputer.statistics_) if not np.isnan(median)]
+
+        with stage("search", method=method, budget_seconds=budget_seconds) as rec:
+            trials, data_id, out_of_time = run_search(
+                X_imputed, y.to_numpy(), groups=groups, n_splits=cv_folds, model_names=model_names,
+                budget_seconds=budget_seconds, method=method, eta=eta, min_trees=min_trees, max_trees=max_trees,
+                n_configs=n_configs, seed=seed, n_jobs=n_jobs, trials_path=trials_path, resume=resume)
+            rec.rows = len(trials)
+            rec.wrote(trials_path)
+
+        config = best_config(trials, features, data_id, method=method, eta=eta, min_trees=min_trees,
+                             max_trees=max_trees, n_configs=n_configs, seed=seed, cv_folds=cv_folds,
+                             models=model_names or list(SEARCH_SPACE), budget_seconds=budget_seconds,
+                             finished=not out_of_time)
+        # Search MAEs come from early-stopped fits (XGBoost) on partly held-back training folds; train_model.py
+        # refits with the early-stopped tree count and no early stopping, so score the config that way
+        with stage("confirm", model=config["model"]):
+            cv = compare_models(X_imputed, y.to_numpy(), groups=groups, n_splits=cv_folds,
+                                model_names=[config["model"]], n_jobs=n_jobs, params={config["model"]: config["params"]})
+        config["cv_mae"] = float(cv["MAE"].mean())
+        config["cv_mae_std"] = float(cv["MAE"].std())
+        with open(config_path, "w") as f:
+            json.dump(config, f, indent=2)
+        tune_rec.rows = len(X)
+        tune_rec.wrote(trials_path, config_path)
+
+    leaderboard = trials[trials["Complete"]].sort_values("MAE").head(10)
+    print("\n📋 Best trials:")
+    print(leaderboard[["Model", "Trees", "TreesUsed", "MAE", "MAE_std", "Params"]].round(3).to_string(index=False))
+    print(f"\n✅ Best: {config['model']} (CV MAE {config['cv_mae']:.3f}, {config['search_mae']:.3f} in the search) "
+          f"{config['params']}")
+    print(f"📄 Best config saved to: {config_path}")
+    print(f"📄 Trial log: {trials_path}")
+    return [trials_path, config_path]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Budgeted hyperparameter search for the race models")
+    parser.add_argument("--input", default=PATHS["features"], help="feature table")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--budget", type=float, default=SEARCH_BUDGET_SECONDS, help="wall-clock seconds")
+    parser.add_argument("--method", choices=["hyperband", "halving"], default="hyperband")
+    parser.add_argument("--eta", type=int, default=ETA)
+    parser.add_argument("--min-trees", type=int, default=MIN_TREES)
+    parser.add_argument("--max-trees", type=int, default=MAX_TREES)
+    parser.add_argument("--configs", type=int, default=HALVING_CONFIGS, help="configs of a halving run")
+    parser.add_argument("--models", nargs="+", default=None, choices=list(SEARCH_SPACE))
+    parser.add_argument("--cv-folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=RANDOM_STATE)
+    parser.add_argument("--fresh", action="store_true", help="ignore (and overwrite) the trial log")
+    args = parser.parse_args()
+    tune_race_model(args.input, args.model_dir, args.budget, args.method, args.eta, args.min_trees, args.max_trees,
+                    args.configs, args.models, args.cv_folds, args.seed, args.workers, resume=not args.fresh)
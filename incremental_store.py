@@ -0,0 +1,199 @@
+"""
+Created on Wed Jun 11 09:05:44 2025
+
+@author: sid
+Incremental clean -> combine -> feature rebuild keyed on session-folder content hashes.
+- manifest.json records a content hash per SessionFolder; only new/changed folders
+  are re-cleaned, everything else is reused from the per-folder Parquet partitions
+- Global aggregates are kept as mergeable partials (sums + counts, and an exact
+  millisecond histogram per team for the median) that are added/subtracted per folder
+  (see stats_index.py)
+- materialize() looks the current aggregates up by key for every partition row and
+  also saves them as the stats index used by the predictor
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+from columnar_store import read_table, write_table
+from feature_engine import LAP_GROUP_FEATURES, add_group_features
+from feature_engineering import ESSENTIAL_COLS, add_lap_features
+from project_paths import PATHS, RAW_DATA_DIR
+from stats_index import PARTIAL_COLUMNS, StatsIndex, merge_partials, session_partials
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "clean_data"))
+from session_ingest import clean_session_folder, list_session_folders  # noqa: E402
+
+# === Paths ===
+STORE_DIR = PATHS["incremental_store"]
+OUTPUT_FILE = PATHS["features"]
+YEARS = ["2024", "2025"]
+
+STATS_INDEX_FILE = PATHS["stats_index"]
+
+SESSION_FILES = ["laps.csv", "results.csv", "weather.csv"]
+
+# Group features that only look at one session can be computed per partition
+SESSION_LOCAL_FEATURES = [spec for spec in LAP_GROUP_FEATURES if "SessionFolder" in spec[1]]
+
+
+def folder_signature(session_path):
+    """Cheap (name, size, mtime) signature used to skip re-hashing unchanged folders"""
+    signature = []
+    for name in SESSION_FILES:
+        path = os.path.join(session_path, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append([name, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def hash_session_folder(session_path):
+    """SHA-256 over the raw session files"""
+    digest = hashlib.sha256()
+    for name in SESSION_FILES:
+        path = os.path.join(session_path, name)
+        if not os.path.exists(path):
+            continue
+        digest.update(name.encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class IncrementalFeatureStore:
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.laps_dir = os.path.join(store_dir, "laps")
+        self.partials_dir = os.path.join(store_dir, "partials")
+        self.manifest_path = os.path.join(store_dir, "manifest.json")
+        self.totals_path = os.path.join(store_dir, "aggregates.parquet")
+        os.makedirs(self.laps_dir, exist_ok=True)
+        os.makedirs(self.partials_dir, exist_ok=True)
+
+        self.manifest = {"folders": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        self.totals = read_table(self.totals_path) if os.path.exists(self.totals_path) else None
+        # Partials are folded into the totals once per update, not once per folder
+        self._pending_add = []
+        self._pending_subtract = []
+
+    def _laps_path(self, folder):
+        return os.path.join(self.laps_dir, f"{folder}.parquet")
+
+    def _partials_path(self, folder):
+        return os.path.join(self.partials_dir, f"{folder}.parquet")
+
+    def _save(self):
+        if self._pending_add or self._pending_subtract:
+            add = pd.concat(self._pending_add, ignore_index=True) if self._pending_add else None
+            subtract = pd.concat(self._pending_subtract, ignore_index=True) if self._pending_subtract else None
+            self.totals = merge_partials(self.totals, add=add, subtract=subtract)
+            self._pending_add, self._pending_subtract = [], []
+        write_table(self.totals if self.totals is not None else pd.DataFrame(columns=PARTIAL_COLUMNS), self.totals_path)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _drop_folder(self, folder):
+        partials_path = self._partials_path(folder)
+        if os.path.exists(partials_path):
+            self._pending_subtract.append(read_table(partials_path))
+            os.remove(partials_path)
+        if os.path.exists(self._laps_path(folder)):
+            os.remove(self._laps_path(folder))
+        self.manifest["folders"].pop(folder, None)
+
+    def _ingest_folder(self, raw_dir, folder, year, content_hash, signature):
+        laps_df, race_df, quali_df, message = clean_session_folder(raw_dir, folder, year)
+        print(message)
+        if laps_df is None:
+            return False
+
+        laps_df = add_lap_features(laps_df)
+        add_group_features(laps_df, SESSION_LOCAL_FEATURES)
+        partials = session_partials(laps_df, race_df, quali_df, int(year))
+
+        write_table(laps_df, self._laps_path(folder))
+        write_table(partials, self._partials_path(folder))
+        self._pending_add.append(partials)
+        self.manifest["folders"][folder] = {
+            "year": int(year), "hash": content_hash, "signature": signature, "rows": len(laps_df),
+        }
+        return True
+
+    def update(self, raw_dir, years):
+        """Re-clean only new/changed folders of the given seasons; drop vanished ones"""
+        known = self.manifest["folders"]
+        seen = set()
+        added = changed = unchanged = 0
+
+        for year in years:
+            for folder in list_session_folders(raw_dir, year):
+                seen.add(folder)
+                session_path = os.path.join(raw_dir, folder)
+                signature = folder_signature(session_path)
+                entry = known.get(folder)
+                if entry and entry["signature"] == signature:
+                    unchanged += 1
+                    continue
+
+                content_hash = hash_session_folder(session_path)
+                if entry and entry["hash"] == content_hash:
+                    entry["signature"] = signature  # touched but identical
+                    unchanged += 1
+                    continue
+
+                if entry:
+                    self._drop_folder(folder)
+                    changed += 1
+                else:
+                    added += 1
+                self._ingest_folder(raw_dir, folder, year, content_hash, signature)
+
+        years = {int(year) for year in years}
+        removed = [folder for folder, entry in known.items() if entry["year"] in years and folder not in seen]
+        for folder in removed:
+            self._drop_folder(folder)
+
+        self._save()
+        print(f"🔁 Store update: {added} new, {changed} changed, {len(removed)} removed, {unchanged} unchanged folders")
+        return self
+
+    def stats_index(self):
+        """Keyed DriverAvgPace / TeamMedianPace / AvgRaceFinish / AvgQualiPosition lookups"""
+        return StatsIndex(self.totals if self.totals is not None else pd.DataFrame(columns=PARTIAL_COLUMNS))
+
+    def materialize(self, output_file=None, export_csv=False, index_file=None):
+        """Assemble the feature table from the stored partitions and current aggregates"""
+        folders = sorted(self.manifest["folders"])
+        frames = [read_table(self._laps_path(folder)) for folder in folders]
+        if not frames:
+            print("⚠️ Incremental store is empty")
+            return None
+        df = pd.concat(frames, ignore_index=True)
+
+        # Pace stats over all seasons, position averages per season, as in the per-year cleaning scripts
+        index = self.stats_index()
+        index.attach(df)
+        if index_file:
+            index.save(index_file)
+
+        df.dropna(subset=ESSENTIAL_COLS, inplace=True)
+        if output_file:
+            write_table(df, output_file, export_csv=export_csv)
+            print(f"✅ Incremental feature table saved to: {output_file} ({len(df)} rows)")
+        return df
+
+
+if __name__ == "__main__":
+    store = IncrementalFeatureStore(STORE_DIR)
+    store.update(RAW_DATA_DIR, YEARS).materialize(OUTPUT_FILE, index_file=STATS_INDEX_FILE)
@@ -0,0 +1,213 @@
+"""
+Created on Fri Jun 20 09:03:51 2025
+
+@author: sid
+Per-stage timing and memory instrumentation for the pipeline scripts.
+- with stage("features") as rec: ... measures wall/CPU time, peak RSS, optional
+  tracemalloc peak, rows and bytes read/written (rec.rows = n, rec.read(path), rec.wrote(path))
+- Stages nest: sub-steps are recorded as "features/group_features", and each parent's
+  peak still covers its children; stages open at once in several threads (pipeline.py)
+  each keep the process-wide peak reached while they were open
+- Records are appended to a JSON lines file; a top-level stage can also dump a cProfile
+Off by default (a no-op record). Scripts opt in with configure(...) or the environment:
+  F1_INSTRUMENT=metrics.jsonl  F1_TRACEMALLOC=1  F1_PROFILE_DIR=profiles/
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_config = {
+    "output": os.environ.get("F1_INSTRUMENT") or None,
+    "trace_memory": os.environ.get("F1_TRACEMALLOC", "") not in ("", "0"),
+    "profile_dir": os.environ.get("F1_PROFILE_DIR") or None,
+    "script": os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0],
+    "keep_records": False,
+}
+_records = []
+_local = threading.local()
+_write_lock = threading.Lock()
+_open_records = []  # every open stage, all threads: the peaks and their resets are process-wide
+_peak_lock = threading.Lock()
+_tracing = {"started": False}  # tracemalloc started by the stages (not by the caller)
+
+_CLEAR_REFS = "/proc/self/clear_refs"
+_STATUS = "/proc/self/status"
+
+
+def configure(output=None, trace_memory=None, profile_dir=None, script=None, keep_records=None):
+    """Turn instrumentation on (output path for JSON lines, or keep_records=True for in-memory use)"""
+    for key, value in (("output", output), ("trace_memory", trace_memory), ("profile_dir", profile_dir),
+                       ("script", script), ("keep_records", keep_records)):
+        if value is not None:
+            _config[key] = value
+
+
+def add_arguments(parser):
+    """Standard --metrics/--trace-memory/--profile-dir flags for a script's argparse parser"""
+    parser.add_argument("--metrics", default=None, help="append per-stage metrics (JSON lines) to this file")
+    parser.add_argument("--trace-memory", action="store_true", help="also record tracemalloc peaks")
+    parser.add_argument("--profile-dir", default=None, help="dump a cProfile per top-level stage here")
+
+
+def configure_from_args(args):
+    configure(output=args.metrics, trace_memory=args.trace_memory or None, profile_dir=args.profile_dir)
+
+
+def enabled():
+    return bool(_config["output"] or _config["keep_records"] or _config["profile_dir"])
+
+
+def recorded():
+    """Records kept in memory (configure(keep_records=True))"""
+    return list(_records)
+
+
+# === Peak RSS ===
+def _rss_high_water_mb():
+    """Peak RSS since the last reset (Linux VmHWM), else the process-lifetime maximum"""
+    try:
+        with open(_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource  # POSIX only; not there on Windows, where VmHWM is not either
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _reset_rss_high_water():
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            f.write("5")  # resets VmHWM to the current RSS
+    except OSError:
+        pass
+
+
+class StageRecord:
+    """What a stage reports about itself; the no-op variant ignores everything"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.rows = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_rss_mb = 0.0
+        self.peak_traced_mb = 0.0
+
+    def read(self, *paths):
+        self.bytes_read += sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+    def wrote(self, *paths):
+        self.bytes_written += sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+    def add(self, **fields):
+        self.fields.update(fields)
+
+
+def _open_stages():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _fold_peaks():
+    """Push the current high-water marks into every open stage (any thread) before they are reset"""
+    rss = _rss_high_water_mb()
+    traced = tracemalloc.get_traced_memory()[1] / 1e6 if tracemalloc.is_tracing() else 0.0
+    for record in _open_records:
+        record.peak_rss_mb = max(record.peak_rss_mb, rss)
+        record.peak_traced_mb = max(record.peak_traced_mb, traced)
+
+
+def _emit(payload):
+    if _config["keep_records"]:
+        _records.append(payload)
+    if _config["output"]:
+        line = json.dumps(payload, default=str)
+        with _write_lock:
+            with open(_config["output"], "a") as f:
+                f.write(line + "\n")
+
+
+@contextmanager
+def stage(name, **fields):
+    """Measure a pipeline stage or sub-step (no-op unless instrumentation is configured)"""
+    record = StageRecord(name, fields)
+    if not enabled():
+        yield record
+        return
+
+    stack = _open_stages()
+    path = "/".join([parent.name for parent in stack] + [name])
+    with _peak_lock:
+        if _config["trace_memory"] and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing["started"] = True
+        # Every open stage has its peak so far before the reset, so a stage starting in
+        # another thread cannot wipe it
+        _fold_peaks()
+        _reset_rss_high_water()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        _open_records.append(record)
+
+    profiler = None
+    if _config["profile_dir"] and not stack:
+        import cProfile  # only when profiling; keeps CLI start-up light
+
+        profiler = cProfile.Profile()
+
+    stack.append(record)
+    wall, cpu = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        stack.pop()
+        with _peak_lock:
+            _fold_peaks()
+            _open_records.remove(record)
+            # Tracing started for the stages is stopped by the last one to close
+            if _tracing["started"] and not _open_records:
+                tracemalloc.stop()
+                _tracing["started"] = False
+
+        payload = {
+            "ts": round(time.time(), 3),
+            "script": _config["script"],
+            "stage": path,
+            "status": status,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "peak_rss_mb": round(record.peak_rss_mb, 1),
+            "rows": record.rows,
+            "bytes_read": record.bytes_read,
+            "bytes_written": record.bytes_written,
+            "pid": os.getpid(),
+        }
+        if _config["trace_memory"]:
+            payload["tracemalloc_peak_mb"] = round(record.peak_traced_mb, 1)
+        if profiler is not None:
+            os.makedirs(_config["profile_dir"], exist_ok=True)
+            profile_path = os.path.join(_config["profile_dir"], f"{_config['script']}_{path.replace('/', '_')}.prof")
+            profiler.dump_stats(profile_path)
+            payload["profile"] = profile_path
+        payload.update(record.fields)
+        _emit(payload)
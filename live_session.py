@@ -0,0 +1,303 @@
+"""
+Created on Fri Jun 27 09:18:26 2025
+
+@author: sid
+Live practice session mode: laps arrive one at a time and the predicted order is updated
+after every lap, at a cost that does not grow with the number of laps already seen.
+- Per driver: lap count, mean and variance (Welford), best lap, best lap per session
+  (FP1 -> FP3 progression) and long-run pace (mean without the fastest 25% of laps)
+- Per team (and team x session): streaming median lap time
+- Medians / long-run pace come from fixed-bin lap-time histograms held as Fenwick trees
+  (like the 1 ms histograms in stats_index.py): O(log bins) per lap, exact to one bin
+- Per driver x session: mean pace and lap count
+- Positions come from the same expected_position_scores() as RealisticSpanishGPPredictor,
+  evaluated over small per-driver arrays (O(drivers) per lap, O(1) in laps seen)
+Exact against calculate_practice_performance: best lap, mean, consistency (std), progression.
+Within one BIN_SECONDS bin: TeamMedianPace and long-run pace (see benchmarks/bench_live_session.py).
+Usage: python live_session.py [practice_csv] [--every 100] [--gp "Spanish Grand Prix"] [--year 2025]
+"""
+
+import argparse
+import math
+import time
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from project_paths import DEFAULT_GP, DEFAULT_YEAR, PATHS
+from race_calendar import event_config
+from spanish_gp_2025_predictor import RealisticSpanishGPPredictor, expected_position_scores
+
+LONG_RUN_QUANTILE = 0.25  # long-run pace leaves out each driver's fastest 25% of laps
+INITIAL_DRIVERS = 32
+PROGRESSION_SESSIONS = ("FP1", "FP3")
+
+# === Lap-time histograms (2 x 16k float64 = 256 KB each: one per driver, team, team x session) ===
+LAP_TIME_RANGE = (40.0, 200.0)  # seconds; laps outside land in the edge bins (sums stay exact)
+BIN_SECONDS = 0.01
+N_BINS = int(round((LAP_TIME_RANGE[1] - LAP_TIME_RANGE[0]) / BIN_SECONDS))
+TOP_BIT = 1 << (N_BINS.bit_length() - 1)
+
+
+class LapHistogram:
+    """
+    Lap times in fixed BIN_SECONDS bins, counts and sums kept as Fenwick trees:
+    O(log bins) per lap and per query, whatever the number of laps.
+    Quantiles are exact to within one bin (a bin's laps count at their mean).
+    """
+
+    __slots__ = ("count", "total", "counts", "sums")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.counts = array("d", bytes(8 * (N_BINS + 1)))
+        self.sums = array("d", bytes(8 * (N_BINS + 1)))
+
+    def add(self, x):
+        i = min(max(int((x - LAP_TIME_RANGE[0]) / BIN_SECONDS), 0), N_BINS - 1) + 1
+        self.count += 1
+        self.total += x
+        counts, sums = self.counts, self.sums
+        while i <= N_BINS:
+            counts[i] += 1
+            sums[i] += x
+            i += i & -i
+
+    def _rank_bin(self, rank):
+        """(bin holding the rank-th smallest lap, laps below it, their sum, the bin's mean lap)"""
+        counts, sums = self.counts, self.sums
+        pos, below, below_sum = 0, 0.0, 0.0
+        step = TOP_BIT
+        while step:
+            nxt = pos + step
+            if nxt <= N_BINS and below + counts[nxt] < rank:
+                pos = nxt
+                below += counts[nxt]
+                below_sum += sums[nxt]
+            step >>= 1
+        # Count / sum of the bin itself: its prefix minus everything below
+        i, upto, upto_sum = pos + 1, 0.0, 0.0
+        while i > 0:
+            upto += counts[i]
+            upto_sum += sums[i]
+            i -= i & -i
+        return pos + 1, below, below_sum, (upto_sum - below_sum) / (upto - below)
+
+    def quantile(self, p):
+        """Linear-interpolation quantile (as pandas/numpy); NaN when empty"""
+        if self.count == 0:
+            return math.nan
+        rank = p * (self.count - 1)
+        lo = int(rank)
+        value = self._rank_bin(lo + 1)[3]
+        if rank == lo:
+            return value
+        return value + (rank - lo) * (self._rank_bin(lo + 2)[3] - value)
+
+    def mean_above(self, k):
+        """Mean of every lap except the k fastest"""
+        if k == 0:
+            return self.total / self.count
+        _, below, below_sum, bin_mean = self._rank_bin(k)
+        fastest = below_sum + (k - below) * bin_mean
+        return (self.total - fastest) / (self.count - k)
+
+
+class RunningStats:
+    """Count, mean, variance (Welford) and minimum of a stream"""
+
+    __slots__ = ("count", "mean", "m2", "best")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.best = math.inf
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.best:
+            self.best = x
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as pandas); NaN below two laps"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+
+class LiveSession:
+    """Running per-driver / per-team practice state and the predicted order after every lap"""
+
+    def __init__(self, event=None, predictor=None):
+        self.event = event or event_config()
+        # Ratings, team strength and the event's track bonus come from the logic predictor
+        self.predictor = predictor or RealisticSpanishGPPredictor(
+            track_bonus=self.event["track_bonus"], event_name=f"{self.event['gp_name']} {self.event['year']}")
+        self.laps = 0
+        self.slots = {}
+        self.drivers = []
+        self.teams = []
+        self.driver_stats = []
+        self.histograms = []
+        self.session_stats = {}
+        self.team_medians = {}
+        self.team_session_medians = {}
+
+        # Per-driver arrays passed straight to expected_position_scores (grown by doubling)
+        self._capacity = 0
+        self._arrays = {}
+        self._grow(INITIAL_DRIVERS)
+
+    ARRAYS = ["best_time", "driver_rating", "team_strength", "track_bonus", "consistency",
+              "long_run_pace"]
+
+    def _grow(self, capacity):
+        for name in self.ARRAYS:
+            grown = np.full(capacity, np.nan if name == "consistency" else 0.0)
+            grown[:self._capacity] = self._arrays.get(name, grown)[:self._capacity]
+            self._arrays[name] = grown
+        self._capacity = capacity
+
+    def _slot(self, driver, team):
+        slot = self.slots.get(driver)
+        if slot is not None:
+            return slot
+        slot = len(self.drivers)
+        if slot == self._capacity:
+            self._grow(2 * self._capacity)
+        self.slots[driver] = slot
+        self.drivers.append(driver)
+        self.teams.append(team)
+        self.driver_stats.append(RunningStats())
+        self.histograms.append(LapHistogram())
+        arrays, predictor = self._arrays, self.predictor
+        arrays["driver_rating"][slot] = predictor.driver_ratings.get(driver, 7.0)
+        arrays["team_strength"][slot] = predictor.team_strength.get(team, 0.95)
+        arrays["track_bonus"][slot] = predictor.track_bonus.get(driver, 0)
+        return slot
+
+    def add_lap(self, driver, team, session, lap_time):
+        """Fold one lap into the running state; returns the predicted order (driver codes)"""
+        if lap_time is None or not math.isfinite(lap_time):
+            return self.order()
+        slot = self._slot(driver, team)
+        team = self.teams[slot]
+        arrays = self._arrays
+
+        stats = self.driver_stats[slot]
+        stats.add(lap_time)
+        arrays["best_time"][slot] = stats.best
+        arrays["consistency"][slot] = stats.std
+
+        # Long-run pace: mean without the driver's fastest 25% of laps
+        histogram = self.histograms[slot]
+        histogram.add(lap_time)
+        arrays["long_run_pace"][slot] = histogram.mean_above(int(histogram.count * LONG_RUN_QUANTILE))
+
+        key = (driver, session)
+        if key not in self.session_stats:
+            self.session_stats[key] = RunningStats()
+        self.session_stats[key].add(lap_time)
+        if team not in self.team_medians:
+            self.team_medians[team] = LapHistogram()
+        self.team_medians[team].add(lap_time)
+        if (team, session) not in self.team_session_medians:
+            self.team_session_medians[(team, session)] = LapHistogram()
+        self.team_session_medians[(team, session)].add(lap_time)
+
+        self.laps += 1
+        return self.order()
+
+    def scores(self):
+        """Expected position score per driver slot (lower = better)"""
+        n, arrays = len(self.drivers), self._arrays
+        if n == 0:
+            return np.empty(0)
+        return expected_position_scores(arrays["best_time"][:n], arrays["driver_rating"][:n],
+                                         arrays["team_strength"][:n], arrays["track_bonus"][:n],
+                                         arrays["consistency"][:n], arrays["long_run_pace"][:n])
+
+    def order(self):
+        """Driver codes in predicted finishing order"""
+        return [self.drivers[i] for i in np.argsort(self.scores(), kind="stable")]
+
+    def progression(self, driver):
+        """FP1 best - FP3 best (0 until the driver has set a lap in both)"""
+        first = self.session_stats.get((driver, PROGRESSION_SESSIONS[0]))
+        last = self.session_stats.get((driver, PROGRESSION_SESSIONS[1]))
+        return first.best - last.best if first and last else 0.0
+
+    def features(self, driver, session):
+        """Live values of the preprocessed group features for the driver's next lap in session"""
+        slot = self.slots[driver]
+        team = self.teams[slot]
+        session_stats = self.session_stats.get((driver, session))
+        team_session = self.team_session_medians.get((team, session))
+        return {
+            "DriverAvgPace": self.driver_stats[slot].mean,
+            "DriverSessionAvgPace": session_stats.mean if session_stats else math.nan,
+            "TeamMedianPace": self.team_medians[team].quantile(0.5),
+            "TeamSessionMedianPace": team_session.quantile(0.5) if team_session else math.nan,
+            "DriverSessionLapCount": session_stats.count if session_stats else 0,
+        }
+
+    def standings(self):
+        """Current per-driver table in predicted order (the live calculate_practice_performance)"""
+        n = len(self.drivers)
+        arrays = self._arrays
+        table = pd.DataFrame({
+            'Driver': self.drivers,
+            'Team': self.teams,
+            'Laps': [stats.count for stats in self.driver_stats],
+            'Best_Time': arrays["best_time"][:n],
+            'Avg_Pace': [stats.mean for stats in self.driver_stats],
+            'Consistency': arrays["consistency"][:n],
+            'Long_Run_Pace': arrays["long_run_pace"][:n],
+            'Team_Median_Pace': [self.team_medians[team].quantile(0.5) for team in self.teams],
+            'Progression': [self.progression(driver) for driver in self.drivers],
+            'Score': self.scores(),
+        })
+        table = table.sort_values('Score', kind='stable').reset_index(drop=True)
+        table['Position'] = range(1, n + 1)
+        return table
+
+
+def replay(laps, session=None, every=0):
+    """
+    Feed a practice lap table (Driver, Team, Session, LapTimeSeconds) through a LiveSession
+    in row order; prints the top 5 every `every` laps. Returns the session.
+    """
+    session = session or LiveSession()
+    columns = [laps['Driver'].astype(object), laps['Team'].astype(object), laps['Session'].astype(object),
+               laps['LapTimeSeconds'].astype(float)]
+    for driver, team, session_name, lap_time in zip(*columns):
+        order = session.add_lap(driver, team, session_name, lap_time)
+        if every and session.laps % every == 0:
+            print(f"⏱️  lap {session.laps:5d} ({session_name}): {' '.join(order[:5])}")
+    return session
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay practice laps one at a time and update the predicted order")
+    parser.add_argument("practice_csv", nargs="?", default=PATHS["practice_preprocessed"])
+    parser.add_argument("--every", type=int, default=100, help="print the top 5 every N laps")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR)
+    parser.add_argument("--gp", default=DEFAULT_GP)
+    args = parser.parse_args()
+
+    laps = pd.read_csv(args.practice_csv)
+    if 'LapTimeSeconds' not in laps.columns:
+        from time_parsing import detect_time_format, parse_time_column
+        laps['LapTimeSeconds'] = parse_time_column(laps['LapTime'], detect_time_format(laps['LapTime']))
+
+    start = time.perf_counter()
+    live = replay(laps, LiveSession(event_config(args.year, args.gp)), every=args.every)
+    elapsed = time.perf_counter() - start
+    print(live.standings()[['Position', 'Driver', 'Team', 'Laps', 'Best_Time', 'Long_Run_Pace',
+                            'Progression']].to_string(index=False))
+    print(f"🏁 {live.laps} laps in {elapsed:.3f}s ({elapsed / max(live.laps, 1) * 1e6:.1f} µs per lap)")
@@ -0,0 +1,174 @@
+"""
+Created on Fri Jun 13 09:30:11 2025
+
+@author: sid
+Cross-validated comparison of the race-position regressors.
+- Fold indices and the imputed matrix are built once in the parent
+- The matrix is shared with workers as a read-only .npy memmap (no per-task pickling)
+- Every (model, fold) fit runs in one process pool; cores are split between
+  pool workers and each model's own threads so nothing is oversubscribed
+- Hyperparameters are DEFAULT_PARAMS unless a family has a tuned config
+  (hyperparameter_search.py writes it, read_best_config() reads it)
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import GroupKFold, KFold
+from threadpoolctl import threadpool_limits
+import xgboost as xgb
+
+RANDOM_STATE = 42
+
+DEFAULT_PARAMS = {
+    "GradientBoosting": {"n_estimators": 300, "learning_rate": 0.05, "max_depth": 5},
+    "RandomForest": {"n_estimators": 200, "max_depth": 10},
+    "XGBoost": {"n_estimators": 300, "learning_rate": 0.05, "max_depth": 5},
+}
+
+
+def candidate_models(n_jobs=1, params=None):
+    """Models to compare, with the thread budget each one may use; params: {model: overrides}"""
+    params = params or {}
+
+    def settings(name):
+        return {**DEFAULT_PARAMS[name], **params.get(name, {})}
+
+    return {
+        "GradientBoosting": GradientBoostingRegressor(**settings("GradientBoosting"), random_state=RANDOM_STATE),
+        "RandomForest": RandomForestRegressor(**settings("RandomForest"), random_state=RANDOM_STATE, n_jobs=n_jobs),
+        "XGBoost": xgb.XGBRegressor(**settings("XGBoost"), objective='reg:squarederror',
+                                    random_state=RANDOM_STATE, n_jobs=n_jobs),
+    }
+
+
+def read_best_config(path, features=None, data=None):
+    """
+    {model: params} from a hyperparameter_search.py best-config file ({} when there is none).
+    With features (the model's feature list) and/or data ((X_imputed, y, groups)), a config
+    searched on another feature list or feature table is ignored with a warning.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        config = json.load(f)
+    if features is not None and config.get("features") != list(features):
+        print(f"⚠️ Ignoring {os.path.basename(path)}: it was searched on a different feature list")
+        return {}
+    if data is not None:
+        from hyperparameter_search import search_data_id  # imports this module
+
+        try:
+            stale = config.get("data") != search_data_id(config, *data)
+        except KeyError:
+            stale = True
+        if stale:
+            print(f"⚠️ Ignoring {os.path.basename(path)}: it was searched on a different feature table")
+            return {}
+    return {config["model"]: config["params"]}
+
+
+def make_folds(n_rows, groups=None, n_splits=5):
+    """(train_idx, test_idx) pairs; grouped so one session never sits on both sides"""
+    if groups is not None:
+        n_splits = min(n_splits, len(pd.unique(groups)))
+        splitter = GroupKFold(n_splits=n_splits)
+        return list(splitter.split(np.zeros(n_rows), groups=groups))
+    splitter = KFold(n_splits=n_splits, shuffle=True, random_state=RANDOM_STATE)
+    return list(splitter.split(np.zeros(n_rows)))
+
+
+def core_budget(n_tasks, n_jobs=None):
+    """(pool workers, threads per model) that together fit in the available cores"""
+    cores = os.cpu_count() or 1
+    workers = max(1, min(n_tasks, n_jobs or cores, cores))
+    return workers, max(1, cores // workers)
+
+
+# === Worker side ===
+_shared = {}
+
+
+def _init_worker(x_path, y_path, threads):
+    _shared["X"] = np.load(x_path, mmap_mode="r")
+    _shared["y"] = np.load(y_path, mmap_mode="r")
+    _shared["threads"] = threads
+    # Caps OpenMP/BLAS pools that the models do not expose through n_jobs
+    _shared["limits"] = threadpool_limits(threads)
+
+
+def _fit_fold(model_name, fold, train_idx, test_idx, params=None):
+    X, y = _shared["X"], _shared["y"]
+    model = candidate_models(n_jobs=_shared["threads"], params=params)[model_name]
+
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    preds = model.predict(X[test_idx])
+    predict_seconds = time.perf_counter() - start
+
+    return {
+        "Model": model_name,
+        "Fold": fold,
+        "TrainRows": len(train_idx),
+        "TestRows": len(test_idx),
+        "FitSeconds": fit_seconds,
+        "PredictSeconds": predict_seconds,
+        "MAE": mean_absolute_error(y[test_idx], preds),
+    }
+
+
+def compare_models(X, y, groups=None, n_splits=5, model_names=None, n_jobs=None, params=None):
+    """
+    Run every candidate model on every fold in a process pool (params: {model: overrides}).
+    Returns one row per (model, fold) with timings and MAE.
+    """
+    model_names = model_names or list(candidate_models())
+    folds = make_folds(len(y), groups, n_splits)
+    tasks = [(name, fold, train_idx, test_idx, params)
+             for name in model_names for fold, (train_idx, test_idx) in enumerate(folds, start=1)]
+    workers, threads = core_budget(len(tasks), n_jobs)
+    print(f"🧪 {len(model_names)} models x {len(folds)} folds on {workers} workers x {threads} threads")
+
+    share_dir = tempfile.mkdtemp(prefix="race_cv_")
+    try:
+        x_path = os.path.join(share_dir, "X.npy")
+        y_path = os.path.join(share_dir, "y.npy")
+        np.save(x_path, np.ascontiguousarray(X, dtype=np.float64))
+        np.save(y_path, np.asarray(y, dtype=np.float64))
+
+        rows = []
+        # spawn: xgboost/OpenMP state must not be inherited through fork
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                 initializer=_init_worker, initargs=(x_path, y_path, threads)) as pool:
+            futures = [pool.submit(_fit_fold, *task) for task in tasks]
+            for future in as_completed(futures):
+                row = future.result()
+                print(f"📊 {row['Model']} fold {row['Fold']}: MAE {row['MAE']:.3f} ({row['FitSeconds']:.1f}s fit)")
+                rows.append(row)
+    finally:
+        shutil.rmtree(share_dir, ignore_errors=True)
+
+    return pd.DataFrame(rows).sort_values(["Model", "Fold"]).reset_index(drop=True)
+
+
+def summarize(results):
+    """Per-model mean/std MAE and total fit time, best first"""
+    summary = results.groupby("Model").agg(
+        MAE=("MAE", "mean"),
+        MAE_std=("MAE", "std"),
+        FitSeconds=("FitSeconds", "sum"),
+        PredictSeconds=("PredictSeconds", "sum"),
+    )
+    return summary.sort_values("MAE")
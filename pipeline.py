@@ -0,0 +1,370 @@
+"""
+Created on Sat Jun 21 10:02:45 2025
+
+@author: sid
+DAG runner for the whole pipeline.
+  clean 2024 ─┐
+              ├─> combine ─> features ─> train ─┐
+  clean 2025 ─┘                                 ├─> predict
+  fetch FP ─> preprocess FP ────────────────────┘
+- Every stage is an importable function taking its paths/params as arguments
+- A stage is skipped when the fingerprint of its inputs (size + mtime), params and code
+  matches the last successful run and its outputs are unchanged
+- Independent branches run in parallel; heavy libraries are imported inside the stages,
+  so an up-to-date rerun only stats files
+Usage: python pipeline.py [--data-dir DIR] [--raw-dir DIR] [--year 2025] [--gp "Spanish Grand Prix"]
+                          [--only predict] [--force features] [--dry-run]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from instrumentation import add_arguments, configure_from_args, stage
+from project_paths import DATA_DIR, DEFAULT_GP, DEFAULT_YEAR, HISTORY_YEARS, ROOT, paths_for
+
+STATE_FILE = ".pipeline_state.json"
+
+
+# === Stage bodies (each returns the paths it wrote) ===
+def _clean_data_on_path():
+    clean_data_dir = os.path.join(ROOT, "clean_data")
+    if clean_data_dir not in sys.path:
+        sys.path.insert(0, clean_data_dir)
+
+
+def clean_season(raw_dir, year, output, workers=None, stream=False):
+    _clean_data_on_path()
+    from session_ingest import ingest_sessions, stream_sessions
+    from columnar_store import write_table
+
+    if stream:
+        rows = stream_sessions(raw_dir, str(year), output, workers=workers, verbose=False)
+    else:
+        df = ingest_sessions(raw_dir, str(year), workers=workers, verbose=False)
+        rows = 0 if df is None else len(df)
+        if rows:
+            write_table(df, output)
+    if not rows:
+        raise ValueError(f"No valid {year} sessions in {raw_dir}")
+    return [output]
+
+
+def combine(inputs, output):
+    _clean_data_on_path()
+    from columnar_store import read_table, write_table
+    from data_combiner_2024_2025 import combine_seasons
+
+    write_table(combine_seasons({int(year): read_table(path) for year, path in inputs.items()}), output)
+    return [output]
+
+
+def build_features(input_path, output, stats_index):
+    from columnar_store import read_table, write_table
+    from feature_engineering import engineer_features
+
+    write_table(engineer_features(read_table(input_path), stats_index_file=stats_index), output)
+    return [output, stats_index]
+
+
+def train(features_path, model_dir, cv_folds=5, cv_workers=None):
+    from train_model import train_race_model
+
+    return train_race_model(features_path, model_dir, cv_folds=cv_folds, cv_workers=cv_workers)
+
+
+def fetch_practice(year, gp_name, sessions, output, cache_dir, offline=False, fixture_dir=None):
+    from fastf1_loader import fetch_sessions, practice_laps
+
+    loaded = fetch_sessions([(year, gp_name)], sessions, cache_dir=cache_dir, offline=offline,
+                            fixture_dir=fixture_dir)
+    practice_laps(loaded).to_csv(output, index=False)
+    return [output]
+
+
+def preprocess_practice(practice_path, output, year=DEFAULT_YEAR, gp_name=DEFAULT_GP):
+    from dtype_schema import read_csv_typed
+    from preprocess_fpdata_for_prediction import preprocess_practice_data
+    from race_calendar import event_config
+
+    preprocess_practice_data(read_csv_typed(practice_path), event=event_config(year, gp_name)).to_csv(output, index=False)
+    return [output]
+
+
+def predict(practice_path, model_dir, output):
+    """Per-driver predicted finishing order from the trained model (Driver, Team, PredictedPosition)"""
+    import glob
+
+    import pandas as pd
+
+    from dtype_schema import read_csv_typed
+    from prediction_server import MODEL_PATTERN, RaceModelArtifacts, driver_positions
+
+    model_paths = sorted(glob.glob(os.path.join(model_dir, MODEL_PATTERN)))
+    if not model_paths:
+        raise FileNotFoundError(f"No {MODEL_PATTERN} in {model_dir}")
+    # train() fits on unscaled, median-imputed features
+    artifacts = RaceModelArtifacts(model_paths[0], imputer_path=os.path.join(model_dir, "imputer.pkl"),
+                                   features_path=os.path.join(model_dir, "race_model_features.txt"),
+                                   use_scaler=False, impute_missing=True)
+    practice = read_csv_typed(practice_path)
+    missing = artifacts.missing_features(practice)
+    if missing:
+        print(f"⚠️ {len(missing)} model features not in {os.path.basename(practice_path)}, "
+              f"using training medians: {', '.join(missing)}")
+    positions = pd.DataFrame(driver_positions(practice, artifacts.predict(practice)))
+    teams = practice.astype({"Driver": object, "Team": object}).groupby("Driver")["Team"].first()
+    positions["Team"] = positions["Driver"].map(teams)
+    positions[["Driver", "Team", "PredictedPosition"]].to_csv(output, index=False)
+    return [output]
+
+
+# === DAG ===
+def build_stages(data_dir=DATA_DIR, raw_dir=None, year=DEFAULT_YEAR, gp_name=DEFAULT_GP,
+                 history_years=HISTORY_YEARS, workers=None, stream=False, cv_folds=5, cv_workers=None,
+                 offline=False, fixture_dir=None):
+    """
+    Stage specs in topological order: name -> {fn, kwargs, deps, inputs, code}.
+    inputs are the files/directories fingerprinted before a run (outputs are recorded after).
+    """
+    from race_calendar import event_config
+
+    paths = paths_for(data_dir, raw_dir, year, gp_name, history_years)
+    event = event_config(year, gp_name)
+    stages = {}
+    for season in history_years:
+        stages[f"clean_{season}"] = {
+            "fn": clean_season,
+            "kwargs": {"raw_dir": paths["raw_dir"], "year": season, "output": paths["cleaned"][season],
+                       "workers": workers, "stream": stream},
+            "deps": [],
+            "inputs": [(paths["raw_dir"], str(season))],
+            "code": ["clean_data/session_ingest.py", "dtype_schema.py", "columnar_store.py"],
+        }
+    stages["combine"] = {
+        "fn": combine,
+        "kwargs": {"inputs": paths["cleaned"], "output": paths["combined"]},
+        "deps": [f"clean_{season}" for season in history_years],
+        "inputs": list(paths["cleaned"].values()),
+        "code": ["clean_data/data_combiner_2024_2025.py", "columnar_store.py"],
+    }
+    stages["features"] = {
+        "fn": build_features,
+        "kwargs": {"input_path": paths["combined"], "output": paths["features"],
+                   "stats_index": paths["stats_index"]},
+        "deps": ["combine"],
+        "inputs": [paths["combined"]],
+        "code": ["feature_engineering.py", "feature_engine.py", "stats_index.py", "get_weather_data.py",
+                 "race_calendar.py"],
+    }
+    stages["train"] = {
+        "fn": train,
+        "kwargs": {"features_path": paths["features"], "model_dir": paths["model_dir"],
+                   "cv_folds": cv_folds, "cv_workers": cv_workers},
+        "deps": ["features"],
+        "inputs": [paths["features"], paths["best_config"]],
+        "code": ["train_model.py", "model_comparison.py", "tree_export.py"],
+    }
+    stages["fetch_fp"] = {
+        "fn": fetch_practice,
+        "kwargs": {"year": year, "gp_name": gp_name, "sessions": event["sessions"], "output": paths["practice"],
+                   "cache_dir": paths["cache_dir"], "offline": offline, "fixture_dir": fixture_dir},
+        "deps": [],
+        "inputs": [],  # the network / cache: refetched only when params change or the output is gone
+        "code": ["fastf1_loader.py"],
+    }
+    stages["preprocess_fp"] = {
+        "fn": preprocess_practice,
+        "kwargs": {"practice_path": paths["practice"], "output": paths["practice_preprocessed"],
+                   "year": year, "gp_name": gp_name},
+        "deps": ["fetch_fp"],
+        "inputs": [paths["practice"]],
+        "code": ["preprocess_fpdata_for_prediction.py", "time_parsing.py", "feature_engine.py",
+                 "get_weather_data.py", "race_calendar.py"],
+    }
+    stages["predict"] = {
+        "fn": predict,
+        "kwargs": {"practice_path": paths["practice_preprocessed"], "model_dir": paths["model_dir"],
+                   "output": paths["predictions"]},
+        "deps": ["preprocess_fp", "train"],
+        "inputs": [paths["practice_preprocessed"]],  # + train's outputs, via its recorded signatures
+        "code": ["prediction_server.py", "feature_matrix.py", "tree_export.py"],
+    }
+    return stages
+
+
+# === Fingerprints ===
+def path_signature(path, prefix=None):
+    """(size, mtime) of a file, or of every file under a directory (optionally only entries starting with prefix)"""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    if not os.path.isdir(path):
+        return None
+    signature = []
+    for entry in sorted(os.listdir(path)):
+        if prefix and not entry.startswith(prefix):
+            continue
+        full = os.path.join(path, entry)
+        if os.path.isdir(full):
+            signature.append([entry, path_signature(full)])
+        else:
+            stat = os.stat(full)
+            signature.append([entry, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def _code_hash(files):
+    digest = hashlib.sha256()
+    for name in files:
+        path = os.path.join(ROOT, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def fingerprint(spec, dep_outputs):
+    """Hash of params, input signatures, upstream outputs and stage code"""
+    inputs = [path_signature(*item) if isinstance(item, tuple) else path_signature(item) for item in spec["inputs"]]
+    payload = {
+        "kwargs": spec["kwargs"],
+        "inputs": inputs,
+        "upstream": dep_outputs,
+        "code": _code_hash(spec["code"]),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _outputs_unchanged(record):
+    return all(path_signature(path) == signature for path, signature in record.get("outputs", {}).items())
+
+
+# === Runner ===
+def _select(stages, only=None):
+    """Requested stages plus everything upstream of them"""
+    if not only:
+        return list(stages)
+    needed, todo = set(), list(only)
+    while todo:
+        name = todo.pop()
+        if name not in stages:
+            raise KeyError(f"Unknown stage {name!r} (stages: {', '.join(stages)})")
+        if name not in needed:
+            needed.add(name)
+            todo.extend(stages[name]["deps"])
+    return [name for name in stages if name in needed]
+
+
+def run_pipeline(stages, state_path, workers=None, only=None, force=(), dry_run=False, verbose=True):
+    """
+    Run the selected stages in dependency order, independent ones in parallel.
+    Returns {stage: "skipped" | "ran" | "failed" | "blocked" | "would run"}.
+    """
+    selected = _select(stages, only)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    state_lock = threading.Lock()
+    status = {}
+
+    def _log(message):
+        if verbose:
+            print(message)
+
+    def _upstream_outputs(name):
+        return {dep: state.get(dep, {}).get("outputs", {}) for dep in stages[name]["deps"]}
+
+    def _run(name):
+        spec = stages[name]
+        fp = fingerprint(spec, _upstream_outputs(name))
+        record = state.get(name, {})
+        if name not in force and record.get("fingerprint") == fp and _outputs_unchanged(record):
+            return name, "skipped", None
+        if dry_run:
+            return name, "would run", None
+        start = time.perf_counter()
+        with stage(name):
+            outputs = spec["fn"](**spec["kwargs"])
+        with state_lock:
+            state[name] = {
+                "fingerprint": fp,
+                "outputs": {path: path_signature(path) for path in outputs},
+                "seconds": round(time.perf_counter() - start, 3),
+                "finished": time.time(),
+            }
+            tmp_path = state_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, state_path)
+        return name, "ran", time.perf_counter() - start
+
+    pending = list(selected)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers or len(selected) or 1) as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = [dep for dep in stages[name]["deps"] if dep in selected]
+                if any(status.get(dep) in ("failed", "blocked") for dep in deps):
+                    status[name] = "blocked"
+                    pending.remove(name)
+                    _log(f"⛔ {name}: blocked by a failed dependency")
+                elif dry_run and any(status.get(dep) == "would run" for dep in deps):
+                    status[name] = "would run"
+                    pending.remove(name)
+                    _log(f"📝 {name}: would run")
+                elif all(dep in status for dep in deps):
+                    running[pool.submit(_run, name)] = name
+                    pending.remove(name)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    _, result, seconds = future.result()
+                except Exception as e:
+                    status[name] = "failed"
+                    _log(f"❌ {name}: {e}")
+                    continue
+                status[name] = result
+                if result == "ran":
+                    _log(f"✅ {name} ({seconds:.1f}s)")
+                elif result == "skipped":
+                    _log(f"⏭️  {name}: up to date")
+                else:
+                    _log(f"📝 {name}: would run")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the prediction pipeline, skipping up-to-date stages")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--raw-dir", default=None, help="raw FastF1 session folders (default: <data dir>/data_fetching)")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR)
+    parser.add_argument("--gp", default=DEFAULT_GP)
+    parser.add_argument("--history", type=int, nargs="+", default=list(HISTORY_YEARS), help="seasons to train on")
+    parser.add_argument("--only", nargs="+", default=None, help="run these stages (and what they depend on)")
+    parser.add_argument("--force", nargs="+", default=[], help="rerun these stages even if up to date")
+    parser.add_argument("--workers", type=int, default=None, help="parallel stages (default: all ready stages)")
+    parser.add_argument("--stream", action="store_true", help="stream cleaned sessions to disk")
+    parser.add_argument("--offline", action="store_true", help="FastF1 cache/fixtures only")
+    parser.add_argument("--fixtures", default=None, help="recorded FP session folders")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    start = time.perf_counter()
+    stages = build_stages(args.data_dir, args.raw_dir, args.year, args.gp, tuple(args.history),
+                          stream=args.stream, offline=args.offline, fixture_dir=args.fixtures)
+    status = run_pipeline(stages, os.path.join(args.data_dir, STATE_FILE), workers=args.workers,
+                          only=args.only, force=set(args.force), dry_run=args.dry_run)
+    print(f"🏁 Pipeline finished in {time.perf_counter() - start:.2f}s")
+    sys.exit(1 if any(result in ("failed", "blocked") for result in status.values()) else 0)
@@ -0,0 +1,300 @@
+"""
+Created on Sat Jun 14 10:04:36 2025
+
+@author: sid
+Warm local prediction service for the saved race model.
+- Loads best_race_model_*.pkl, imputer.pkl and race_model_features.txt once (scaler.pkl only
+  with --scaler: train_model.py fits the model on unscaled, median-imputed features)
+  (the memory-mapped best_race_model_*.trees export is used when it is up to date)
+- Feature list, imputer and scaler are compiled into one FeatureMatrixBuilder; requests whose
+  columns drift from the training features are rejected (SchemaDriftError -> 400)
+- Concurrent requests are grouped into small batches (max rows / max wait) and predicted together;
+  schema checks run per request, and a batch that still fails is retried request by request
+- POST /predict  {"rows": [{feature: value, ..., "Driver": "VER", "Team": "McLaren"}, ...]}
+  -> per-row predictions plus per-driver predicted positions when Driver is given
+- GET /metrics   p50/p99 latency, throughput, batch sizes;  GET /health
+Usage: python prediction_server.py [--port 8765] [--model best_race_model_XGBoost.pkl]
+"""
+
+import argparse
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import warnings
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_matrix import FeatureMatrixBuilder, check_schema, read_feature_list
+from instrumentation import add_arguments, configure_from_args, stage
+from project_paths import FEATURES_LIST_FILE, MODEL_DIR
+from tree_export import TreeEnsemble
+
+# === Artifact paths ===
+MODEL_PATTERN = "best_race_model_*.pkl"
+EXPORT_SUFFIX = ".trees"
+IMPUTER_PATH = os.path.join(MODEL_DIR, "imputer.pkl")
+SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
+FEATURES_PATH = FEATURES_LIST_FILE
+
+# === Batching ===
+MAX_BATCH_ROWS = 4096
+MAX_WAIT_MS = 2.0
+LATENCY_WINDOW = 10_000
+
+# Batches are passed as plain arrays in race_model_features.txt order
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+class RaceModelArtifacts:
+    """Model + preprocessing loaded once and reused for every batch"""
+
+    def __init__(self, model_path=None, imputer_path=IMPUTER_PATH, scaler_path=SCALER_PATH,
+                 features_path=FEATURES_PATH, use_scaler=False, use_export=True, impute_missing=False):
+        if model_path is None:
+            candidates = sorted(glob.glob(os.path.join(MODEL_DIR, MODEL_PATTERN)))
+            if not candidates:
+                raise FileNotFoundError(f"No {MODEL_PATTERN} found in {os.path.abspath(MODEL_DIR)}")
+            model_path = candidates[0]
+
+        start = time.perf_counter()
+        exported = os.path.splitext(model_path)[0] + EXPORT_SUFFIX
+        if use_export and model_path != exported and os.path.exists(exported) \
+                and os.path.getmtime(exported) >= os.path.getmtime(model_path):
+            model_path = exported
+        self.model_path = model_path
+        self.model = TreeEnsemble.load(model_path) if model_path.endswith(EXPORT_SUFFIX) else joblib.load(model_path)
+        self.imputer = joblib.load(imputer_path)
+        self.scaler = joblib.load(scaler_path) if use_scaler and os.path.exists(scaler_path) else None
+        self.features = read_feature_list(features_path)
+        self.builder = FeatureMatrixBuilder.from_artifacts(self.features, self.imputer, self.scaler)
+        self.impute_missing = impute_missing
+        self.load_seconds = time.perf_counter() - start
+
+    def predict(self, rows):
+        """Predicted FinalRacePosition per row of a DataFrame"""
+        return self.model.predict(self.builder.transform(rows, impute_missing=self.impute_missing))
+
+    def check_schema(self, rows):
+        """Raise SchemaDriftError for rows this model cannot predict (missing / non-numeric features)"""
+        check_schema(rows, self.builder.columns, self.impute_missing)
+
+    def missing_features(self, rows):
+        """Model features absent from rows (imputed with the training median when impute_missing)"""
+        return [col for col in self.builder.columns if col not in rows.columns]
+
+
+def driver_positions(rows, predictions):
+    """Rank drivers by their mean predicted finishing position"""
+    if "Driver" not in rows.columns:
+        return None
+    per_driver = pd.Series(predictions, index=rows["Driver"].to_numpy()).groupby(level=0).mean().sort_values()
+    return [
+        {"Driver": driver, "PredictedScore": float(score), "PredictedPosition": position}
+        for position, (driver, score) in enumerate(per_driver.items(), start=1)
+    ]
+
+
+class ServiceMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.batch_rows = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record_request(self, latency_ms, n_rows):
+        with self.lock:
+            self.latencies_ms.append(latency_ms)
+            self.requests += 1
+            self.rows += n_rows
+
+    def record_batch(self, n_rows):
+        with self.lock:
+            self.batch_rows.append(n_rows)
+            self.batches += 1
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            latencies = np.array(self.latencies_ms) if self.latencies_ms else np.array([np.nan])
+            return {
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "errors": self.errors,
+                "uptime_s": round(elapsed, 3),
+                "throughput_rps": round(self.requests / elapsed, 2) if elapsed else 0.0,
+                "throughput_rows_per_s": round(self.rows / elapsed, 2) if elapsed else 0.0,
+                "latency_p50_ms": float(np.nanpercentile(latencies, 50)) if self.latencies_ms else None,
+                "latency_p99_ms": float(np.nanpercentile(latencies, 99)) if self.latencies_ms else None,
+                "mean_batch_rows": float(np.mean(self.batch_rows)) if self.batch_rows else None,
+            }
+
+
+class MicroBatcher:
+    """Collects concurrent requests for up to max_wait_ms and predicts them in one call"""
+
+    def __init__(self, artifacts, metrics, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+        self.artifacts = artifacts
+        self.metrics = metrics
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.pending = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, rows):
+        future = Future()
+        self.pending.put((rows, future))
+        return future
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        n_rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            frames = [rows for rows, _ in batch]
+            try:
+                predictions = self.artifacts.predict(pd.concat(frames, ignore_index=True))
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    self._run_each(batch)
+                continue
+            self.metrics.record_batch(len(predictions))
+
+            offset = 0
+            for rows, future in batch:
+                future.set_result(predictions[offset:offset + len(rows)])
+                offset += len(rows)
+
+    def _run_each(self, batch):
+        """A failed batch is predicted request by request, so only the bad request fails"""
+        for rows, future in batch:
+            try:
+                predictions = self.artifacts.predict(rows)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.metrics.record_batch(len(predictions))
+            future.set_result(predictions)
+
+
+def make_handler(batcher, metrics, artifacts):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send_json(200, metrics.snapshot())
+            elif self.path == "/health":
+                self._send_json(200, {
+                    "status": "ok",
+                    "model": os.path.basename(artifacts.model_path),
+                    "features": len(artifacts.features),
+                    "load_seconds": round(artifacts.load_seconds, 4),
+                })
+            else:
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+                return
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                rows = pd.DataFrame(payload["rows"] if isinstance(payload, dict) else payload)
+                if rows.empty:
+                    raise ValueError("payload has no rows")
+                # Per request: once batched, a missing column would be filled from the other requests
+                artifacts.check_schema(rows)
+                predictions = batcher.submit(rows).result()
+            except Exception as e:
+                metrics.record_error()
+                self._send_json(400, {"error": str(e)})
+                return
+
+            response = {"predictions": [float(p) for p in predictions]}
+            positions = driver_positions(rows, predictions)
+            if positions is not None:
+                response["positions"] = positions
+            metrics.record_request((time.perf_counter() - start) * 1000, len(rows))
+            self._send_json(200, response)
+
+        def log_message(self, format, *args):
+            pass  # keep the hot path quiet; use /metrics instead
+
+    return PredictionHandler
+
+
+def serve(host="127.0.0.1", port=8765, model_path=None, max_batch_rows=MAX_BATCH_ROWS,
+          max_wait_ms=MAX_WAIT_MS, use_scaler=False):
+    """Build a ready-to-run server (call serve_forever() or run it in a thread)"""
+    with stage("load_model") as rec:
+        artifacts = RaceModelArtifacts(model_path, use_scaler=use_scaler)
+        rec.read(artifacts.model_path, IMPUTER_PATH, SCALER_PATH if use_scaler else None, FEATURES_PATH)
+    metrics = ServiceMetrics()
+    batcher = MicroBatcher(artifacts, metrics, max_batch_rows, max_wait_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, metrics, artifacts))
+    server.daemon_threads = True
+    print(f"✅ Loaded {os.path.basename(artifacts.model_path)} in {artifacts.load_seconds * 1000:.1f} ms")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm, batched race-position prediction server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=None, help=f"model pickle (default: first {MODEL_PATTERN})")
+    parser.add_argument("--max-batch-rows", type=int, default=MAX_BATCH_ROWS)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--scaler", action="store_true",
+                        help="also apply scaler.pkl (only for models trained on scaled features)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+
+    server = serve(args.host, args.port, args.model, args.max_batch_rows, args.max_wait_ms, args.scaler)
+    print(f"🏁 Serving predictions on http://{args.host}:{args.port} (POST /predict, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -5,337 +5,324 @@ Created on Sat May 31 13:08:18 2025
 @author: sid
 Updated to handle FP1, FP2, and FP3 data
 """
-import pandas as pd
-import numpy as np
+
+from columnar_store import read_table
+from dtype_schema import apply_schema, memory_footprint_mb, read_csv_typed
+from feature_engine import add_group_features
+from get_weather_data import weather_features
+from instrumentation import stage
+from project_paths import FEATURES_LIST_FILE, PATHS
+from race_calendar import event_config
+from time_parsing import detect_time_format, parse_time_column, parse_sector_times
 
 # === File paths ===
-PRACTICE_DATA_PATH = "/Users/sid/Downloads/Spanish_GP_2025/spanish_gp_2025_fp1_fp2_fp3.csv"  # Updated to include FP3
-REFERENCE_DATA_PATH = "/Users/sid/Downloads/Spanish_GP_2025/clean_data/final_features_cleaned.csv"
-OUTPUT_FILE = "spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv"  # Updated output filename
-
-# === Load datasets ===
-print("Loading datasets...")
-df = pd.read_csv(PRACTICE_DATA_PATH)
-ref_df = pd.read_csv(REFERENCE_DATA_PATH, low_memory=False)  # Fix the DtypeWarning
-
-# === DEBUG: Check column names ===
-print("\n=== DEBUGGING INFO ===")
-print(f"Practice data shape: {df.shape}")
-print(f"Reference data shape: {ref_df.shape}")
-print("\nPractice data columns:")
-print(df.columns.tolist())
-print("\nLooking for lap time related columns...")
-lap_time_cols = [col for col in df.columns if 'time' in col.lower() or 'lap' in col.lower()]
-print(f"Potential lap time columns: {lap_time_cols}")
-
-# Check session distribution
-if "SessionFolder" in df.columns:
-    print(f"\nSession distribution:")
-    session_counts = df["SessionFolder"].value_counts()
-    print(session_counts)
-elif "Session" in df.columns:
-    print(f"\nSession distribution:")
-    session_counts = df["Session"].value_counts()
-    print(session_counts)
-else:
-    print("Warning: No session column found to analyze session distribution")
-
-# === Find the correct lap time column ===
-# Common variations of lap time column names in F1 data
-possible_lap_time_cols = [
-    'LapTimeSeconds', 'LapTime', 'Time', 'LapTimeInSeconds', 
-    'lap_time', 'lap_time_seconds', 'LapDuration', 'Duration'
-]
-
-lap_time_col = None
-for col in possible_lap_time_cols:
-    if col in df.columns:
-        lap_time_col = col
-        print(f"✅ Found lap time column: {col}")
-        break
-
-if lap_time_col is None:
-    print("❌ No lap time column found! Available columns with 'time' or 'lap':")
-    for col in df.columns:
-        if 'time' in col.lower() or 'lap' in col.lower():
-            print(f"  - {col}")
-    print("\nPlease check your data and update the script with the correct column name.")
-    exit()
-
-# === Drop irrelevant columns if they exist ===
-drop_cols = [
-    "HeadshotUrl", "BroadcastName", "LapStartTime", "LapStartDate", 
-    "Deleted", "FastF1Generated", "IsAccurate", "Unnamed: 0"
-]
-df.drop(columns=[col for col in drop_cols if col in df.columns], inplace=True, errors="ignore")
-
-# === Barcelona Weather — manually set (different values for different sessions) ===
-# You can adjust these based on actual weather conditions during each session
-session_col = "SessionFolder" if "SessionFolder" in df.columns else ("Session" if "Session" in df.columns else None)
-
-# Default weather features (can be customized per session)
-default_weather = {
-    "AvgTemp": 23.5,  # Average temperature across all sessions
-    "RainAmount_mm": 0.24,
-    "RainProbability": 1.0,
-    "WindSpeed_mps": 3.9,
-    "Pressure_hPa": 1019,
-    "Humidity": 52,
-    "UVIndex": 9,
-    "DewPoint_C": 15,
-}
-
-# Session-specific weather adjustments (if needed)
-session_weather_adjustments = {
-    "FP1": {"AvgTemp": 22, "Humidity": 55},  # Typically cooler in morning
-    "FP2": {"AvgTemp": 25, "Humidity": 50},  # Warmer in afternoon
-    "FP3": {"AvgTemp": 24, "Humidity": 52},  # Morning session, moderate conditions
-}
-
-# Apply weather features
-for feature, default_value in default_weather.items():
-    df[feature] = default_value
-
-# Apply session-specific adjustments if session column exists
-if session_col is not None:
-    for session, adjustments in session_weather_adjustments.items():
-        session_mask = df[session_col].str.contains(session, case=False, na=False)
-        for feature, value in adjustments.items():
-            df.loc[session_mask, feature] = value
-    print(f"Applied session-specific weather adjustments based on {session_col}")
-else:
-    print("No session column found, using default weather values for all data")
-
-# === Lap time cleaning ===
-print(f"\nSample lap time values:")
-print(df[lap_time_col].head(10).tolist())
-
-def parse_lap_time(time_value):
-    """Convert lap time from various formats to seconds"""
-    if pd.isna(time_value):
-        return np.nan
-    
-    # Handle pandas Timedelta objects (like '0 days 00:01:16.802000')
-    if isinstance(time_value, pd.Timedelta):
-        return time_value.total_seconds()
-    
-    # Convert to string and handle string formats
-    time_str = str(time_value).strip()
-    
-    # Handle pandas Timedelta string representation
-    if 'days' in time_str and ':' in time_str:
-        try:
-            # Parse format like '0 days 00:01:16.802000'
-            td = pd.to_timedelta(time_str)
-            return td.total_seconds()
-        except:
-            pass
-    
-    # Handle already numeric values
-    try:
-        return float(time_str)
-    except ValueError:
-        pass
-    
-    # Handle MM:SS.SSS format
-    if ':' in time_str and 'days' not in time_str:
-        try:
-            parts = time_str.split(':')
-            if len(parts) == 2:
-                minutes = float(parts[0])
-                seconds = float(parts[1])
-                return minutes * 60 + seconds
-        except ValueError:
-            pass
-    
-    # Handle SS.SSS format (no minutes)
-    try:
-        return float(time_str)
-    except ValueError:
-        return np.nan
-
-# Convert lap times to seconds
-print("Converting lap times to seconds...")
-df["LapTimeSeconds"] = df[lap_time_col].apply(parse_lap_time)
-
-if lap_time_col != "LapTimeSeconds":
-    df.drop(columns=[lap_time_col], inplace=True)  # Remove original column
-
-print(f"\nLap time statistics after conversion:")
-print(f"Valid lap times: {df['LapTimeSeconds'].notna().sum()}")
-print(f"Invalid/missing lap times: {df['LapTimeSeconds'].isna().sum()}")
-
-if df['LapTimeSeconds'].notna().sum() > 0:
-    print(f"Lap time range: {df['LapTimeSeconds'].min():.3f}s - {df['LapTimeSeconds'].max():.3f}s")
-    print(f"Mean lap time: {df['LapTimeSeconds'].mean():.3f}s")
-    
-    # Show lap time statistics by session if session column exists
+PRACTICE_DATA_PATH = PATHS["practice"]  # Updated to include FP3
+REFERENCE_DATA_PATH = PATHS["features"]
+FEATURES_PATH = FEATURES_LIST_FILE
+OUTPUT_FILE = PATHS["practice_preprocessed"]  # Updated output filename
+
+# === Weather source ===
+USE_FORECAST_WEATHER = False  # True = OpenWeatherMap forecast per session (needs OPENWEATHER_API_KEY)
+# Session forecast windows, manual weather and track indicators: race_calendar.event_config
+
+def preprocess_practice_data(df, ref_df=None, event=None, verbose=True):
+    """
+    Clean FP1-FP3 laps and build the model features (weather, pace, session flags).
+    df: raw practice laps (as written by data_fetcher_2025_spanish_gp.py); modified in place.
+    ref_df: optional reference feature table, only used for the debug summary.
+    event: race_calendar.event_config() of the race weekend (default: 2025 Spanish GP).
+    verbose: False skips the debug output and the summary tables (batch mode).
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    if event is None:
+        event = event_config()
+    # === DEBUG: Check column names ===
+    log("\n=== DEBUGGING INFO ===")
+    log(f"Practice data shape: {df.shape}")
+    if ref_df is not None:
+        log(f"Reference data shape: {ref_df.shape}")
+    log("\nPractice data columns:")
+    log(df.columns.tolist())
+    log("\nLooking for lap time related columns...")
+    lap_time_cols = [col for col in df.columns if 'time' in col.lower() or 'lap' in col.lower()]
+    log(f"Potential lap time columns: {lap_time_cols}")
+
+    # Check session distribution
+    if "SessionFolder" in df.columns:
+        log(f"\nSession distribution:")
+        session_counts = df["SessionFolder"].value_counts()
+        log(session_counts)
+    elif "Session" in df.columns:
+        log(f"\nSession distribution:")
+        session_counts = df["Session"].value_counts()
+        log(session_counts)
+    else:
+        log("Warning: No session column found to analyze session distribution")
+
+    # === Find the correct lap time column ===
+    # Common variations of lap time column names in F1 data
+    possible_lap_time_cols = [
+        'LapTimeSeconds', 'LapTime', 'Time', 'LapTimeInSeconds', 
+        'lap_time', 'lap_time_seconds', 'LapDuration', 'Duration'
+    ]
+
+    lap_time_col = None
+    for col in possible_lap_time_cols:
+        if col in df.columns:
+            lap_time_col = col
+            log(f"✅ Found lap time column: {col}")
+            break
+
+    if lap_time_col is None:
+        log("❌ No lap time column found! Available columns with 'time' or 'lap':")
+        for col in df.columns:
+            if 'time' in col.lower() or 'lap' in col.lower():
+                log(f"  - {col}")
+        raise ValueError("No lap time column found in the practice data")
+
+    # === Drop irrelevant columns if they exist ===
+    drop_cols = [
+        "HeadshotUrl", "BroadcastName", "LapStartTime", "LapStartDate", 
+        "Deleted", "FastF1Generated", "IsAccurate", "Unnamed: 0"
+    ]
+    df.drop(columns=[col for col in drop_cols if col in df.columns], inplace=True, errors="ignore")
+
+    # === Event weather — manually set per event (different values for different sessions) ===
+    # Adjust these per event in race_calendar.py (or a calendar file)
+    session_col = "SessionFolder" if "SessionFolder" in df.columns else ("Session" if "Session" in df.columns else None)
+
+    # Default weather features (can be customized per session)
+    default_weather = dict(event["weather"])
+
+    # Session-specific weather adjustments (if needed)
+    session_weather_adjustments = {session: dict(values) for session, values in event["session_weather"].items()}
+
+    # Forecast-driven weather per session (cached; falls back to the manual values above)
+    if USE_FORECAST_WEATHER:
+        for session, (start, end) in event["session_windows"].items():
+            session_weather_adjustments[session] = weather_features(
+                start, end, fallback={**default_weather, **session_weather_adjustments.get(session, {})}
+            )
+
+    # Apply weather features
+    for feature, default_value in default_weather.items():
+        df[feature] = default_value
+
+    # Apply session-specific adjustments if session column exists
     if session_col is not None:
-        print(f"\nLap time statistics by session:")
-        session_stats = df.groupby(session_col)['LapTimeSeconds'].agg(['count', 'mean', 'min', 'max'])
-        print(session_stats)
-
-# Drop rows with invalid lap times
-initial_rows = len(df)
-df.dropna(subset=["LapTimeSeconds"], inplace=True)
-print(f"Dropped {initial_rows - len(df)} rows with invalid lap times")
-
-if len(df) == 0:
-    print("❌ ERROR: No valid lap times found after conversion!")
-    print("Please check the lap time format in your data.")
-    import sys
-    sys.exit()
-
-# === Feature Engineering ===
-print("\nEngineering features...")
-
-# Check if required columns exist before using them
-if "Stint" in df.columns:
-    df["StintLength"] = df["Stint"].fillna(0)
-else:
-    print("Warning: 'Stint' column not found, setting StintLength to 0")
-    df["StintLength"] = 0
-
-if "IsPersonalBest" in df.columns:
-    df["IsFastLap"] = df["IsPersonalBest"].astype(int)
-else:
-    print("Warning: 'IsPersonalBest' column not found, setting IsFastLap to 0")
-    df["IsFastLap"] = 0
-
-# Check if Driver column exists
-if "Driver" not in df.columns:
-    print("❌ ERROR: 'Driver' column not found!")
-    driver_cols = [col for col in df.columns if 'driver' in col.lower()]
-    print(f"Possible driver columns: {driver_cols}")
-    exit()
-
-# Check if Team column exists
-team_col = None
-possible_team_cols = ["Team", "TeamName", "Constructor", "team"]
-for col in possible_team_cols:
-    if col in df.columns:
-        team_col = col
-        break
-
-if team_col is None:
-    print("Warning: No team column found, skipping team-based features")
-    df["TeamMedianPace"] = df["LapTimeSeconds"].median()  # Use overall median as fallback
-else:
-    if team_col != "Team":
-        df["Team"] = df[team_col]  # Standardize column name
-
-# Driver Avg Pace (across all sessions)
-driver_avg = df.groupby("Driver")["LapTimeSeconds"].mean().rename("DriverAvgPace")
-df = df.merge(driver_avg, on="Driver", how="left")
-
-# Driver Avg Pace per session
-if session_col is not None:
-    driver_session_avg = df.groupby(["Driver", session_col])["LapTimeSeconds"].mean().rename("DriverSessionAvgPace")
-    df = df.merge(driver_session_avg, on=["Driver", session_col], how="left")
-
-# Team Median Pace (if team column exists)
-if team_col is not None:
-    team_median = df.groupby("Team")["LapTimeSeconds"].median().rename("TeamMedianPace")
-    df = df.merge(team_median, on="Team", how="left")
+        for session, adjustments in session_weather_adjustments.items():
+            session_mask = df[session_col].str.contains(session, case=False, na=False)
+            for feature, value in adjustments.items():
+                df.loc[session_mask, feature] = value
+        log(f"Applied session-specific weather adjustments based on {session_col}")
+    else:
+        log("No session column found, using default weather values for all data")
+
+    # === Lap time cleaning ===
+    log(f"\nSample lap time values:")
+    log(df[lap_time_col].head(10).tolist())
+
+    # Convert lap times to seconds
+    lap_time_format = detect_time_format(df[lap_time_col])
+    log(f"Converting lap times to seconds (detected format: {lap_time_format})...")
+    df["LapTimeSeconds"] = parse_time_column(df[lap_time_col], lap_time_format)
+
+    if lap_time_col != "LapTimeSeconds":
+        df.drop(columns=[lap_time_col], inplace=True)  # Remove original column
+
+    # Sector times arrive as raw timedelta strings ('0 days 00:00:22.782000')
+    parse_sector_times(df)
+
+    log(f"\nLap time statistics after conversion:")
+    log(f"Valid lap times: {df['LapTimeSeconds'].notna().sum()}")
+    log(f"Invalid/missing lap times: {df['LapTimeSeconds'].isna().sum()}")
+
+    if df['LapTimeSeconds'].notna().sum() > 0:
+        log(f"Lap time range: {df['LapTimeSeconds'].min():.3f}s - {df['LapTimeSeconds'].max():.3f}s")
+        log(f"Mean lap time: {df['LapTimeSeconds'].mean():.3f}s")
     
-    # Team Median Pace per session
+        # Show lap time statistics by session if session column exists
+        if verbose and session_col is not None:
+            log(f"\nLap time statistics by session:")
+            session_stats = df.groupby(session_col)['LapTimeSeconds'].agg(['count', 'mean', 'min', 'max'])
+            log(session_stats)
+
+    # Drop rows with invalid lap times
+    initial_rows = len(df)
+    df.dropna(subset=["LapTimeSeconds"], inplace=True)
+    log(f"Dropped {initial_rows - len(df)} rows with invalid lap times")
+
+    if len(df) == 0:
+        log("❌ ERROR: No valid lap times found after conversion!")
+        raise ValueError("No valid lap times found after conversion; check the lap time format")
+
+    # === Feature Engineering ===
+    log("\nEngineering features...")
+
+    # Check if required columns exist before using them
+    if "Stint" in df.columns:
+        df["StintLength"] = df["Stint"].fillna(0)
+    else:
+        log("Warning: 'Stint' column not found, setting StintLength to 0")
+        df["StintLength"] = 0
+
+    if "IsPersonalBest" in df.columns:
+        df["IsFastLap"] = df["IsPersonalBest"].astype(int)
+    else:
+        log("Warning: 'IsPersonalBest' column not found, setting IsFastLap to 0")
+        df["IsFastLap"] = 0
+
+    # Check if Driver column exists
+    if "Driver" not in df.columns:
+        log("❌ ERROR: 'Driver' column not found!")
+        driver_cols = [col for col in df.columns if 'driver' in col.lower()]
+        raise ValueError(f"'Driver' column not found (possible driver columns: {driver_cols})")
+
+    # Check if Team column exists
+    team_col = None
+    possible_team_cols = ["Team", "TeamName", "Constructor", "team"]
+    for col in possible_team_cols:
+        if col in df.columns:
+            team_col = col
+            break
+
+    if team_col is None:
+        log("Warning: No team column found, skipping team-based features")
+        df["TeamMedianPace"] = df["LapTimeSeconds"].median()  # Use overall median as fallback
+    else:
+        if team_col != "Team":
+            df["Team"] = df[team_col]  # Standardize column name
+
+    # Group-level pace and lap-count features, computed in one pass and written in place
+    # (DriverAvgPace across all sessions, per-session pace, team medians, lap counts)
+    group_features = [("DriverAvgPace", ["Driver"], "LapTimeSeconds", "mean")]
+    if session_col is not None:
+        group_features.append(("DriverSessionAvgPace", ["Driver", session_col], "LapTimeSeconds", "mean"))
+    if team_col is not None:
+        group_features.append(("TeamMedianPace", ["Team"], "LapTimeSeconds", "median"))
+        if session_col is not None:
+            group_features.append(("TeamSessionMedianPace", ["Team", session_col], "LapTimeSeconds", "median"))
     if session_col is not None:
-        team_session_median = df.groupby(["Team", session_col])["LapTimeSeconds"].median().rename("TeamSessionMedianPace")
-        df = df.merge(team_session_median, on=["Team", session_col], how="left")
+        group_features.append(("DriverSessionLapCount", ["Driver", session_col], None, "size"))
+    else:
+        log("Warning: No session column found, setting DriverSessionLapCount to lap count per driver")
+        group_features.append(("DriverSessionLapCount", ["Driver"], None, "size"))
+    add_group_features(df, group_features)
 
-# Spanish GP Indicator
-df["IsSpanishGP"] = 1
+    # Track indicators (IsSpanishGP, ...) for this event
+    for feature, value in event["indicators"].items():
+        df[feature] = value
 
-# Session Type encoding (if session column exists)
-if session_col is not None:
-    df["IsFP1"] = df[session_col].str.contains("FP1", case=False, na=False).astype(int)
-    df["IsFP2"] = df[session_col].str.contains("FP2", case=False, na=False).astype(int)
-    df["IsFP3"] = df[session_col].str.contains("FP3", case=False, na=False).astype(int)
+    # Session Type encoding (if session column exists)
+    if session_col is not None:
+        df["IsFP1"] = df[session_col].str.contains("FP1", case=False, na=False).astype(int)
+        df["IsFP2"] = df[session_col].str.contains("FP2", case=False, na=False).astype(int)
+        df["IsFP3"] = df[session_col].str.contains("FP3", case=False, na=False).astype(int)
     
-    # Session progression (FP1=1, FP2=2, FP3=3)
-    df["SessionProgression"] = (
-        df["IsFP1"] * 1 + 
-        df["IsFP2"] * 2 + 
-        df["IsFP3"] * 3
+        # Session progression (FP1=1, FP2=2, FP3=3)
+        df["SessionProgression"] = (
+            df["IsFP1"] * 1 + 
+            df["IsFP2"] * 2 + 
+            df["IsFP3"] * 3
+        )
+    else:
+        log("Warning: No session column found, cannot create session-specific features")
+        df["IsFP1"] = 0
+        df["IsFP2"] = 0
+        df["IsFP3"] = 0
+        df["SessionProgression"] = 1
+
+    # Clean Air flag
+    if "TrackStatus" in df.columns:
+        df["IsCleanAir"] = (df["TrackStatus"] == 1).astype(int)
+    else:
+        log("Warning: 'TrackStatus' column not found, setting IsCleanAir to 0")
+        df["IsCleanAir"] = 0
+
+    # Adjusted Lap Time based on weather
+    df["AdjustedLapTime"] = df["LapTimeSeconds"] * (
+        1 + df["RainProbability"] * 0.05 + df["Humidity"] / 1000
     )
-else:
-    print("Warning: No session column found, cannot create session-specific features")
-    df["IsFP1"] = 0
-    df["IsFP2"] = 0
-    df["IsFP3"] = 0
-    df["SessionProgression"] = 1
-
-# Clean Air flag
-if "TrackStatus" in df.columns:
-    df["IsCleanAir"] = (df["TrackStatus"] == 1).astype(int)
-else:
-    print("Warning: 'TrackStatus' column not found, setting IsCleanAir to 0")
-    df["IsCleanAir"] = 0
-
-# Adjusted Lap Time based on weather
-df["AdjustedLapTime"] = df["LapTimeSeconds"] * (
-    1 + df["RainProbability"] * 0.05 + df["Humidity"] / 1000
-)
-
-# Lap count per driver per session
-if session_col is not None:
-    lap_counts = df.groupby(["Driver", session_col]).size().rename("DriverSessionLapCount")
-    df = df.merge(lap_counts, on=["Driver", session_col], how="left")
-else:
-    print("Warning: No session column found, setting DriverSessionLapCount to lap count per driver")
-    lap_counts = df.groupby("Driver").size().rename("DriverSessionLapCount")
-    df = df.merge(lap_counts, on="Driver", how="left")
-
-# Track evolution (assume track gets faster over sessions)
-if session_col is not None:
-    # Calculate track evolution factor based on session
-    session_factors = {"FP1": 1.0, "FP2": 0.98, "FP3": 0.96}  # Track gets ~2% faster each session
-    df["TrackEvolutionFactor"] = 1.0
-    for session, factor in session_factors.items():
-        session_mask = df[session_col].str.contains(session, case=False, na=False)
-        df.loc[session_mask, "TrackEvolutionFactor"] = factor
-else:
-    df["TrackEvolutionFactor"] = 1.0
-
-# === Drop rows missing critical engineered features ===
-critical_features = ["DriverAvgPace"]
-if team_col is not None:
-    critical_features.append("TeamMedianPace")
-
-initial_rows = len(df)
-df.dropna(subset=critical_features, inplace=True)
-print(f"Dropped {initial_rows - len(df)} rows missing critical features")
-
-# === Final data info ===
-print(f"\n=== FINAL PROCESSED DATA ===")
-print(f"Final shape: {df.shape}")
-print(f"Columns: {len(df.columns)}")
-print(f"Unique drivers: {df['Driver'].nunique()}")
-if team_col is not None:
-    print(f"Unique teams: {df['Team'].nunique()}")
-
-if session_col is not None:
-    print(f"Session distribution after processing:")
-    print(df[session_col].value_counts())
-    print(f"FP1 laps: {df['IsFP1'].sum()}")
-    print(f"FP2 laps: {df['IsFP2'].sum()}")
-    print(f"FP3 laps: {df['IsFP3'].sum()}")
-
-# Show sample of key features by session
-if session_col is not None and len(df) > 0:
-    print(f"\nSample statistics by session:")
-    session_summary = df.groupby(session_col).agg({
-        'LapTimeSeconds': ['count', 'mean', 'min'],
-        'DriverAvgPace': 'mean',
-        'AdjustedLapTime': 'mean'
-    }).round(3)
-    print(session_summary)
-
-# === Save preprocessed data ===
-df.to_csv(OUTPUT_FILE, index=False)
-print(f"✅ Preprocessed FP1/FP2/FP3 data saved to: {OUTPUT_FILE}")
-print(f"Saved {len(df)} rows with {len(df.columns)} columns")
-
-# Show final column list
-print(f"\nFinal columns in processed data:")
-print(df.columns.tolist())
\ No newline at end of file
+
+    # Track evolution (assume track gets faster over sessions)
+    if session_col is not None:
+        # Calculate track evolution factor based on session
+        session_factors = {"FP1": 1.0, "FP2": 0.98, "FP3": 0.96}  # Track gets ~2% faster each session
+        df["TrackEvolutionFactor"] = 1.0
+        for session, factor in session_factors.items():
+            session_mask = df[session_col].str.contains(session, case=False, na=False)
+            df.loc[session_mask, "TrackEvolutionFactor"] = factor
+    else:
+        df["TrackEvolutionFactor"] = 1.0
+
+    # === Drop rows missing critical engineered features ===
+    critical_features = ["DriverAvgPace"]
+    if team_col is not None:
+        critical_features.append("TeamMedianPace")
+
+    initial_rows = len(df)
+    df.dropna(subset=critical_features, inplace=True)
+    log(f"Dropped {initial_rows - len(df)} rows missing critical features")
+
+    # === Compact dtypes for the engineered columns ===
+    apply_schema(df)
+
+    # === Final data info ===
+    log(f"\n=== FINAL PROCESSED DATA ===")
+    log(f"Final shape: {df.shape}")
+    log(f"Memory footprint: {memory_footprint_mb(df):.2f} MB")
+    log(f"Columns: {len(df.columns)}")
+    log(f"Unique drivers: {df['Driver'].nunique()}")
+    if team_col is not None:
+        log(f"Unique teams: {df['Team'].nunique()}")
+
+    if verbose and session_col is not None:
+        log(f"Session distribution after processing:")
+        log(df[session_col].value_counts())
+        log(f"FP1 laps: {df['IsFP1'].sum()}")
+        log(f"FP2 laps: {df['IsFP2'].sum()}")
+        log(f"FP3 laps: {df['IsFP3'].sum()}")
+
+    # Show sample of key features by session
+    if verbose and session_col is not None and len(df) > 0:
+        log(f"\nSample statistics by session:")
+        session_summary = df.groupby(session_col).agg({
+            'LapTimeSeconds': ['count', 'mean', 'min'],
+            'DriverAvgPace': 'mean',
+            'AdjustedLapTime': 'mean'
+        }).round(3)
+        log(session_summary)
+
+    return df
+
+
+if __name__ == "__main__":
+    with stage("preprocess_fp") as fp_rec:
+        # === Load datasets ===
+        print("Loading datasets...")
+        with stage("load") as rec:
+            df = read_csv_typed(PRACTICE_DATA_PATH)
+            with open(FEATURES_PATH) as f:
+                model_features = [line.strip() for line in f if line.strip()]
+            # Typed columnar reference: load only the model feature columns
+            ref_df = read_table(REFERENCE_DATA_PATH, columns=["Driver", "Team"] + model_features)
+            rec.rows = len(df)
+            rec.read(PRACTICE_DATA_PATH, REFERENCE_DATA_PATH)
+
+        with stage("features") as rec:
+            df = preprocess_practice_data(df, ref_df)
+            rec.rows = len(df)
+
+        # === Save preprocessed data ===
+        with stage("save") as rec:
+            df.to_csv(OUTPUT_FILE, index=False)
+            rec.wrote(OUTPUT_FILE)
+        fp_rec.rows = len(df)
+        fp_rec.wrote(OUTPUT_FILE)
+
+    print(f"✅ Preprocessed FP1/FP2/FP3 data saved to: {OUTPUT_FILE}")
+    print(f"Saved {len(df)} rows with {len(df.columns)} columns")
+
+    # Show final column list
+    print(f"\nFinal columns in processed data:")
+    print(df.columns.tolist())
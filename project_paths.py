@@ -0,0 +1,62 @@
+"""
+Created on Sat Jun 21 09:20:14 2025
+
+@author: sid
+Default locations of every pipeline file, relative to one data directory.
+- F1_DATA_DIR overrides the data directory (default: this repository)
+- F1_RAW_DIR overrides the raw FastF1 session folders (default: <data dir>/data_fetching)
+paths_for() builds the same layout for any data directory / race weekend.
+"""
+
+import os
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("F1_DATA_DIR", ROOT)
+RAW_DATA_DIR = os.environ.get("F1_RAW_DIR", os.path.join(DATA_DIR, "data_fetching"))
+
+DEFAULT_YEAR = 2025
+DEFAULT_GP = "Spanish Grand Prix"
+HISTORY_YEARS = (2024, 2025)
+
+# Written next to race_model_features.txt by hyperparameter_search.py
+BEST_CONFIG_FILE = "race_model_best_config.json"
+SEARCH_TRIALS_FILE = "hyperparameter_trials.jsonl"
+
+
+def gp_slug(gp_name):
+    """'Spanish Grand Prix' -> 'spanish_gp' (prefix of the race-weekend files)"""
+    return gp_name.lower().replace(" grand prix", "_gp").replace(" ", "_")
+
+
+def paths_for(data_dir=DATA_DIR, raw_dir=None, year=DEFAULT_YEAR, gp_name=DEFAULT_GP, history_years=HISTORY_YEARS):
+    """Every input/output path of the pipeline for one data directory and race weekend"""
+    clean_dir = os.path.join(data_dir, "clean_data")
+    model_dir = os.path.join(data_dir, "models")
+    weekend = f"{gp_slug(gp_name)}_{year}"
+    return {
+        "raw_dir": raw_dir or (RAW_DATA_DIR if data_dir == DATA_DIR else os.path.join(data_dir, "data_fetching")),
+        "clean_dir": clean_dir,
+        "cleaned": {int(y): os.path.join(clean_dir, f"final_cleaned_{y}_data.parquet") for y in history_years},
+        "combined": os.path.join(clean_dir, "combined_cleaned_{}_with_positions.parquet".format(
+            "_".join(str(y) for y in history_years))),
+        "features": os.path.join(clean_dir, "final_features_cleaned.parquet"),
+        "incremental_store": os.path.join(clean_dir, "incremental_store"),
+        "stats_index": os.path.join(clean_dir, "stats_index.parquet"),
+        "model_dir": model_dir,
+        "best_config": os.path.join(model_dir, BEST_CONFIG_FILE),
+        "search_trials": os.path.join(model_dir, SEARCH_TRIALS_FILE),
+        "practice": os.path.join(data_dir, f"{weekend}_fp1_fp2_fp3.csv"),
+        "practice_preprocessed": os.path.join(data_dir, f"{weekend}_fp1_fp2_fp3_preprocessed.csv"),
+        "predictions": os.path.join(data_dir, f"{weekend}_predictions.csv"),
+        "cache_dir": os.path.join(data_dir, "f1_cache"),
+    }
+
+
+PATHS = paths_for()
+CLEAN_DIR = PATHS["clean_dir"]
+MODEL_DIR = PATHS["model_dir"]
+FEATURES_LIST_FILE = os.path.join(MODEL_DIR, "race_model_features.txt")
+
+
+def cleaned_file(year):
+    return os.path.join(CLEAN_DIR, f"final_cleaned_{year}_data.parquet")
@@ -0,0 +1,127 @@
+"""
+Created on Thu Jun 26 09:05:38 2025
+
+@author: sid
+Per-event configuration for any (year, Grand Prix), replacing the Spanish GP constants.
+- TRACK_INDICATORS: model feature -> GP name fragment (IsSpanishGP = 1 only at the Spanish GP);
+  the same table drives feature_engineering.py (training) and FP preprocessing (prediction)
+- TRACK_BONUS: track-specialist bonus per driver for the logic predictor (0 when not listed)
+- Weather: manual per-event values (BARCELONA_WEATHER when none are configured) and optional
+  per-session adjustments / forecast windows
+- CALENDARS: the built-in season calendars with each weekend's practice sessions
+  (sprint weekends only run FP1)
+event_config() builds one event; load_calendar() reads a JSON list of events with overrides.
+"""
+
+import json
+
+from project_paths import DEFAULT_GP, DEFAULT_YEAR
+
+FP_SESSIONS = ("FP1", "FP2", "FP3")
+SPRINT_SESSIONS = ("FP1",)
+
+# === Track indicators (model features) ===
+TRACK_INDICATORS = {
+    "IsSpanishGP": "Spanish",
+}
+
+# === Track specialist bonuses ===
+TRACK_BONUS = {
+    "Spanish Grand Prix": {
+        'VER': 0.5,   # 3 consecutive wins (2022, 2023, 2024) - HUGE bonus
+        'ALO': 0.25,  # Home race + extensive Barcelona experience
+        'HAM': 0.15,  # Won there 6 times (2014, 2017, 2018, 2019, 2020, 2021)
+        'LEC': 0.1,   # Ferrari traditionally strong at Barcelona
+        'RUS': 0.08,  # Good at technical tracks
+        'SAI': 0.12,  # Spanish driver + track knowledge
+    },
+}
+
+# === Weather (manual) ===
+# Events without an entry use get_weather_data.BARCELONA_WEATHER
+EVENT_WEATHER = {}
+SESSION_WEATHER = {
+    "Spanish Grand Prix": {
+        "FP1": {"AvgTemp": 22, "Humidity": 55},  # Typically cooler in morning
+        "FP2": {"AvgTemp": 25, "Humidity": 50},  # Warmer in afternoon
+        "FP3": {"AvgTemp": 24, "Humidity": 52},  # Morning session, moderate conditions
+    },
+}
+# Forecast windows (UTC) per session, for get_weather_data.weather_features
+SESSION_WINDOWS_UTC = {
+    (2025, "Spanish Grand Prix"): {
+        "FP1": ("2025-05-30 11:30:00", "2025-05-30 12:30:00"),
+        "FP2": ("2025-05-30 15:00:00", "2025-05-30 16:00:00"),
+        "FP3": ("2025-05-31 10:30:00", "2025-05-31 11:30:00"),
+    },
+}
+
+# === Season calendars: (Grand Prix as FastF1 names it, sprint weekend) ===
+CALENDARS = {
+    2025: [
+        ("Australian Grand Prix", False), ("Chinese Grand Prix", True), ("Japanese Grand Prix", False),
+        ("Bahrain Grand Prix", False), ("Saudi Arabian Grand Prix", False), ("Miami Grand Prix", True),
+        ("Emilia Romagna Grand Prix", False), ("Monaco Grand Prix", False), ("Spanish Grand Prix", False),
+        ("Canadian Grand Prix", False), ("Austrian Grand Prix", False), ("British Grand Prix", False),
+        ("Belgian Grand Prix", True), ("Hungarian Grand Prix", False), ("Dutch Grand Prix", False),
+        ("Italian Grand Prix", False), ("Azerbaijan Grand Prix", False), ("Singapore Grand Prix", False),
+        ("United States Grand Prix", True), ("Mexico City Grand Prix", False), ("São Paulo Grand Prix", True),
+        ("Las Vegas Grand Prix", False), ("Qatar Grand Prix", True), ("Abu Dhabi Grand Prix", False),
+    ],
+}
+
+
+def track_indicators(gp_name):
+    """{indicator feature: 0/1} for one Grand Prix"""
+    return {feature: int(fragment.lower() in gp_name.lower()) for feature, fragment in TRACK_INDICATORS.items()}
+
+
+def event_config(year=DEFAULT_YEAR, gp_name=DEFAULT_GP, sessions=None, **overrides):
+    """Everything event-specific the preprocessing and both predictors need, as a plain dict"""
+    # Imported here so pipeline.py / cli.py can build stages without numpy
+    from get_weather_data import BARCELONA_WEATHER
+
+    sprint = dict(CALENDARS.get(year, [])).get(gp_name, False)
+    event = {
+        "year": int(year),
+        "gp_name": gp_name,
+        "sessions": list(sessions or (SPRINT_SESSIONS if sprint else FP_SESSIONS)),
+        "indicators": track_indicators(gp_name),
+        "track_bonus": dict(TRACK_BONUS.get(gp_name, {})),
+        "weather": dict(EVENT_WEATHER.get(gp_name, BARCELONA_WEATHER)),
+        "session_weather": {s: dict(v) for s, v in SESSION_WEATHER.get(gp_name, {}).items()},
+        "session_windows": dict(SESSION_WINDOWS_UTC.get((int(year), gp_name), {})),
+    }
+    for key, value in overrides.items():
+        if key not in event:
+            raise KeyError(f"Unknown event setting {key!r} for {year} {gp_name}")
+        event[key] = {**event[key], **value} if isinstance(event[key], dict) else value
+    return event
+
+
+def season_calendar(year):
+    if year not in CALENDARS:
+        raise KeyError(f"No built-in calendar for {year} (seasons: {', '.join(map(str, CALENDARS))})")
+    return [event_config(year, gp_name) for gp_name, _ in CALENDARS[year]]
+
+
+def load_calendar(path):
+    """
+    Events from a JSON list: [{"year": 2025, "gp": "Monaco Grand Prix", "track_bonus": {...}}, ...].
+    Every key other than year/gp overrides the matching event_config() setting.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    events = []
+    for entry in entries:
+        entry = dict(entry)
+        events.append(event_config(entry.pop("year"), entry.pop("gp"), **entry))
+    return events
+
+
+def parse_event(text):
+    """'2025:Monaco Grand Prix' -> event_config(2025, 'Monaco Grand Prix')"""
+    year, _, gp_name = text.partition(":")
+    if not gp_name:
+        raise ValueError(f"Events are YEAR:GRAND PRIX, got {text!r}")
+    return event_config(int(year), gp_name.strip())
@@ -0,0 +1,416 @@
+"""
+Created on Sat Jun 28 10:07:33 2025
+
+@author: sid
+Offline live-timing replay for latency testing: no live session, no network.
+- Laps come from a practice CSV (spanish_gp_2025_fp1_fp2_fp3_preprocessed.csv by default) in
+  file order, or from a FastF1-cached / recorded session in timing order (session clock "Time")
+- Each lap gets an arrival time: the session clock when the source has one, otherwise a
+  full field's pace (session median lap / drivers on track between two laps)
+- Pacing: --speed 1 is real time, --speed 60 a minute per second; --rate N publishes a
+  constant N laps/s (thousands are fine); --max publishes as fast as the consumer takes them
+- Transport: an asyncio.Queue in process, or newline-delimited JSON over a local TCP socket
+  (127.0.0.1; --serve only publishes, --connect only consumes, for two-process tests)
+- Every lap is stamped when published; the consumer feeds LiveSession.add_lap and records
+  lap arrival -> updated predicted order in a log-bucketed LatencyHistogram
+Pacing runs on the event loop timer (~1 ms): laps due within one tick go out back to back,
+and how late each lap left against its schedule is kept in a separate feed-lag histogram.
+Usage: python replay_feed.py [practice_csv] [--rate 2000 | --speed 60 | --max] [--transport socket]
+       python replay_feed.py --from-cache --year 2025 --gp "Spanish Grand Prix" --speed 120
+       python replay_feed.py --serve --port 8766 --rate 1000   /   python replay_feed.py --connect 127.0.0.1:8766
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from project_paths import DEFAULT_GP, DEFAULT_YEAR, PATHS
+
+FEED_COLUMNS = ["Driver", "Team", "Session", "LapTimeSeconds"]
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766  # prediction_server.py uses 8765
+QUEUE_SIZE = 1024  # a consumer this far behind blocks the publisher (shows up as feed lag)
+
+# === Latency histogram: BUCKETS_PER_DOUBLING log buckets from 1 µs to 2^MAX_DOUBLINGS µs (~67 s) ===
+BUCKETS_PER_DOUBLING = 8  # bucket width 2^(1/8) - 1 = 9% of the latency
+MAX_DOUBLINGS = 26
+N_BUCKETS = BUCKETS_PER_DOUBLING * MAX_DOUBLINGS + 1
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Latencies in log-spaced buckets: O(1) per sample, fixed memory whatever the run length.
+    Percentiles are reported as their bucket's upper edge (at most ~9% high); min/max/mean are exact.
+    """
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    @staticmethod
+    def bucket(ns):
+        if ns < 1000:
+            return 0
+        return min(int(math.log2(ns / 1000) * BUCKETS_PER_DOUBLING) + 1, N_BUCKETS - 1)
+
+    @staticmethod
+    def upper_ns(bucket):
+        return 1000 * 2 ** (bucket / BUCKETS_PER_DOUBLING)
+
+    def record(self, ns):
+        ns = max(ns, 0)
+        self.counts[self.bucket(ns)] += 1
+        self.count += 1
+        self.total_ns += ns
+        self.max_ns = max(self.max_ns, ns)
+        self.min_ns = ns if self.min_ns is None else min(self.min_ns, ns)
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile, in ms (capped at the exact max)"""
+        if self.count == 0:
+            return math.nan
+        rank = math.ceil(p / 100 * self.count)
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.upper_ns(bucket), self.max_ns) / 1e6
+        return self.max_ns / 1e6
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ns / self.count / 1e6,
+            "min_ms": self.min_ns / 1e6,
+            **{f"p{p:g}_ms": self.percentile(p) for p in PERCENTILES},
+            "max_ms": self.max_ns / 1e6,
+        }
+
+    def to_frame(self):
+        """Non-empty buckets as (lower_ms, upper_ms, count)"""
+        rows = [(0.0 if b == 0 else self.upper_ns(b - 1) / 1e6, self.upper_ns(b) / 1e6, n)
+                for b, n in enumerate(self.counts) if n]
+        return pd.DataFrame(rows, columns=["lower_ms", "upper_ms", "count"])
+
+    def render(self, width=40):
+        """Text histogram, one line per doubling"""
+        octaves = {}
+        for bucket, n in enumerate(self.counts):
+            if n:
+                octave = max(bucket - 1, 0) // BUCKETS_PER_DOUBLING
+                octaves[octave] = octaves.get(octave, 0) + n
+        peak = max(octaves.values(), default=1)
+        lines = []
+        for octave, n in sorted(octaves.items()):
+            lo, hi = 2 ** octave / 1000, 2 ** (octave + 1) / 1000
+            lines.append(f"{lo:9.3f}-{hi:<9.3f}ms {n:8,} {'█' * max(1, round(width * n / peak))}")
+        return "\n".join(lines)
+
+
+# === Lap sources ===
+def _seconds(values):
+    from time_parsing import detect_time_format, parse_time_column
+
+    return parse_time_column(values, detect_time_format(values))
+
+
+def arrival_times(laps, clock=None):
+    """
+    Seconds from the start of the feed for every lap, sessions back to back in row order.
+    clock: the session clock at each lap's end (FastF1 'Time'), kept non-decreasing in row order;
+    without one, laps arrive session-median-lap / drivers-in-session apart, as from a full field.
+    """
+    arrivals = np.empty(len(laps))
+    sessions = laps["Session"].astype(object).to_numpy()
+    lap_times = laps["LapTimeSeconds"].to_numpy(dtype=float)
+    offset = 0.0
+    for session in pd.unique(sessions):
+        rows = np.flatnonzero(sessions == session)
+        finite = lap_times[rows][np.isfinite(lap_times[rows])]
+        gap = np.median(finite) / laps["Driver"].iloc[rows].nunique() if finite.size else 1.0
+        if clock is not None and np.isfinite(clock[rows]).any():
+            t = np.fmax.accumulate(np.where(np.isfinite(clock[rows]), clock[rows], -np.inf))
+            t = np.where(np.isfinite(t), t, np.nanmin(clock[rows]))
+            t = t - t[0]
+        else:
+            t = np.arange(len(rows)) * gap
+        arrivals[rows] = offset + t
+        offset += t[-1] + gap
+    return arrivals
+
+
+def feed_from_csv(path):
+    """
+    Practice laps in file order: preprocessed (LapTimeSeconds), raw FP laps (LapTime, with the
+    FastF1 'Time' session clock when present) or Driver/Team/Session/Time lap times
+    """
+    laps = pd.read_csv(path)
+    clock = None
+    if "LapTimeSeconds" not in laps.columns:
+        if "LapTime" in laps.columns:
+            laps["LapTimeSeconds"] = _seconds(laps["LapTime"])
+            clock = _seconds(laps["Time"]).to_numpy(dtype=float) if "Time" in laps.columns else None
+        else:
+            laps["LapTimeSeconds"] = _seconds(laps["Time"])
+    feed = laps[FEED_COLUMNS].astype({"Driver": object, "Team": object, "Session": object})
+    feed["ArrivalSeconds"] = arrival_times(laps, clock)
+    return feed
+
+
+def feed_from_cache(year=DEFAULT_YEAR, gp_name=DEFAULT_GP, sessions=None, cache_dir=None, offline=True,
+                    fixture_dir=None):
+    """Laps of cached/recorded FastF1 sessions, each session in timing-screen order (lap end time)"""
+    from fastf1_loader import CACHE_DIR, fetch_sessions
+    from race_calendar import event_config
+
+    sessions = sessions or event_config(year, gp_name)["sessions"]
+    loaded = fetch_sessions([(year, gp_name)], sessions, cache_dir=cache_dir or CACHE_DIR, offline=offline,
+                            fixture_dir=fixture_dir)
+    frames = []
+    for (_, _, session), data in loaded.items():
+        laps = data["laps"]
+        frame = pd.DataFrame({
+            "Driver": laps["Driver"].astype(object),
+            "Team": laps["Team"].astype(object),
+            "Session": session,
+            "LapTimeSeconds": _seconds(laps["LapTime"]),
+            "Clock": _seconds(laps["Time"]) if "Time" in laps.columns else np.nan,
+        })
+        frames.append(frame.sort_values("Clock", kind="stable", na_position="last"))
+    laps = pd.concat(frames, ignore_index=True)
+    feed = laps[FEED_COLUMNS].copy()
+    feed["ArrivalSeconds"] = arrival_times(laps, laps["Clock"].to_numpy(dtype=float))
+    return feed
+
+
+def schedule_ns(feed, speed=1.0, rate=None):
+    """Publish time of every lap (ns after the start): constant rate, compressed clock, or 0 (--max)"""
+    if rate is not None:
+        return np.arange(len(feed), dtype=np.int64) * int(1e9 / rate) if rate > 0 else np.zeros(len(feed), np.int64)
+    return (feed["ArrivalSeconds"].to_numpy(dtype=float) / speed * 1e9).astype(np.int64)
+
+
+def _messages(feed):
+    lap_times = [None if not math.isfinite(t) else t for t in feed["LapTimeSeconds"].to_numpy(dtype=float)]
+    return [{"seq": i, "Driver": d, "Team": t, "Session": s, "LapTimeSeconds": x}
+            for i, (d, t, s, x) in enumerate(zip(feed["Driver"], feed["Team"], feed["Session"], lap_times))]
+
+
+# === Publisher / consumer ===
+async def publish(feed, put, speed=1.0, rate=None, lag=None):
+    """
+    Send every lap at its scheduled time through `put` (a coroutine), then None.
+    Each message carries 'sent_ns' (perf_counter_ns at publish: the lap's arrival);
+    lag records how late each lap left against its schedule.
+    """
+    due = schedule_ns(feed, speed, rate)
+    messages = _messages(feed)
+    start = time.perf_counter_ns()
+    for message, due_ns in zip(messages, due.tolist()):
+        wait = start + due_ns - time.perf_counter_ns()
+        if wait > 0:
+            await asyncio.sleep(wait / 1e9)
+        now = time.perf_counter_ns()
+        if lag is not None:
+            lag.record(now - start - due_ns)
+        message["sent_ns"] = now
+        await put(message)
+    await put(None)
+
+
+def live_handler(live):
+    """Default consumer step: fold the lap into a LiveSession and return the updated order"""
+    def handle(message):
+        return live.add_lap(message["Driver"], message["Team"], message["Session"], message["LapTimeSeconds"])
+    return handle
+
+
+async def consume(get, handler, latency, every=0):
+    """Apply handler to every message until None; latency records sent -> handler returned"""
+    laps = 0
+    while True:
+        message = await get()
+        if message is None:
+            return laps
+        order = handler(message)
+        latency.record(time.perf_counter_ns() - message["sent_ns"])
+        laps += 1
+        if every and laps % every == 0:
+            print(f"⏱️  lap {laps:6d} ({message['Session']}): {' '.join(order[:5])} "
+                  f"| p99 {latency.percentile(99):.3f} ms")
+
+
+async def replay_queue(feed, handler, latency, lag, speed=1.0, rate=None, every=0, maxsize=QUEUE_SIZE):
+    queue = asyncio.Queue(maxsize=maxsize)
+    _, laps = await asyncio.gather(publish(feed, queue.put, speed, rate, lag),
+                                   consume(queue.get, handler, latency, every))
+    return laps
+
+
+async def _stream(feed, writer, speed, rate, lag):
+    async def put(message):
+        writer.write(b"\n" if message is None else json.dumps(message).encode() + b"\n")
+        await writer.drain()
+
+    try:
+        await publish(feed, put, speed, rate, lag)
+    finally:
+        writer.close()
+
+
+async def serve_feed(feed, host=DEFAULT_HOST, port=DEFAULT_PORT, speed=1.0, rate=None, lag=None, clients=None):
+    """
+    Serve the feed as NDJSON lines (an empty line ends it); every client gets the whole feed
+    from its own start. Returns after `clients` connections have been served (None: forever).
+    """
+    served = asyncio.Event()
+    done = []
+
+    async def on_client(reader, writer):
+        await _stream(feed, writer, speed, rate, lag)
+        done.append(writer)
+        if clients is not None and len(done) >= clients:
+            served.set()
+
+    server = await asyncio.start_server(on_client, host, port)
+    async with server:
+        print(f"📡 Replay feed: {len(feed):,} laps on {host}:{server.sockets[0].getsockname()[1]}")
+        if clients is None:
+            await server.serve_forever()
+        else:
+            await served.wait()
+
+
+async def consume_socket(host, port, handler, latency, every=0):
+    """Consume a serve_feed() stream (sent_ns is only comparable on the same host)"""
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def get():
+        line = await reader.readline()
+        return json.loads(line) if line.strip() else None
+
+    try:
+        return await consume(get, handler, latency, every)
+    finally:
+        writer.close()
+
+
+async def replay_socket(feed, handler, latency, lag, speed=1.0, rate=None, every=0, host=DEFAULT_HOST, port=0):
+    """Publisher and consumer in one process, over a loopback socket (port 0: any free port)"""
+    async def on_client(reader, writer):
+        await _stream(feed, writer, speed, rate, lag)
+
+    server = await asyncio.start_server(on_client, host, port)
+    async with server:
+        return await consume_socket(host, server.sockets[0].getsockname()[1], handler, latency, every)
+
+
+def run_replay(feed, live=None, handler=None, transport="queue", speed=1.0, rate=None, every=0,
+               host=DEFAULT_HOST, port=0):
+    """
+    Replay the feed into a LiveSession (or any handler(message)); returns
+    (live session, lap latency histogram, feed-lag histogram, laps consumed, wall seconds).
+    """
+    if live is None and handler is None:
+        from live_session import LiveSession
+        live = LiveSession()
+    handler = handler or live_handler(live)
+    latency, lag = LatencyHistogram(), LatencyHistogram()
+    start = time.perf_counter()
+    if transport == "queue":
+        laps = asyncio.run(replay_queue(feed, handler, latency, lag, speed, rate, every))
+    elif transport == "socket":
+        laps = asyncio.run(replay_socket(feed, handler, latency, lag, speed, rate, every, host, port))
+    else:
+        raise ValueError(f"Unknown transport {transport!r} (queue or socket)")
+    return live, latency, lag, laps, time.perf_counter() - start
+
+
+def print_report(latency, lag, laps, elapsed):
+    print(f"\n📊 {laps:,} laps in {elapsed:.2f}s ({laps / elapsed:,.0f} laps/s)")
+    for label, histogram in (("lap -> prediction", latency), ("feed lag", lag)):
+        stats = histogram.summary()
+        if stats["count"]:
+            print(f"   {label:<18} " + "  ".join(f"{key[:-3]} {value:.3f}" for key, value in stats.items()
+                                                 if key.endswith("_ms")) + " ms")
+    print(latency.render())
+
+
+def add_arguments(parser):
+    """Replay options shared by this script and `cli.py replay`"""
+    parser.add_argument("--from-cache", action="store_true", help="replay FastF1-cached sessions of --year/--gp")
+    parser.add_argument("--sessions", nargs="+", default=None, help="cached sessions (default: the event's)")
+    parser.add_argument("--cache", default=None, help="FastF1 cache directory")
+    parser.add_argument("--fixtures", default=None, help="recorded session folders (fastf1_loader fixtures)")
+    parser.add_argument("--online", action="store_true", help="let FastF1 download sessions missing from the cache")
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--speed", type=float, default=1.0, help="session clock multiplier (default: real time)")
+    pacing.add_argument("--rate", type=float, default=None, help="constant laps per second")
+    pacing.add_argument("--max", action="store_true", help="publish as fast as the consumer keeps up")
+    parser.add_argument("--transport", choices=["queue", "socket"], default="queue")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--serve", action="store_true", help="only publish the feed on --host/--port")
+    parser.add_argument("--connect", default=None, help="only consume a feed served at HOST:PORT")
+    parser.add_argument("--every", type=int, default=0, help="print the top 5 every N laps")
+    parser.add_argument("--histogram", default=None, help="save the latency histogram buckets as CSV")
+
+
+def run_from_args(args, practice_csv):
+    """Run the replay an argparse namespace describes; returns the files written"""
+    from live_session import LiveSession
+    from race_calendar import event_config
+
+    event = event_config(args.year, args.gp)
+    live = LiveSession(event)
+    rate = 0 if args.max else args.rate
+    latency, lag = LatencyHistogram(), LatencyHistogram()
+
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        start = time.perf_counter()
+        laps = asyncio.run(consume_socket(host or DEFAULT_HOST, int(port), live_handler(live), latency, args.every))
+        print_report(latency, lag, laps, time.perf_counter() - start)
+    else:
+        if args.from_cache:
+            feed = feed_from_cache(args.year, args.gp, args.sessions, args.cache, offline=not args.online,
+                                   fixture_dir=args.fixtures)
+        else:
+            feed = feed_from_csv(practice_csv)
+        if args.serve:
+            asyncio.run(serve_feed(feed, args.host, args.port, args.speed, rate, lag))
+            return []
+        print(f"🏎️  Replaying {len(feed):,} laps ({feed['ArrivalSeconds'].max() / 60:.0f} min of sessions) "
+              f"over {args.transport}")
+        live, latency, lag, laps, elapsed = run_replay(feed, live, transport=args.transport, speed=args.speed,
+                                                       rate=rate, every=args.every, host=args.host)
+        print_report(latency, lag, laps, elapsed)
+
+    print(live.standings()[["Position", "Driver", "Team", "Laps", "Best_Time"]].head(10).to_string(index=False))
+    if args.histogram:
+        latency.to_frame().to_csv(args.histogram, index=False)
+        return [args.histogram]
+    return []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay practice laps as a local live-timing feed and "
+                                                 "measure lap -> prediction latency")
+    parser.add_argument("practice_csv", nargs="?", default=PATHS["practice_preprocessed"])
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR)
+    parser.add_argument("--gp", default=DEFAULT_GP)
+    add_arguments(parser)
+    args = parser.parse_args()
+    for path in run_from_args(args, args.practice_csv):
+        print(f"📄 {path}")
@@ -1,12 +1,59 @@
+import os
+
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 import warnings
 warnings.filterwarnings('ignore')
 
+from dtype_schema import read_csv_typed
+from instrumentation import stage
+from project_paths import DEFAULT_GP, DEFAULT_YEAR, PATHS
+from race_calendar import TRACK_BONUS
+
+def expected_position_scores(best_time, driver_rating, team_strength, track_bonus, consistency, long_run_pace):
+    """
+    Deterministic (pre-noise, unclipped) position score per driver from per-driver arrays.
+    Shared by the practice-file predictor and the live session (live_session.py).
+    """
+    # Get fastest lap time as reference
+    fastest_time = np.nanmin(best_time)
+    
+    # Base score from practice times (gap to fastest), scaled to positions
+    base_position = (best_time - fastest_time) * 12
+    
+    # Driver skill adjustment
+    skill_adjustment = (9.5 - driver_rating) * 1.8
+    
+    # Team strength factor (inverted - better teams get negative adjustment)
+    team_adjustment = (1.12 - team_strength) * 12
+    
+    # Track specialist bonus (negative = better position)
+    track_adjustment = -track_bonus * 4
+    
+    # Consistency factor (more consistent = better race position)
+    # (fmax: a single-lap driver's undefined std counts as no penalty)
+    consistency_penalty = np.fmax((consistency - 0.15) * 8, 0)
+    
+    # Long run pace factor (crucial for race)
+    long_run_gap = long_run_pace - fastest_time - 0.3
+    long_run_adjustment = np.fmax(long_run_gap * 10, 0)
+    
+    # Final predicted position
+    return (1 + base_position + skill_adjustment + team_adjustment +
+            track_adjustment + consistency_penalty + long_run_adjustment)
+
+
 class RealisticSpanishGPPredictor:
-    def __init__(self):
+    def __init__(self, stats_index=None, history_seasons=None, track_bonus=None, event_name=None):
         self.model = None
+        self.event_name = event_name or f"{DEFAULT_GP} {DEFAULT_YEAR}"
+        
+        # Optional historical stats (stats_index.StatsIndex), looked up per driver/team by key
+        self.stats_index = stats_index
+        self.history_seasons = history_seasons  # (first, last) season range; None = all seasons
+        
+        # Positions that score points (P1-P10)
+        self.points_positions = 10
         
         # ACTUAL 2025 F1 driver ratings based on current grid and form
         self.driver_ratings = {
@@ -66,22 +113,18 @@ class RealisticSpanishGPPredictor:
             'Kick Sauber': 0.88,    # Back of grid
         }
         
-        # Spanish GP specific bonuses (track specialists)
-        self.spanish_gp_bonus = {
-            'VER': 0.5,   # 3 consecutive wins (2022, 2023, 2024) - HUGE bonus
-            'ALO': 0.25,  # Home race + extensive Barcelona experience
-            'HAM': 0.15,  # Won there 6 times (2014, 2017, 2018, 2019, 2020, 2021)
-            'LEC': 0.1,   # Ferrari traditionally strong at Barcelona
-            'RUS': 0.08,  # Good at technical tracks
-            'SAI': 0.12,  # Spanish driver + track knowledge
-        }
+        # Track specific bonuses (track specialists), per event in race_calendar.TRACK_BONUS
+        self.track_bonus = dict(TRACK_BONUS[DEFAULT_GP] if track_bonus is None else track_bonus)
     
     def load_data(self, practice_file):
         """Load and process practice data with 2025 grid"""
         print("📊 Loading practice data for 2025 F1 grid...")
         
         try:
-            self.practice_data = pd.read_csv(practice_file)
+            self.practice_data = read_csv_typed(practice_file)
+            if 'Time' not in self.practice_data.columns and 'LapTimeSeconds' in self.practice_data.columns:
+                # preprocessed FP file (preprocess_fpdata_for_prediction.py)
+                self.practice_data['Time'] = self.practice_data['LapTimeSeconds']
             print(f"✅ Practice data loaded: {len(self.practice_data)} rows")
         except FileNotFoundError:
             print("⚠️  Creating realistic 2025 grid sample data...")
@@ -110,13 +153,13 @@ class RealisticSpanishGPPredictor:
                 for driver, team in drivers_teams:
                     driver_rating = self.driver_ratings.get(driver, 7.0)
                     team_mult = self.team_strength.get(team, 0.95)
-                    spanish_bonus = self.spanish_gp_bonus.get(driver, 0)
+                    track_bonus = self.track_bonus.get(driver, 0)
                     
                     # Calculate realistic lap time
                     # Convert rating to time delta (10.0 - rating gives penalty)
                     time_delta = (9.7 - driver_rating) * 0.25
                     time_delta *= (2.1 - team_mult)  # Team factor
-                    time_delta -= spanish_bonus * 0.6  # Track specialist bonus
+                    time_delta -= track_bonus * 0.6  # Track specialist bonus
                     time_delta *= session_multiplier
                     
                     # Add session-specific randomness
@@ -139,114 +182,158 @@ class RealisticSpanishGPPredictor:
         return self
     
     def calculate_practice_performance(self):
-        """Calculate comprehensive practice performance metrics"""
+        """Calculate comprehensive practice performance metrics (one grouped pass)"""
         print("🔧 Analyzing practice performance for 2025 grid...")
         
-        driver_performance = {}
+        # Plain string keys: the per-driver table is tiny and must not inherit categoricals
+        laps = self.practice_data[['Driver', 'Team', 'Session', 'Time']].astype(
+            {'Driver': object, 'Team': object, 'Session': object})
+        by_driver = laps.groupby('Driver', sort=False)['Time']
         
-        for driver in self.practice_data['Driver'].unique():
-            driver_data = self.practice_data[self.practice_data['Driver'] == driver]
-            team = driver_data['Team'].iloc[0]
-            
-            # Best time across all sessions
-            best_time = driver_data['Time'].min()
-            
-            # Consistency (lower std = more consistent)
-            consistency = driver_data['Time'].std()
-            
-            # Long run pace (average excluding fastest 25%)
-            sorted_times = driver_data['Time'].sort_values()
-            long_run_times = sorted_times.iloc[int(len(sorted_times) * 0.25):]
-            long_run_pace = long_run_times.mean()
-            
-            # Session progression (improvement from FP1 to FP3)
-            fp1_times = driver_data[driver_data['Session'] == 'FP1']['Time']
-            fp3_times = driver_data[driver_data['Session'] == 'FP3']['Time']
-            
-            if len(fp1_times) > 0 and len(fp3_times) > 0:
-                progression = fp1_times.min() - fp3_times.min()
-            else:
-                progression = 0
-            
-            driver_performance[driver] = {
-                'team': team,
-                'best_time': best_time,
-                'consistency': consistency,
-                'long_run_pace': long_run_pace,
-                'progression': progression,
-                'driver_rating': self.driver_ratings.get(driver, 7.0),
-                'team_strength': self.team_strength.get(team, 0.95),
-                'spanish_bonus': self.spanish_gp_bonus.get(driver, 0)
-            }
-        
-        self.performance_data = driver_performance
-        print(f"✅ Performance calculated for {len(driver_performance)} drivers")
+        # Best time, consistency (lower std = more consistent) and team per driver
+        performance = pd.DataFrame({
+            'team': laps.groupby('Driver', sort=False)['Team'].first(),
+            'best_time': by_driver.min(),
+            'consistency': by_driver.std(),
+        })
+        
+        # Long run pace (average excluding fastest 25%): rank laps within each driver once
+        ranked = laps.sort_values(['Driver', 'Time'], kind='stable')
+        lap_rank = ranked.groupby('Driver', sort=False).cumcount()
+        lap_count = ranked.groupby('Driver', sort=False)['Time'].transform('size')
+        long_runs = ranked[lap_rank >= (lap_count * 0.25).astype(int)]
+        performance['long_run_pace'] = long_runs.groupby('Driver', sort=False)['Time'].mean()
+        
+        # Session progression (improvement from FP1 to FP3)
+        session_best = laps[laps['Session'].isin(['FP1', 'FP3'])].groupby(['Driver', 'Session'])['Time'].min().unstack()
+        session_best = session_best.reindex(index=performance.index, columns=['FP1', 'FP3'])
+        performance['progression'] = (session_best['FP1'] - session_best['FP3']).fillna(0)
+        
+        performance['driver_rating'] = performance.index.map(lambda d: self.driver_ratings.get(d, 7.0))
+        performance['team_strength'] = performance['team'].map(lambda t: self.team_strength.get(t, 0.95))
+        performance['track_bonus'] = performance.index.map(lambda d: self.track_bonus.get(d, 0))
+        
+        if self.stats_index is not None:
+            self._add_historical_stats(performance)
+        
+        self.performance_data = performance
+        print(f"✅ Performance calculated for {len(performance)} drivers")
         return self
     
+    def _historical(self, name, key):
+        if self.history_seasons is None:
+            return self.stats_index.get(name, key)
+        return self.stats_index.season_range(name, key, *self.history_seasons)[0]
+    
+    def _add_historical_stats(self, performance):
+        """Historical finish / quali / pace per driver and team median pace (point lookups, no merge)"""
+        for column, name in [('hist_avg_finish', 'AvgRaceFinish'), ('hist_avg_quali', 'AvgQualiPosition'),
+                             ('hist_avg_pace', 'DriverAvgPace')]:
+            performance[column] = [self._historical(name, driver) for driver in performance.index]
+        performance['hist_team_median_pace'] = [self._historical('TeamMedianPace', team)
+                                                for team in performance['team']]
+        return performance
+    
+    def _expected_positions(self):
+        """Deterministic (pre-noise, unclipped) position score per driver"""
+        perf = self.performance_data
+        scores = expected_position_scores(
+            perf['best_time'].to_numpy(dtype=float), perf['driver_rating'].to_numpy(dtype=float),
+            perf['team_strength'].to_numpy(dtype=float), perf['track_bonus'].to_numpy(dtype=float),
+            perf['consistency'].to_numpy(dtype=float), perf['long_run_pace'].to_numpy(dtype=float))
+        return pd.Series(scores, index=perf.index)
+    
     def predict_race_positions(self):
         """Make realistic race predictions for 2025 grid"""
-        print("🏁 Generating realistic race predictions for 2025 Spanish GP...")
+        print(f"🏁 Generating realistic race predictions for the {self.event_name}...")
         
-        predictions = []
+        perf = self.performance_data
+        predicted_pos = self._expected_positions()
         
-        # Get fastest lap time as reference
-        all_times = [perf['best_time'] for perf in self.performance_data.values()]
-        fastest_time = min(all_times)
+        # Add controlled randomness
+        predicted_pos = predicted_pos + np.random.normal(0, 0.4, len(perf))
         
-        for driver, perf in self.performance_data.items():
-            # Base score from practice times (gap to fastest)
-            time_gap = perf['best_time'] - fastest_time
-            
-            # Convert to position prediction (smaller gaps = better positions)
-            base_position = time_gap * 12  # Scale factor
-            
-            # Driver skill adjustment
-            skill_adjustment = (9.5 - perf['driver_rating']) * 1.8
-            
-            # Team strength factor (inverted - better teams get negative adjustment)
-            team_adjustment = (1.12 - perf['team_strength']) * 12
-            
-            # Spanish GP track specialist bonus (negative = better position)
-            track_adjustment = -perf['spanish_bonus'] * 4
-            
-            # Consistency factor (more consistent = better race position)
-            consistency_penalty = max(0, (perf['consistency'] - 0.15) * 8)
-            
-            # Long run pace factor (crucial for race)
-            long_run_gap = perf['long_run_pace'] - fastest_time - 0.3
-            long_run_adjustment = max(0, long_run_gap * 10)
-            
-            # Final predicted position
-            predicted_pos = (1 + base_position + skill_adjustment + team_adjustment + 
-                           track_adjustment + consistency_penalty + long_run_adjustment)
-            
-            # Add controlled randomness
-            predicted_pos += np.random.normal(0, 0.4)
-            
-            # Ensure realistic bounds
-            predicted_pos = max(1, min(20, predicted_pos))
-            
-            predictions.append({
-                'Driver': driver,
-                'Team': perf['team'],
-                'Predicted_Position': predicted_pos,
-                'Driver_Rating': perf['driver_rating'],
-                'Spanish_Bonus': perf['spanish_bonus'],
-                'Team_Strength': perf['team_strength'],
-                'Best_Time': perf['best_time']
-            })
+        # Order on the raw scores; realistic bounds only for the displayed position score
+        order = np.argsort(predicted_pos.to_numpy(), kind='stable')
+        predicted_pos = predicted_pos.clip(1, 20)
         
         # Create results dataframe and sort
-        self.results = pd.DataFrame(predictions)
-        self.results = self.results.sort_values('Predicted_Position').reset_index(drop=True)
+        self.results = pd.DataFrame({
+            'Driver': perf.index,
+            'Team': perf['team'].to_numpy(),
+            'Predicted_Position': predicted_pos.to_numpy(),
+            'Driver_Rating': perf['driver_rating'].to_numpy(),
+            'Track_Bonus': perf['track_bonus'].to_numpy(),
+            'Team_Strength': perf['team_strength'].to_numpy(),
+            'Best_Time': perf['best_time'].to_numpy(),
+        })
+        if 'hist_avg_finish' in perf.columns:
+            self.results['Hist_Avg_Finish'] = perf['hist_avg_finish'].to_numpy()
+            self.results['Hist_Avg_Quali'] = perf['hist_avg_quali'].to_numpy()
+        self.results = self.results.iloc[order].reset_index(drop=True)
         self.results['Position'] = range(1, len(self.results) + 1)
         
         return self
     
+    def simulate_race(self, n_scenarios=100_000, seed=None, chunk_size=10_000, noise_std=0.4):
+        """Monte Carlo race outcomes: win/podium/points probabilities and expected position"""
+        print(f"🎲 Simulating {n_scenarios:,} race scenarios...")
+        
+        perf = self.performance_data
+        expected = self._expected_positions().to_numpy()[:, None]
+        n_drivers = len(expected)
+        rng = np.random.default_rng(seed)
+        finishing_positions = np.arange(1, n_drivers + 1)[:, None]
+        
+        wins = np.zeros(n_drivers)
+        podiums = np.zeros(n_drivers)
+        points = np.zeros(n_drivers)
+        position_sum = np.zeros(n_drivers)
+        
+        # drivers x scenarios matrices, one chunk at a time so memory stays bounded
+        for start in range(0, n_scenarios, chunk_size):
+            n_chunk = min(chunk_size, n_scenarios - start)
+            # Ranked unclipped: clipping to 1-20 would tie every driver beyond the bounds
+            scores = expected + rng.normal(0, noise_std, size=(n_drivers, n_chunk))
+            
+            # order[k, j] = driver finishing P(k+1) in scenario j
+            order = np.argsort(scores, axis=0, kind='stable')
+            positions = np.empty_like(order)
+            np.put_along_axis(positions, order, finishing_positions, axis=0)
+            
+            wins += (positions == 1).sum(axis=1)
+            podiums += (positions <= 3).sum(axis=1)
+            points += (positions <= self.points_positions).sum(axis=1)
+            position_sum += positions.sum(axis=1)
+        
+        self.simulation = pd.DataFrame({
+            'Driver': perf.index,
+            'Team': perf['team'].to_numpy(),
+            'Win_Probability': wins / n_scenarios,
+            'Podium_Probability': podiums / n_scenarios,
+            'Points_Probability': points / n_scenarios,
+            'Expected_Position': position_sum / n_scenarios,
+        }).sort_values('Expected_Position').reset_index(drop=True)
+        
+        return self
+    
+    def display_simulation(self, top_n=10):
+        """Display Monte Carlo race probabilities"""
+        print("\n" + "="*70)
+        print(f"🎲 {self.event_name.upper()} RACE SIMULATION PROBABILITIES 🎲")
+        print("="*70)
+        print(f"{'Driver':6s} {'Team':15s} {'Win':>7s} {'Podium':>7s} {'Points':>7s} {'Exp. Pos':>9s}")
+        for _, row in self.simulation.head(top_n).iterrows():
+            team_short = row['Team'].replace(' F1 Team', '').replace(' Racing', '')
+            print(f"{row['Driver']:6s} {team_short:15s} {row['Win_Probability']:7.1%} "
+                  f"{row['Podium_Probability']:7.1%} {row['Points_Probability']:7.1%} "
+                  f"{row['Expected_Position']:9.2f}")
+        return self
+    
     def display_predictions(self):
-        """Display realistic 2025 Spanish GP predictions"""
+        """Display realistic race predictions for the event"""
         print("\n" + "="*70)
-        print("🏁 REALISTIC SPANISH GP 2025 RACE PREDICTIONS 🏁")
+        print(f"🏁 REALISTIC {self.event_name.upper()} RACE PREDICTIONS 🏁")
         print("🔧 Based on ACTUAL 2025 F1 Grid + Track History + Current Form")
         print("="*70)
         
@@ -257,7 +344,7 @@ class RealisticSpanishGPPredictor:
             driver = row['Driver']
             team = row['Team']
             rating = row['Driver_Rating']
-            bonus = row['Spanish_Bonus'] if 'Spanish_Bonus' in row else 0
+            bonus = row['Track_Bonus'] if 'Track_Bonus' in row else 0
             team_str = row['Team_Strength']
             
             medal = medals[i] if i < 3 else '🏁'
@@ -265,7 +352,7 @@ class RealisticSpanishGPPredictor:
             # Indicators for special factors
             indicators = ""
             if bonus >= 0.4:
-                indicators += "🔥"  # Verstappen's Spanish GP dominance
+                indicators += "🔥"  # Track domination (e.g. Verstappen in Spain)
             elif bonus >= 0.2:
                 indicators += "⭐"  # Significant track bonus
             elif bonus > 0:
@@ -287,13 +374,13 @@ class RealisticSpanishGPPredictor:
             print(f"{medal} P{position:2d}: {driver:3s} ({team_short:15s}) {indicators:8s}")
         
         print("\n🔍 Legend:")
-        print("🔥 = Spanish GP Domination (Verstappen - 3 wins)")
+        print("🔥 = Track Domination (e.g. Verstappen in Spain - 3 wins)")
         print("⭐ = Major Track Specialist | ✨ = Track Knowledge")
         print("💪 = Elite Team | 🔧 = Strong Team")
         print("👑 = Elite Current Driver | 🐐 = F1 Legend")
         
         # Show key insights
-        print(f"\n💡 2025 Spanish GP Insights:")
+        print(f"\n💡 {self.event_name} Insights:")
         winner = self.results.iloc[0]
         print(f"🏆 Predicted winner: {winner['Driver']} ({winner['Team']})")
         
@@ -311,23 +398,40 @@ class RealisticSpanishGPPredictor:
         
         return self
 
-def main():
-    """Run the realistic 2025 Spanish GP prediction"""
-    print("🏎️  SPANISH GP 2025 PREDICTION - ACTUAL F1 GRID")
+def main(practice_file='practice_data.csv', n_scenarios=100_000, seed=42,
+         stats_index_file=PATHS["stats_index"], output=None, track_bonus=None, event_name=None):
+    """Run the realistic 2025 prediction (the Spanish GP unless track_bonus / event_name say otherwise)"""
+    print(f"🏎️  {(event_name or f'{DEFAULT_GP} {DEFAULT_YEAR}').upper()} PREDICTION - ACTUAL F1 GRID")
     print("="*55)
     print("🔄 Updated with real 2025 driver lineup!")
     print("📋 Hamilton to Ferrari | Lawson to Red Bull | Antonelli to Mercedes")
     print("="*55)
     
     try:
-        predictor = RealisticSpanishGPPredictor()
+        stats_index = None
+        if stats_index_file and os.path.exists(stats_index_file):
+            from stats_index import StatsIndex
+            stats_index = StatsIndex.load(stats_index_file)
+            print(f"📇 Historical stats index loaded: {len(stats_index.keys('DriverAvgPace'))} drivers")
+        predictor = RealisticSpanishGPPredictor(stats_index=stats_index, track_bonus=track_bonus,
+                                                event_name=event_name)
         
         # Run prediction pipeline
-        (predictor
-         .load_data('practice_data.csv')
-         .calculate_practice_performance()
-         .predict_race_positions()
-         .display_predictions())
+        with stage("predict") as rec:
+            with stage("load"):
+                predictor.load_data(practice_file)
+            with stage("practice_performance"):
+                predictor.calculate_practice_performance()
+            with stage("predict_positions"):
+                predictor.predict_race_positions().display_predictions()
+            with stage("simulate", scenarios=n_scenarios):
+                predictor.simulate_race(n_scenarios=n_scenarios, seed=seed).display_simulation()
+            rec.rows = len(predictor.practice_data)
+            if output:
+                predictor.simulation.to_csv(output, index=False)
+                rec.wrote(output)
+                print(f"\n✅ Simulation probabilities saved to: {output}")
+        return predictor
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -335,4 +439,4 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
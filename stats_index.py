@@ -0,0 +1,362 @@
+"""
+Created on Sun Jun 22 09:41:18 2025
+
+@author: sid
+Persisted index of historical driver / team / driver-season statistics.
+- Stored as mergeable partials keyed on (Stat, Key, Year, Bin): sums + counts for
+  pace and positions, an exact 1 ms lap-time histogram per team for the median,
+  so a race weekend can be added or removed without touching the rest
+- DriverAvgPace, TeamMedianPace, AvgRaceFinish and AvgQualiPosition are served by key:
+  point lookups are dict hits, season ranges use per-key cumulative sums over the years
+- attach() writes the looked-up values onto a lap table (no merge / groupby)
+Usage: python stats_index.py [index.parquet] [DRIVER [FIRST LAST]]
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# FastF1 lap times are millisecond-exact, so a 1 ms histogram gives the exact median
+HISTOGRAM_BINS_PER_SECOND = 1000
+# Pace sums are kept in integer microseconds so add/subtract never drifts
+PACE_SUM_UNITS_PER_SECOND = 1_000_000
+
+PARTIAL_KEYS = ["Stat", "Key", "Year", "Bin"]
+PARTIAL_COLUMNS = PARTIAL_KEYS + ["Sum", "Count"]
+
+# Feature name -> (partial stat, key column, one value per season?)
+INDEXED_FEATURES = {
+    "DriverAvgPace": ("pace", "Driver", False),
+    "TeamMedianPace": ("team_hist", "Team", False),
+    "AvgRaceFinish": ("race", "Driver", True),
+    "AvgQualiPosition": ("quali", "Driver", True),
+}
+SUM_STATS = {"pace": PACE_SUM_UNITS_PER_SECOND, "race": 1, "quali": 1}
+
+
+# === Partials ===
+def _empty_partials():
+    return pd.DataFrame(columns=PARTIAL_COLUMNS)
+
+
+def _sum_count_frame(stat, grouped, year):
+    sums = grouped.sum()
+    return pd.DataFrame({
+        "Stat": stat, "Key": sums.index, "Year": year, "Bin": -1,
+        "Sum": sums.to_numpy(), "Count": grouped.size().reindex(sums.index).to_numpy(),
+    })
+
+
+def _typed(frames):
+    if not frames:
+        return _empty_partials()
+    partials = pd.concat(frames, ignore_index=True)[PARTIAL_COLUMNS]
+    return partials.astype({"Year": np.int64, "Bin": np.int64, "Sum": np.float64, "Count": np.int64})
+
+
+def session_partials(laps_df, race_df, quali_df, year):
+    """Mergeable per-folder contributions to the global aggregates"""
+    frames = []
+    laps = laps_df.dropna(subset=["LapTimeSeconds"])
+
+    pace = laps.dropna(subset=["Driver"])
+    if not pace.empty:
+        micros = np.round(pace["LapTimeSeconds"].to_numpy() * PACE_SUM_UNITS_PER_SECOND)
+        grouped = pd.Series(micros).groupby(pace["Driver"].to_numpy())
+        frames.append(_sum_count_frame("pace", grouped, year))
+
+    teams = laps.dropna(subset=["Team"])
+    if not teams.empty:
+        bins = np.round(teams["LapTimeSeconds"].to_numpy() * HISTOGRAM_BINS_PER_SECOND).astype(np.int64)
+        hist = pd.DataFrame({"Key": teams["Team"].to_numpy(), "Bin": bins}).value_counts().reset_index(name="Count")
+        hist["Stat"] = "team_hist"
+        hist["Year"] = year
+        hist["Sum"] = 0.0
+        frames.append(hist)
+
+    for stat, positions, column in [("race", race_df, "FinalRacePosition"), ("quali", quali_df, "FinalQualiPosition")]:
+        if positions is None:
+            continue
+        values = pd.to_numeric(positions[column], errors="coerce")
+        valid = values.notna() & positions["Driver"].notna()
+        grouped = values[valid].groupby(positions.loc[valid, "Driver"].to_numpy(dtype=object))
+        frames.append(_sum_count_frame(stat, grouped, year))
+
+    return _typed(frames)
+
+
+def lap_partials(df):
+    """
+    Partials for an assembled multi-season lap table (Year column, as in final_features).
+    Positions are read from the FinalRacePosition / FinalQualiPosition merged onto the laps,
+    once per (SessionFolder, Driver).
+    """
+    laps = df[df["LapTimeSeconds"].notna()]
+    drivers = laps["Driver"].to_numpy(dtype=object)
+    teams = laps["Team"].to_numpy(dtype=object)
+    years = laps["Year"].to_numpy(dtype=np.int64)
+    seconds = laps["LapTimeSeconds"].to_numpy(dtype=np.float64)
+    frames = []
+
+    keyed = pd.DataFrame({"Key": drivers, "Year": years,
+                          "Sum": np.round(seconds * PACE_SUM_UNITS_PER_SECOND)}).dropna(subset=["Key"])
+    pace = keyed.groupby(["Key", "Year"], sort=False)["Sum"].agg(["sum", "size"]).reset_index()
+    frames.append(pd.DataFrame({"Stat": "pace", "Key": pace["Key"], "Year": pace["Year"], "Bin": -1,
+                                "Sum": pace["sum"], "Count": pace["size"]}))
+
+    hist = pd.DataFrame({"Key": teams, "Year": years,
+                         "Bin": np.round(seconds * HISTOGRAM_BINS_PER_SECOND).astype(np.int64)})
+    hist = hist.dropna(subset=["Key"]).value_counts().reset_index(name="Count")
+    hist["Stat"] = "team_hist"
+    hist["Sum"] = 0.0
+    frames.append(hist)
+
+    for stat, column in [("race", "FinalRacePosition"), ("quali", "FinalQualiPosition")]:
+        if column not in laps.columns or "SessionFolder" not in laps.columns:
+            continue
+        values = pd.to_numeric(laps[column], errors="coerce")
+        valid = values.notna() & laps["Driver"].notna()
+        positions = laps.loc[valid, ["SessionFolder", "Driver", "Year"]].assign(Position=values[valid])
+        positions = positions.astype({"SessionFolder": object, "Driver": object}).drop_duplicates(
+            ["SessionFolder", "Driver"])
+        if positions.empty:
+            continue
+        grouped = positions["Position"].groupby([positions["Driver"], positions["Year"].astype(np.int64)])
+        sums = grouped.sum()
+        frames.append(pd.DataFrame({
+            "Stat": stat, "Key": sums.index.get_level_values(0), "Year": sums.index.get_level_values(1),
+            "Bin": -1, "Sum": sums.to_numpy(), "Count": grouped.count().reindex(sums.index).to_numpy(),
+        }))
+
+    return _typed([frame for frame in frames if not frame.empty])
+
+
+def merge_partials(totals, add=None, subtract=None):
+    """totals + add - subtract, keyed on (Stat, Key, Year, Bin)"""
+    frames = [totals]
+    if add is not None:
+        frames.append(add)
+    if subtract is not None:
+        negated = subtract.copy()
+        negated["Sum"] = -negated["Sum"]
+        negated["Count"] = -negated["Count"]
+        frames.append(negated)
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return _empty_partials()
+    merged = pd.concat(frames, ignore_index=True).groupby(PARTIAL_KEYS, as_index=False)[["Sum", "Count"]].sum()
+    return merged[merged["Count"] > 0].reset_index(drop=True)
+
+
+def _sorted_histogram_median(bins, cumulative):
+    """Median of a histogram given its sorted bins and cumulative counts"""
+    total = cumulative[-1]
+    if total <= 0:
+        return np.nan
+    upper = bins[np.searchsorted(cumulative, total // 2, side="right")]
+    if total % 2:
+        return upper / HISTOGRAM_BINS_PER_SECOND
+    lower = bins[np.searchsorted(cumulative, total // 2 - 1, side="right")]
+    return (lower + upper) / 2 / HISTOGRAM_BINS_PER_SECOND
+
+
+def histogram_median(bins, counts):
+    """Exact median of a (bin, count) histogram, averaging the middle pair for even totals"""
+    order = np.argsort(bins)
+    return _sorted_histogram_median(bins[order], np.cumsum(counts[order]))
+
+
+# === Index ===
+class StatsIndex:
+    """
+    Keyed lookups over a partials table.
+    get() / count() are O(1) for one key (all seasons, or one season); season_range()
+    is a bisect on the key's years plus a difference of cumulative sums (medians add one
+    pass over the team's sorted bins); lookup() / attach() serve whole columns.
+    """
+
+    def __init__(self, partials=None):
+        partials = _empty_partials() if partials is None else partials
+        self.partials = partials.astype({"Key": object}) if not partials.empty else partials
+        self._points = {name: {} for name in INDEXED_FEATURES}   # name -> {key: (value, count)}
+        self._seasons = {name: {} for name in INDEXED_FEATURES}  # name -> {(key, year): (value, count)}
+        self._ranges = {name: {} for name in INDEXED_FEATURES}   # name -> {key: per-year arrays}
+        self._series = {}
+        for name, (stat, _, _) in INDEXED_FEATURES.items():
+            rows = self.partials[self.partials["Stat"] == stat] if not self.partials.empty else self.partials
+            if rows.empty:
+                continue
+            if stat in SUM_STATS:
+                self._build_sums(name, rows, SUM_STATS[stat])
+            else:
+                self._build_histograms(name, rows)
+
+    # --- construction ---
+    @staticmethod
+    def _key_slices(keys):
+        """(key, slice) runs of a key-sorted array"""
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(keys)]
+        return [(keys[start], slice(start, end)) for start, end in zip(starts, ends)]
+
+    def _build_sums(self, name, rows, scale):
+        totals = rows.groupby(["Key", "Year"])[["Sum", "Count"]].sum().reset_index()
+        keys = totals["Key"].to_numpy(dtype=object)
+        years = totals["Year"].to_numpy(dtype=np.int64)
+        sums = totals["Sum"].to_numpy(dtype=np.float64) / scale
+        counts = totals["Count"].to_numpy(dtype=np.int64)
+
+        seasons = self._seasons[name]
+        for key, year, total, count in zip(keys, years.tolist(), sums.tolist(), counts.tolist()):
+            seasons[(key, year)] = (total / count, count)
+        for key, rows_of_key in self._key_slices(keys):
+            cum_sum = np.r_[0.0, np.cumsum(sums[rows_of_key])]
+            cum_count = np.r_[0, np.cumsum(counts[rows_of_key])]
+            self._ranges[name][key] = (years[rows_of_key], cum_sum, cum_count)
+            self._points[name][key] = (float(cum_sum[-1] / cum_count[-1]), int(cum_count[-1]))
+
+    def _build_histograms(self, name, rows):
+        totals = rows.groupby(["Key", "Year", "Bin"])["Count"].sum().reset_index()
+        keys = totals["Key"].to_numpy(dtype=object)
+        for key, rows_of_key in self._key_slices(keys):
+            years, year_idx = np.unique(totals["Year"].to_numpy(dtype=np.int64)[rows_of_key], return_inverse=True)
+            bins, bin_idx = np.unique(totals["Bin"].to_numpy(dtype=np.int64)[rows_of_key], return_inverse=True)
+            per_year = np.zeros((len(years), len(bins)), dtype=np.int64)
+            np.add.at(per_year, (year_idx, bin_idx), totals["Count"].to_numpy(dtype=np.int64)[rows_of_key])
+            # cum_counts[i] = histogram of the first i seasons
+            cum_counts = np.vstack([np.zeros(len(bins), dtype=np.int64), np.cumsum(per_year, axis=0)])
+            self._ranges[name][key] = (years, bins, cum_counts)
+
+            for i, year in enumerate(years.tolist()):
+                counts = per_year[i]
+                self._seasons[name][(key, year)] = (_sorted_histogram_median(bins, np.cumsum(counts)),
+                                                    int(counts.sum()))
+            total = cum_counts[-1]
+            self._points[name][key] = (_sorted_histogram_median(bins, np.cumsum(total)), int(total.sum()))
+
+    @classmethod
+    def from_laps(cls, df):
+        return cls(lap_partials(df))
+
+    @classmethod
+    def load(cls, path):
+        from columnar_store import read_table
+
+        return cls(read_table(path))
+
+    def save(self, path):
+        from columnar_store import write_table
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        write_table(self.partials if not self.partials.empty else _empty_partials(), path)
+        return path
+
+    def merge(self, add=None, subtract=None):
+        """New index with partials added / removed (e.g. one race weekend)"""
+        return StatsIndex(merge_partials(self.partials, add=add, subtract=subtract))
+
+    # --- lookups ---
+    def _entry(self, name, key, season):
+        if season is None:
+            return self._points[name].get(key)
+        return self._seasons[name].get((key, int(season)))
+
+    def get(self, name, key, season=None, default=np.nan):
+        """Value of one statistic for one driver/team, over all seasons or a single one"""
+        entry = self._entry(name, key, season)
+        return default if entry is None else entry[0]
+
+    def count(self, name, key, season=None):
+        """Laps (pace / team stats) or results (position stats) behind a value"""
+        entry = self._entry(name, key, season)
+        return 0 if entry is None else entry[1]
+
+    def keys(self, name):
+        return list(self._points[name])
+
+    def seasons(self, name, key):
+        entry = self._ranges[name].get(key)
+        return [] if entry is None else entry[0].tolist()
+
+    def season_range(self, name, key, first, last):
+        """(value, count) over seasons first..last inclusive; (nan, 0) without data"""
+        entry = self._ranges[name].get(key)
+        if entry is None:
+            return np.nan, 0
+        years = entry[0]
+        lo = int(np.searchsorted(years, first, side="left"))
+        hi = int(np.searchsorted(years, last, side="right"))
+        if hi <= lo:
+            return np.nan, 0
+        if INDEXED_FEATURES[name][0] in SUM_STATS:
+            _, cum_sum, cum_count = entry
+            count = int(cum_count[hi] - cum_count[lo])
+            return float((cum_sum[hi] - cum_sum[lo]) / count), count
+        _, bins, cum_counts = entry
+        counts = cum_counts[hi] - cum_counts[lo]
+        return _sorted_histogram_median(bins, np.cumsum(counts)), int(counts.sum())
+
+    def _lookup_series(self, name, per_season):
+        cache_key = (name, per_season)
+        if cache_key not in self._series:
+            source = self._seasons[name] if per_season else self._points[name]
+            index = pd.MultiIndex.from_tuples(list(source)) if per_season and source else list(source)
+            self._series[cache_key] = pd.Series([value for value, _ in source.values()], index=index,
+                                                dtype=np.float64)
+        return self._series[cache_key]
+
+    def lookup(self, name, keys, seasons=None):
+        """Values for an array of keys (and seasons); NaN where the index has no entry"""
+        keys = np.asarray(keys, dtype=object)
+        if seasons is None:
+            return self._lookup_series(name, False).reindex(keys).to_numpy()
+        wanted = pd.MultiIndex.from_arrays([keys, np.asarray(seasons, dtype=np.int64)])
+        return self._lookup_series(name, True).reindex(wanted).to_numpy()
+
+    def attach(self, df, names=None):
+        """
+        Write the indexed features onto a lap table in place, keyed on its Driver / Team
+        (and Year for the per-season ones). Features without any data are left untouched.
+        Returns df for chaining.
+        """
+        for name in names or INDEXED_FEATURES:
+            if not self._points[name]:
+                continue
+            _, key_column, per_season = INDEXED_FEATURES[name]
+            # Plain object keys so categorical columns do not leak into the values
+            keys = df[key_column].to_numpy(dtype=object)
+            seasons = df["Year"].to_numpy(dtype=np.int64) if per_season else None
+            df[name] = self.lookup(name, keys, seasons)
+        return df
+
+    def table(self):
+        """Driver / team / driver-season statistics with their counts, one row per key"""
+        rows = []
+        for name, (_, key_column, _) in INDEXED_FEATURES.items():
+            for key, (value, count) in self._points[name].items():
+                rows.append({"Level": key_column.lower(), "Stat": name, "Key": key, "Year": -1,
+                             "Value": value, "Count": count})
+            for (key, year), (value, count) in self._seasons[name].items():
+                rows.append({"Level": f"{key_column.lower()}_season", "Stat": name, "Key": key, "Year": year,
+                             "Value": value, "Count": count})
+        return pd.DataFrame(rows, columns=["Level", "Stat", "Key", "Year", "Value", "Count"])
+
+
+if __name__ == "__main__":
+    from project_paths import PATHS
+
+    index_path = sys.argv[1] if len(sys.argv) > 1 else PATHS["stats_index"]
+    if not os.path.exists(index_path):
+        sys.exit(f"❌ No stats index at {index_path} (run feature_engineering.py or incremental_store.py)")
+    index = StatsIndex.load(index_path)
+    if len(sys.argv) > 2:
+        driver = sys.argv[2]
+        first, last = (int(sys.argv[3]), int(sys.argv[4])) if len(sys.argv) > 4 else (-np.inf, np.inf)
+        for name in ["DriverAvgPace", "AvgRaceFinish", "AvgQualiPosition"]:
+            value, count = index.season_range(name, driver, first, last)
+            print(f"{driver} {name:18s} {value:9.3f}  ({count} samples)")
+    else:
+        summary = index.table()
+        print(summary[summary["Year"] == -1].to_string(index=False))
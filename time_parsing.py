@@ -0,0 +1,111 @@
+"""
+Created on Sat Jun  7 10:12:40 2025
+
+@author: sid
+Vectorized lap/sector time parsing.
+- Detects the time format once per column instead of once per value
+- Converts whole columns with pandas/NumPy bulk operations
+- Handles Timedelta strings ('0 days 00:01:16.802000'), 'M:SS.sss' and plain seconds
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+SECTOR_TIME_COLUMNS = ["Sector1Time", "Sector2Time", "Sector3Time"]
+
+# Formats returned by detect_time_format
+FORMAT_NUMERIC = "numeric"
+FORMAT_TIMEDELTA = "timedelta"
+FORMAT_CLOCK = "clock"
+FORMAT_EMPTY = "empty"
+
+_TIMEDELTA_RE = re.compile(r"^\s*(-?\d+\s+days?\s+)?\d{1,2}:\d{2}:\d{2}(\.\d+)?\s*$")
+_CLOCK_RE = re.compile(r"^\s*\d+:\d{1,2}(\.\d+)?\s*$")
+_NUMERIC_RE = re.compile(r"^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$")
+
+
+def detect_time_format(series, sample_size=200):
+    """Detect the time format of a column from a sample of its non-null values"""
+    if pd.api.types.is_timedelta64_dtype(series):
+        return FORMAT_TIMEDELTA
+    if pd.api.types.is_numeric_dtype(series):
+        return FORMAT_NUMERIC
+
+    sample = series.dropna()
+    if sample.empty:
+        return FORMAT_EMPTY
+    sample = sample.iloc[:sample_size].astype(str)
+
+    # Majority vote so a few malformed values do not flip the whole column
+    votes = {FORMAT_TIMEDELTA: 0, FORMAT_CLOCK: 0, FORMAT_NUMERIC: 0}
+    for value in sample:
+        if _TIMEDELTA_RE.match(value):
+            votes[FORMAT_TIMEDELTA] += 1
+        elif _CLOCK_RE.match(value):
+            votes[FORMAT_CLOCK] += 1
+        elif _NUMERIC_RE.match(value):
+            votes[FORMAT_NUMERIC] += 1
+    return max(votes, key=votes.get)
+
+
+def _parse_numeric(values):
+    return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+def _parse_timedelta(values):
+    return pd.to_timedelta(values, errors="coerce").dt.total_seconds()
+
+
+def _parse_clock(values):
+    parts = values.astype(str).str.strip().str.split(":", n=1, expand=True)
+    if parts.shape[1] < 2:
+        return pd.Series(np.nan, index=values.index)
+    minutes = pd.to_numeric(parts[0], errors="coerce")
+    seconds = pd.to_numeric(parts[1], errors="coerce")
+    return minutes * 60 + seconds
+
+
+_PARSERS = {
+    FORMAT_NUMERIC: _parse_numeric,
+    FORMAT_TIMEDELTA: _parse_timedelta,
+    FORMAT_CLOCK: _parse_clock,
+}
+
+
+def parse_time_column(series, time_format=None):
+    """Convert a whole column of lap/sector times to float seconds"""
+    if pd.api.types.is_timedelta64_dtype(series):
+        return series.dt.total_seconds()
+
+    if time_format is None:
+        time_format = detect_time_format(series)
+    if time_format == FORMAT_EMPTY:
+        return pd.Series(np.nan, index=series.index, dtype="float64")
+
+    seconds = _PARSERS[time_format](series)
+
+    # Mixed columns: retry the leftovers with the other parsers (still bulk)
+    leftover = seconds.isna() & series.notna()
+    for fallback_format, parser in _PARSERS.items():
+        if not leftover.any():
+            break
+        if fallback_format == time_format:
+            continue
+        retried = parser(series[leftover])
+        seconds.loc[leftover] = retried
+        leftover = seconds.isna() & series.notna()
+
+    return seconds.astype("float64")
+
+
+def parse_sector_times(df, columns=SECTOR_TIME_COLUMNS, suffix="Seconds", drop_original=True):
+    """Add '<SectorNTime>Seconds' columns for every sector time column present"""
+    for col in columns:
+        if col not in df.columns:
+            continue
+        df[f"{col}{suffix}"] = parse_time_column(df[col])
+        if drop_original:
+            df.drop(columns=[col], inplace=True)
+    return df
@@ -3,76 +3,142 @@ Created on Sat May 31 10:55:14 2025
 
 @author: sid
 Train and compare multiple regression models to predict final race position.
+Models are compared with cross-validation grouped by SessionFolder (see model_comparison.py).
+A family tuned by hyperparameter_search.py (race_model_best_config.json in the model
+directory) is compared and refit with its tuned parameters.
 """
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error
-from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
 from sklearn.impute import SimpleImputer
-import xgboost as xgb
+import glob
 import joblib
 import os
 
-# === Paths ===
-DATA_PATH = "/Users/sid/Downloads/Spanish_GP_2025/clean_data/final_features_cleaned.csv"
-MODEL_OUTPUT_DIR = "/Users/sid/Downloads/Spanish_GP_2025"
-os.makedirs(MODEL_OUTPUT_DIR, exist_ok=True)
+from columnar_store import numeric_columns, read_table
+from instrumentation import stage
+from model_comparison import candidate_models, compare_models, core_budget, read_best_config, summarize
+from project_paths import BEST_CONFIG_FILE, MODEL_DIR, PATHS
+from tree_export import export_model, verify_export
 
-# === Load Data ===
-df = pd.read_csv(DATA_PATH)
+# === Paths ===
+DATA_PATH = PATHS["features"]
+MODEL_OUTPUT_DIR = MODEL_DIR
 
-# === Filter only Race Sessions ===
-df = df[df["SessionType"].str.lower() == "race"]
-df = df.dropna(subset=["FinalRacePosition"])
-df["FinalRacePosition"] = pd.to_numeric(df["FinalRacePosition"], errors="coerce")
-y = df["FinalRacePosition"]
+# === Cross-validation ===
+CV_FOLDS = 5
+CV_GROUP_COLUMN = "SessionFolder"  # None = plain shuffled KFold
+CV_WORKERS = None  # None = one worker per core
+EXPORT_CHECK_ROWS = 10_000  # rows the exported ensemble is checked against the model on
 
 # === Drop unnecessary columns ===
 drop_cols = [
     "FinalRacePosition", "FinalQualiPosition", "Position", "DriverNumber",
-    "LapTime", "Date", "Time", "SessionFolder", "DriverHeadshotUrl", "TeamColor", 
+    "LapTime", "Date", "Time", "SessionFolder", "DriverHeadshotUrl", "TeamColor",
     "Driver", "Team", "Compound", "TrackStatus", "Time", "Q1", "Q2", "Q3"
 ]
-X = df.drop(columns=[col for col in drop_cols if col in df.columns], errors="ignore")
-X = X.select_dtypes(include=[np.number])
-
-# === Save feature list for future predictions ===
-feature_list = X.columns.tolist()
-with open(os.path.join(MODEL_OUTPUT_DIR, "race_model_features.txt"), "w") as f:
-    for col in feature_list:
-        f.write(f"{col}\n")
-
-# === Handle NaNs ===
-imputer = SimpleImputer(strategy='median')
-X_imputed = imputer.fit_transform(X)
-
-# === Train/Test Split ===
-X_train, X_test, y_train, y_test = train_test_split(X_imputed, y, test_size=0.2, random_state=42)
-
-# === Models to compare ===
-models = {
-    "GradientBoosting": GradientBoostingRegressor(n_estimators=300, learning_rate=0.05, max_depth=5, random_state=42),
-    "RandomForest": RandomForestRegressor(n_estimators=200, max_depth=10, random_state=42),
-    "XGBoost": xgb.XGBRegressor(n_estimators=300, learning_rate=0.05, max_depth=5, objective='reg:squarederror', random_state=42)
-}
-
-# === Train and Evaluate ===
-results = {}
-for name, model in models.items():
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
-    mae = mean_absolute_error(y_test, preds)
-    results[name] = mae
-    print(f"📊 {name} MAE: {mae:.3f}")
-
-# === Save Best Model ===
-best_model_name = min(results, key=results.get)
-best_model = models[best_model_name]
-model_path = os.path.join(MODEL_OUTPUT_DIR, f"best_race_model_{best_model_name}.pkl")
-joblib.dump(best_model, model_path)
-
-print(f"\n✅ Best Model: {best_model_name} (MAE: {results[best_model_name]:.3f})")
-print(f"📁 Model saved to: {model_path}")
-print(f"📄 Feature list saved to: race_model_features.txt")
\ No newline at end of file
+
+
+def load_training_data(path):
+    """Race-session feature matrix, target and CV groups"""
+    # === Load Data (only the numeric candidates + target/filter columns) ===
+    load_cols = ["SessionType", "FinalRacePosition", CV_GROUP_COLUMN] + [
+        col for col in numeric_columns(path) if col not in drop_cols
+    ]
+    df = read_table(path, columns=[col for col in load_cols if col])
+
+    # === Filter only Race Sessions ===
+    df = df[df["SessionType"].str.lower() == "race"]
+    df = df.dropna(subset=["FinalRacePosition"])
+    df["FinalRacePosition"] = pd.to_numeric(df["FinalRacePosition"], errors="coerce")
+    y = df["FinalRacePosition"]
+    groups = df[CV_GROUP_COLUMN].to_numpy() if CV_GROUP_COLUMN else None
+
+    X = df.drop(columns=[col for col in drop_cols if col in df.columns], errors="ignore")
+    X = X.select_dtypes(include=[np.number])
+    return X, y, groups
+
+
+def train_race_model(data_path=DATA_PATH, model_dir=MODEL_OUTPUT_DIR, cv_folds=CV_FOLDS, cv_workers=CV_WORKERS):
+    """
+    Compare the candidate models with grouped CV, refit the best one on all race laps
+    and save it with its feature list and imputer. Returns the paths written.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    with stage("train") as train_rec:
+        with stage("load") as rec:
+            rec.read(data_path)
+            X, y, groups = load_training_data(data_path)
+            rec.rows = len(X)
+        train_rec.rows = len(X)
+
+        # === Save feature list for future predictions ===
+        feature_list = X.columns.tolist()
+        features_path = os.path.join(model_dir, "race_model_features.txt")
+        with open(features_path, "w") as f:
+            for col in feature_list:
+                f.write(f"{col}\n")
+
+        # === Handle NaNs (once, shared by every fold) ===
+        with stage("impute"):
+            imputer = SimpleImputer(strategy='median')
+            X_imputed = imputer.fit_transform(X)
+            imputer_path = os.path.join(model_dir, "imputer.pkl")
+            joblib.dump(imputer, imputer_path)
+        # SimpleImputer drops all-NaN columns, so the model sees only the kept ones
+        model_features = [col for col, median in zip(feature_list, imputer.statistics_) if not np.isnan(median)]
+
+        # Tuned parameters only when they were searched on this feature list and table
+        tuned = read_best_config(os.path.join(model_dir, BEST_CONFIG_FILE), features=model_features,
+                                 data=(X_imputed, y.to_numpy(), groups))
+        for name, params in tuned.items():
+            print(f"🎛️ Tuned {name}: {params}")
+
+        # === Cross-validated comparison ===
+        with stage("cross_validation", folds=cv_folds) as rec:
+            cv_results = compare_models(X_imputed, y.to_numpy(), groups=groups, n_splits=cv_folds, n_jobs=cv_workers,
+                                        params=tuned)
+            cv_path = os.path.join(model_dir, "model_comparison_cv.csv")
+            cv_results.to_csv(cv_path, index=False)
+            rec.rows = len(cv_results)
+            rec.wrote(cv_path)
+
+        print("\n📋 Per-fold results:")
+        print(cv_results.round(3).to_string(index=False))
+        summary = summarize(cv_results)
+        print("\n📋 Per-model summary:")
+        print(summary.round(3).to_string())
+
+        # === Refit and Save Best Model on all race laps ===
+        best_model_name = summary.index[0]
+        with stage("refit", model=best_model_name) as rec:
+            best_model = candidate_models(n_jobs=core_budget(1)[1], params=tuned)[best_model_name]
+            best_model.fit(X_imputed, y)
+            # Only one best model per directory, so the server/pipeline never pick a stale one
+            for stale in glob.glob(os.path.join(model_dir, "best_race_model_*.pkl")) + \
+                    glob.glob(os.path.join(model_dir, "best_race_model_*.trees")):
+                os.remove(stale)
+            model_path = os.path.join(model_dir, f"best_race_model_{best_model_name}.pkl")
+            joblib.dump(best_model, model_path)
+            rec.rows = len(X_imputed)
+            rec.wrote(model_path)
+
+        # === Array export for fast loading / batch inference (tree_export.py) ===
+        with stage("export") as rec:
+            trees_path = os.path.splitext(model_path)[0] + ".trees"
+            ensemble = export_model(best_model, trees_path, feature_names=model_features)
+            verify_export(best_model, ensemble, X_imputed[:EXPORT_CHECK_ROWS])
+            rec.wrote(trees_path)
+        outputs = [features_path, imputer_path, cv_path, model_path, trees_path]
+        train_rec.wrote(*outputs)
+
+    print(f"\n✅ Best Model: {best_model_name} (CV MAE: {summary.loc[best_model_name, 'MAE']:.3f})")
+    print(f"📁 Model saved to: {model_path}")
+    print(f"📁 Array export saved to: {trees_path}")
+    print(f"📄 Feature list saved to: race_model_features.txt")
+    print(f"📄 CV timings and MAE saved to: {cv_path}")
+    return outputs
+
+
+if __name__ == "__main__":
+    train_race_model()
@@ -0,0 +1,298 @@
+"""
+Created on Tue Jun 24 09:08:43 2025
+
+@author: sid
+Array-backed export of the tree ensembles (GradientBoosting, RandomForest, XGBoost).
+- Every tree is flattened into shared contiguous node arrays: feature, threshold,
+  interleaved (left, right) children, leaf value and the default direction for missing values
+- Leaves point to themselves, so all trees are walked together for max_depth steps
+  with NumPy gathers; predictions are base + sum of the reached leaf values
+  (GB leaves carry the learning rate, RF leaves are pre-divided by the tree count)
+- One .trees file: magic, JSON header, then 64-byte aligned raw arrays that are
+  memory-mapped on load (no unpickling, no sklearn/xgboost import)
+Usage: python tree_export.py best_race_model_XGBoost.pkl [out.trees]
+"""
+
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+MAGIC = b"F1TREES1"
+ALIGNMENT = 64
+CHUNK_ROWS = 256  # rows walked together; keeps the (rows x trees) index matrix in cache
+# XGBoost sums leaves in float32, the export in float64
+RTOL = 1e-5
+ATOL = 1e-4
+
+NODE_ARRAYS = ["feature", "threshold", "children", "value", "default_left"]
+
+
+# === Flattening ===
+def _tree_depth(left, right, root):
+    depth, frontier = 0, [root]
+    while True:
+        frontier = [child for node in frontier for child in (left[node], right[node]) if child != node]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def _pack(trees, base_score, strict, kind, n_features, feature_names=None):
+    """Concatenate per-tree node arrays (local child ids) into one node table"""
+    arrays = {name: [] for name in NODE_ARRAYS}
+    roots, offset, max_depth = [], 0, 0
+    for tree in trees:
+        n = len(tree["left"])
+        is_leaf = tree["left"] < 0
+        local = np.arange(n)
+        left = np.where(is_leaf, local, tree["left"])
+        right = np.where(is_leaf, local, tree["right"])
+        max_depth = max(max_depth, _tree_depth(left, right, 0))
+
+        arrays["feature"].append(np.where(is_leaf, 0, tree["feature"]).astype(np.int32))
+        arrays["threshold"].append(np.where(is_leaf, np.inf, tree["threshold"]).astype(np.float64))
+        # children[2 * node] = left, children[2 * node + 1] = right
+        arrays["children"].append(np.column_stack([left, right]).ravel().astype(np.int32) + offset)
+        arrays["value"].append(np.where(is_leaf, tree["value"], 0.0).astype(np.float64))
+        arrays["default_left"].append((is_leaf | tree["default_left"].astype(bool)).astype(np.uint8))
+        roots.append(offset)
+        offset += n
+
+    packed = {name: np.concatenate(parts) for name, parts in arrays.items()}
+    packed["roots"] = np.asarray(roots, dtype=np.int32)
+    meta = {
+        "kind": kind, "n_trees": len(roots), "n_nodes": offset, "n_features": int(n_features),
+        "max_depth": int(max_depth), "base_score": float(base_score), "strict": bool(strict),
+        "feature_names": list(feature_names) if feature_names is not None else None,
+    }
+    return packed, meta
+
+
+def _sklearn_tree(estimator, scale):
+    tree = estimator.tree_
+    missing_left = getattr(tree, "missing_go_to_left", None)
+    return {
+        "left": tree.children_left, "right": tree.children_right,
+        "feature": tree.feature, "threshold": tree.threshold,
+        "value": tree.value[:, 0, 0] * scale,
+        "default_left": missing_left if missing_left is not None else np.zeros(tree.node_count, dtype=np.uint8),
+    }
+
+
+def flatten_gradient_boosting(model):
+    init = model.init_
+    if isinstance(init, str) and init == "zero":
+        base_score = 0.0
+    elif hasattr(init, "constant_"):
+        base_score = float(np.ravel(init.constant_)[0])
+    else:
+        raise ValueError(f"Unsupported GradientBoosting init estimator: {type(init).__name__}")
+    trees = [_sklearn_tree(stage_trees[0], model.learning_rate) for stage_trees in model.estimators_]
+    return trees, base_score, False
+
+
+def flatten_random_forest(model):
+    scale = 1.0 / len(model.estimators_)
+    return [_sklearn_tree(tree, scale) for tree in model.estimators_], 0.0, False
+
+
+def flatten_xgboost(model):
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    config = json.loads(bytes(booster.save_raw(raw_format="json")))["learner"]
+    objective = config["objective"]["name"]
+    if objective not in ("reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"):
+        raise ValueError(f"Unsupported XGBoost objective {objective} (identity link only)")
+    if config["gradient_booster"]["name"] != "gbtree":
+        raise ValueError(f"Unsupported XGBoost booster {config['gradient_booster']['name']}")
+    raw_trees = config["gradient_booster"]["model"]["trees"]
+
+    # The sklearn wrapper predicts with the best iteration after early stopping
+    try:
+        n_rounds = model.best_iteration + 1
+    except AttributeError:
+        n_rounds = None
+    if n_rounds is not None:
+        per_round = len(raw_trees) // max(1, booster.num_boosted_rounds())
+        raw_trees = raw_trees[:n_rounds * per_round]
+
+    trees = []
+    for raw in raw_trees:
+        if any(raw.get("split_type", [])):
+            raise ValueError("Categorical XGBoost splits are not supported")
+        left = np.asarray(raw["left_children"], dtype=np.int64)
+        conditions = np.asarray(raw["split_conditions"], dtype=np.float32)
+        trees.append({
+            "left": left, "right": np.asarray(raw["right_children"], dtype=np.int64),
+            "feature": np.asarray(raw["split_indices"], dtype=np.int64),
+            # float32 thresholds, widened exactly; leaves store their value in split_conditions
+            "threshold": conditions.astype(np.float64), "value": conditions.astype(np.float64),
+            "default_left": np.asarray(raw["default_left"], dtype=np.uint8),
+        })
+    base_score = float(str(config["learner_model_param"]["base_score"]).strip("[]").split(",")[0])
+    return trees, base_score, True
+
+
+FLATTENERS = {
+    "GradientBoostingRegressor": flatten_gradient_boosting,
+    "RandomForestRegressor": flatten_random_forest,
+    "XGBRegressor": flatten_xgboost,
+    "Booster": flatten_xgboost,
+}
+
+
+def _n_features(model):
+    if hasattr(model, "n_features_in_"):
+        return model.n_features_in_
+    return model.num_features()
+
+
+# === File format ===
+def _aligned(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_arrays(path, arrays, meta):
+    """MAGIC | header length (u64) | JSON header | padding | 64-byte aligned arrays"""
+    specs, offset = {}, 0
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    for name, array in arrays.items():
+        specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += _aligned(array.nbytes)
+    header = json.dumps({"meta": meta, "arrays": specs}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for array in arrays.values():
+            f.write(array.tobytes())
+            f.write(b"\0" * (_aligned(array.nbytes) - array.nbytes))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_arrays(path, mmap=True):
+    """(arrays, meta); arrays are read-only memmaps unless mmap=False"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an exported tree ensemble")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+    data_start = _aligned(len(MAGIC) + 8 + header_length)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        if mmap:
+            arrays[name] = np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r",
+                                     offset=data_start + spec["offset"], shape=tuple(spec["shape"]))
+        else:
+            with open(path, "rb") as f:
+                f.seek(data_start + spec["offset"])
+                count = int(np.prod(spec["shape"]))
+                arrays[name] = np.fromfile(f, dtype=np.dtype(spec["dtype"]), count=count).reshape(spec["shape"])
+    return arrays, header["meta"]
+
+
+# === Evaluation ===
+class TreeEnsemble:
+    """Batch evaluator over the flattened node arrays"""
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        for name in NODE_ARRAYS + ["roots"]:
+            setattr(self, name, np.asarray(arrays[name]))  # plain views over the memmap
+        self.n_features = meta["n_features"]
+        self.feature_names = meta.get("feature_names")
+        self.base_score = meta["base_score"]
+        self.max_depth = meta["max_depth"]
+        self.strict = meta["strict"]
+
+    @classmethod
+    def from_model(cls, model, feature_names=None):
+        kind = type(model).__name__
+        if kind not in FLATTENERS:
+            raise ValueError(f"Unsupported model type {kind} (supported: {', '.join(FLATTENERS)})")
+        trees, base_score, strict = FLATTENERS[kind](model)
+        arrays, meta = _pack(trees, base_score, strict, kind, _n_features(model), feature_names)
+        return cls(arrays, meta)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(*read_arrays(path, mmap=mmap))
+
+    def save(self, path):
+        return write_arrays(path, self.arrays, self.meta)
+
+    def _predict_chunk(self, X):
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+        has_missing = np.isnan(flat).any()
+        index = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = flat.take(row_offsets + self.feature.take(index))
+            threshold = self.threshold.take(index)
+            go_right = ~(x < threshold) if self.strict else ~(x <= threshold)
+            if has_missing:
+                go_right &= ~(np.isnan(x) & self.default_left.take(index).astype(bool))
+            index = self.children.take(2 * index + go_right)
+        return self.base_score + self.value.take(index).sum(axis=1)
+
+    def predict(self, X, chunk_rows=CHUNK_ROWS):
+        """Predictions for an (n_rows, n_features) array, walked chunk_rows rows at a time"""
+        # Both libraries compare float32 features; widening keeps sklearn's float64 thresholds exact
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected (n_rows, {self.n_features}) features, got {X.shape}")
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_rows):
+            out[start:start + chunk_rows] = self._predict_chunk(X[start:start + chunk_rows])
+        return out
+
+
+def export_model(model, path, feature_names=None):
+    """Flatten a fitted GB / RF / XGB regressor into a .trees file; returns the loaded ensemble"""
+    TreeEnsemble.from_model(model, feature_names).save(path)
+    return TreeEnsemble.load(path)
+
+
+def verify_export(model, ensemble, X, rtol=RTOL, atol=ATOL):
+    """Max absolute difference to the source model; raises if outside the tolerance"""
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    actual = ensemble.predict(X)
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        worst = np.abs(actual - expected).max()
+        raise ValueError(f"Exported ensemble differs from the source model (max abs diff {worst:.3g})")
+    return float(np.abs(actual - expected).max()) if len(X) else 0.0
+
+
+if __name__ == "__main__":
+    import joblib
+
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python tree_export.py MODEL.pkl [OUT.trees]")
+    model_path = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(model_path)[0] + ".trees"
+
+    start = time.perf_counter()
+    model = joblib.load(model_path)
+    t_unpickle = time.perf_counter() - start
+    ensemble = export_model(model, output)
+    start = time.perf_counter()
+    TreeEnsemble.load(output)
+    t_load = time.perf_counter() - start
+
+    X = np.random.default_rng(0).normal(size=(1000, ensemble.n_features))
+    max_diff = verify_export(model, ensemble, X)
+    print(f"✅ {ensemble.meta['kind']}: {ensemble.meta['n_trees']} trees, {ensemble.meta['n_nodes']:,} nodes, "
+          f"depth {ensemble.max_depth} -> {output}")
+    print(f"⏱️  unpickle {t_unpickle * 1000:.1f} ms vs memmap load {t_load * 1000:.2f} ms "
+          f"(max abs diff {max_diff:.2e})")